@@ -0,0 +1,45 @@
+import pytest
+
+# The scripts run by the workflows, which need the models and the test assets
+collect_ignore = ["test_01.py", "pretests.py"]
+
+
+def _varint(n):
+    out = b""
+    while True:
+        b, n = n & 0x7f, n >> 7
+        out += bytes([b | (0x80 if n else 0)])
+        if not n: return out
+
+
+def _field(num, data):
+    if isinstance(data, int): return _varint(num << 3) + _varint(data)
+    if isinstance(data, str): data = data.encode()
+    return _varint(num << 3 | 2) + _varint(len(data)) + data
+
+
+def _value_info(name, dims):
+    shape = b"".join(_field(1, _field(1, d) if isinstance(d, int) else _field(2, d)) for d in dims)
+    return _field(1, name) + _field(2, _field(1, _field(1, 1) + _field(2, shape)))
+
+
+def _writeEncoder(path):
+    # An ONNX appearance encoder averaging 32x32 cells of the 128x64 patches, into 24
+    # features, written without the onnx package
+    attrs = [_field(1, key) + _field(20, 7) + _field(8, 32) + _field(8, 32)
+             for key in ("kernel_shape", "strides")]
+    pool = _field(1, "images") + _field(2, "pool") + _field(3, "gap") + \
+        _field(4, "AveragePool") + b"".join(_field(5, a) for a in attrs)
+    flatten = _field(1, "pool") + _field(2, "features") + _field(3, "flat") + _field(4, "Flatten")
+    graph = _field(1, pool) + _field(1, flatten) + _field(2, "g") + \
+        _field(11, _value_info("images", ["N", 3, 128, 64])) + \
+        _field(12, _value_info("features", ["N", 24]))
+    with open(path, "wb") as f:
+        f.write(_field(1, 7) + _field(8, _field(2, 13)) + _field(7, graph))
+
+
+@pytest.fixture
+def encoder_file(tmp_path):
+    path = str(tmp_path / "encoder.onnx")
+    _writeEncoder(path)
+    return path
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from vsensebox.modules.trackers.basiciou import BasicIoU
+
+
+def _tracker(min_iou=0.3):
+    return BasicIoU(SimpleNamespace(min_iou=min_iou, device="cpu"))
+
+
+def test_iou_matrix():
+    tracker = _tracker()
+    rng = np.random.default_rng(0)
+    a = rng.uniform(0, 100, (5, 2))
+    b = rng.uniform(0, 100, (7, 2))
+    boxes_a, boxes_b = np.hstack([a, a + 30]), np.hstack([b, b + 20])
+    ious = tracker._getIoUMatrix(boxes_a, boxes_b)
+    for i, (x1, y1, x2, y2) in enumerate(boxes_a):
+        for j, (u1, v1, u2, v2) in enumerate(boxes_b):
+            iw = max(0, min(x2, u2) - max(x1, u1) + 1)
+            ih = max(0, min(y2, v2) - max(y1, v1) + 1)
+            inter = iw * ih
+            union = (x2 - x1 + 1) * (y2 - y1 + 1) + (u2 - u1 + 1) * (v2 - v1 + 1) - inter
+            assert np.isclose(ious[i, j], inter / union)
+
+
+def test_ids_are_kept_per_class():
+    tracker = _tracker()
+    boxes = np.array([[0., 0., 40., 40.], [100., 100., 140., 140.]])
+    _, ids = tracker.update(boxes, None, [0, 1])
+    assert ids.tolist() == [0, 1]
+    # The second box changes class, it cannot take the ID of a box of another class
+    _, ids = tracker.update(boxes + 2, None, [0, 0])
+    assert ids.tolist() == [0, 2]
+    # Two boxes overlapping the same previous box, only the best one takes its ID
+    _, ids = tracker.update(np.array([[3., 3., 43., 43.], [10., 10., 50., 50.]]), None, [0, 0])
+    assert ids.tolist() == [0, 3]
+
+
+def test_keeps_its_own_copy_of_the_boxes():
+    tracker = _tracker()
+    boxes, cls = np.array([[0., 0., 40., 40.]]), np.array([0])
+    tracker.update(boxes, None, cls)
+    # The caller reuses its arrays for the next frame
+    boxes[:] = [[500., 500., 540., 540.]]
+    cls[:] = 1
+    _, ids = tracker.update(np.array([[1., 1., 41., 41.]]), None, np.array([0]))
+    assert ids.tolist() == [0]
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+
+from vsensebox.benchmarks import (SyntheticCrowd, MOTDetections, TRACKER_NAMES, StubEncoder,
+                                  createTracker, benchmarkTracker, runBenchmarks)
+
+
+def test_synthetic_crowd_is_reproducible():
+    crowd = SyntheticCrowd(num_objects=20, num_frames=15, frame_size=(640, 480), occlusion=0.2)
+    frames = list(crowd)
+    assert len(frames) == len(crowd) == 15
+    assert crowd.getInfo()["num_objects"] == 20
+    for a, b in zip(frames, SyntheticCrowd(num_objects=20, num_frames=15, frame_size=(640, 480),
+                                           occlusion=0.2)):
+        assert np.array_equal(a.boxes_xyxy, b.boxes_xyxy)
+    for f in frames:
+        assert len(f.boxes_xyxy) == len(f.boxes_conf) == len(f.boxes_cls) == len(f.labels) <= 20
+        assert len(np.unique(f.labels)) == len(f.labels)
+        assert (f.boxes_xyxy[:, 2:] > f.boxes_xyxy[:, :2]).all()
+    # Some objects are occluded at the given rate
+    assert sum(len(f.labels) for f in frames) < 20 * 15
+
+
+def test_mot_detections(tmp_path):
+    det_txt = tmp_path / "det.txt"
+    det_txt.write_text("2,-1,10,20,30,40,0.9,-1,-1,-1\n"
+                       "1,-1,1,2,3,4,0.3,-1,-1,-1\n"
+                       "1,-1,5,6,7,8,0.8,-1,-1,-1\n"
+                       "4,-1,0,0,10,10,0.7,-1,-1,-1\n")
+    frames = list(MOTDetections(str(det_txt)))
+    assert [len(f.boxes_xyxy) for f in frames] == [2, 1, 0, 1]
+    assert np.allclose(frames[0].boxes_xyxy, [[1, 2, 4, 6], [5, 6, 12, 14]])
+    assert np.allclose(frames[1].boxes_xyxy, [[10, 20, 40, 60]])
+    assert [len(f.boxes_xyxy) for f in MOTDetections(str(det_txt), min_conf=0.5)] == [1, 1, 0, 1]
+    with pytest.raises(ValueError):
+        MOTDetections(str(tmp_path / "missing.txt"))
+
+
+def test_stub_encoder_follows_labels():
+    encoder = StubEncoder(dim=16)
+    encoder.setLabels(np.array([3, 0, -1]))
+    first = encoder(None, np.zeros((3, 4)))
+    encoder.setLabels(np.array([0, 3]))
+    second = encoder(None, np.zeros((2, 4)))
+    assert first.shape == (3, 16) and first.dtype == np.float32
+    assert np.allclose(np.linalg.norm(first, axis=1), 1)
+    assert np.array_equal(second, first[[1, 0]])
+    # The labels are used for one call only
+    assert not np.array_equal(encoder(None, np.zeros((1, 4))), first[1:2])
+
+
+def test_create_tracker():
+    for name in TRACKER_NAMES:
+        assert type(createTracker(name)).__name__ == name
+    assert createTracker("DeepSORT", {"nn_budget": 10}).metric.budget == 10
+    with pytest.raises(ValueError):
+        createTracker("unknown")
+
+
+def test_run_benchmarks(tmp_path):
+    crowd = SyntheticCrowd(num_objects=15, num_frames=20, frame_size=(640, 480))
+    output_json = tmp_path / "report.json"
+    report = runBenchmarks(crowd, configs={"DeepSORT": {"nn_budget": 10}}, warmup=2,
+                           measure_memory=False, output_json=str(output_json),
+                           terminal_log=False)
+    assert [r["tracker"] for r in report["results"]] == list(TRACKER_NAMES)
+    for r in report["results"]:
+        assert r["frames"] == 20 and r["fps"] > 0 and r["ids"] > 0
+        assert r["latency_ms"]["p50"] <= r["latency_ms"]["p99"] <= r["latency_ms"]["max"]
+        assert r["memory_mb"]["peak_traced"] is None
+    assert json.loads(output_json.read_text())["stream"] == crowd.getInfo()
+
+
+def test_benchmark_tracker_memory():
+    frames = list(SyntheticCrowd(num_objects=10, num_frames=5))
+    result = benchmarkTracker("SORT", frames, warmup=0)
+    assert result["frames"] == 5 and result["memory_mb"]["peak_traced"] > 0
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from vsensebox.modules.trackers.centroid import Centroid
+
+
+def _tracker(max_spread=30, pref_y="center", kdtree_min_pairs=None):
+    tracker = Centroid(SimpleNamespace(max_spread=max_spread, pref_y=pref_y))
+    if kdtree_min_pairs is not None: tracker.kdtree_min_pairs = kdtree_min_pairs
+    return tracker
+
+
+def _boxes(xy):
+    return np.hstack([xy - 10, xy + 10])
+
+
+def test_ids_are_kept_one_to_one():
+    tracker = _tracker()
+    _, ids = tracker.update(_boxes(np.array([[100., 100.], [200., 100.]])), None)
+    assert ids.tolist() == [0, 1]
+    # Both boxes are closest to the first previous one, only one can take its ID
+    _, ids = tracker.update(_boxes(np.array([[105., 100.], [110., 100.], [300., 300.]])), None)
+    assert ids.tolist() == [0, 2, 3]
+    _, ids = tracker.update(np.empty((0, 4)), None)
+    assert len(ids) == 0
+    _, ids = tracker.update(_boxes(np.array([[105., 100.]])), None)
+    assert ids.tolist() == [4]
+
+
+def test_kdtree_matches_distance_matrix():
+    rng = np.random.default_rng(0)
+    dense, kdtree = _tracker(), _tracker(kdtree_min_pairs=0)
+    xy = rng.uniform(0, 2000, (300, 2))
+    for f in range(15):
+        shown = rng.random(len(xy)) > 0.1
+        moved = xy[shown] + rng.normal(0, 8, (shown.sum(), 2))
+        _, dense_ids = dense.update(_boxes(moved), None)
+        _, kdtree_ids = kdtree.update(_boxes(moved), None)
+        assert np.array_equal(dense_ids, kdtree_ids)
+        assert len(np.unique(dense_ids)) == len(dense_ids)
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+
+from vsensebox.config import confighelper
+from vsensebox.config.confighelper import CFGWatcher, getCFGDict
+from vsensebox.utils.profiletools import NULL_PROFILER
+from vsensebox.vsense import vsense as vsense_module
+from vsensebox.vsense.vsense import VSense
+
+
+class _StubTracker(object):
+
+    profiler = NULL_PROFILER
+
+    def __init__(self, config_yaml):
+        self.config = getCFGDict(config_yaml)
+
+    def update(self, boxes_xyxy, boxes_conf, boxes_cls=None, img=None):
+        return boxes_xyxy, np.full(len(boxes_xyxy), self.config["id"], dtype=np.int64)
+
+
+def _write(path, value, stamp):
+    path.write_text("tracker: stub\nid: " + str(value) + "\n")
+    # An explicit modification time, as the file is rewritten within the clock resolution
+    os.utime(path, ns=(stamp, stamp))
+
+
+def test_cached_document_is_parsed_once(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    _write(path, 1, 10 ** 18)
+    parsed = []
+    load = confighelper.loadDocument
+    monkeypatch.setattr(confighelper, "loadDocument", lambda f: parsed.append(f) or load(f))
+    first = getCFGDict(str(path))
+    first["id"] = 5
+    assert getCFGDict(str(path))["id"] == 1 and len(parsed) == 1
+    _write(path, 2, 2 * 10 ** 18)
+    assert getCFGDict(str(path))["id"] == 2 and len(parsed) == 2
+
+
+def test_watcher(tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, 1, 10 ** 18)
+    watcher = CFGWatcher(interval=0.0)
+    assert watcher.isChanged(str(path))
+    assert not watcher.isChanged(str(path))
+    _write(path, 2, 2 * 10 ** 18)
+    assert watcher.isChanged(str(path))
+    config = {"tracker": "stub"}
+    assert watcher.isChanged(config)
+    assert not watcher.isChanged(config)
+    assert watcher.isChanged(dict(config))
+    # Within the interval, the file is not checked
+    slow = CFGWatcher(interval=60.0)
+    slow.isChanged(str(path))
+    _write(path, 3, 3 * 10 ** 18)
+    assert not slow.isChanged(str(path))
+
+
+def test_vsense_reloads_a_modified_tracker(tmp_path, monkeypatch):
+    created = []
+
+    def checkTrk(tracker=None, config_yaml=None, relative_to_vsensebox_root=False):
+        created.append(_StubTracker(config_yaml))
+        return created[-1]
+
+    monkeypatch.setattr(vsense_module, "checkTrk", checkTrk)
+    path = tmp_path / "tracker.yaml"
+    _write(path, 1, 10 ** 18)
+    vsense = VSense()
+    vsense._trk_watcher.interval = 0.0
+    vsense.assets.update(boxes_xyxy=[[0, 0, 4, 4]], boxes_conf=[1.0])
+    for _ in range(3):
+        vsense.track(img=np.zeros((4, 4, 3), np.uint8), config_yaml=str(path), img_is_mat=True)
+    assert len(created) == 1 and vsense.assets.ids.tolist() == [1]
+    _write(path, 7, 2 * 10 ** 18)
+    vsense.track(img=np.zeros((4, 4, 3), np.uint8), config_yaml=str(path), img_is_mat=True)
+    assert len(created) == 2 and vsense.assets.ids.tolist() == [7]
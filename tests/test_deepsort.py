@@ -0,0 +1,104 @@
+import numpy as np
+
+from vsensebox.config.confighelper import getCFGDict
+from vsensebox.config.configurator import TCFG_DeepSORT, TRK_CONFIG_DIR
+from vsensebox.modules.trackers.deepsort import DeepSORT
+
+
+class _ColorEncoder(object):
+
+    # Encodes a box by the mean color of its patch
+    def __call__(self, img, boxes):
+        features = []
+        for x, y, w, h in np.asarray(boxes, dtype=int).reshape(-1, 4):
+            patch = img[max(y, 0):y + h, max(x, 0):x + w].reshape(-1, 3)
+            features.append(patch.mean(axis=0) + 1.0)
+        return np.array(features, dtype=np.float32).reshape(-1, 3)
+
+
+def _tracker(**configs):
+    config = getCFGDict(TRK_CONFIG_DIR + "/deepsort.yaml")
+    config.update(configs)
+    return DeepSORT(TCFG_DeepSORT(config), encoder=_ColorEncoder())
+
+
+def _scene(num_objects=8, seed=0):
+    rng = np.random.default_rng(seed)
+    start = np.column_stack([rng.uniform(0, 1100, num_objects), rng.uniform(0, 500, num_objects)])
+    speed = rng.uniform(-3, 3, (num_objects, 2))
+    colors = rng.integers(0, 255, (num_objects, 3))
+    return start, speed, colors
+
+
+def _frame(start, speed, colors, f):
+    img = np.zeros((720, 1280, 3), dtype=np.uint8)
+    xy = start + f * speed
+    boxes = np.hstack([xy, xy + [60, 120]])
+    for (x1, y1, x2, y2), color in zip(boxes.astype(int), colors):
+        img[y1:y2, x1:x2] = color
+    return img, boxes
+
+
+def test_ids_follow_shuffled_boxes():
+    tracker = _tracker()
+    start, speed, colors = _scene()
+    rng = np.random.default_rng(1)
+    ids_of = {}
+    for f in range(20):
+        img, boxes = _frame(start, speed, colors, f)
+        order = rng.permutation(len(boxes))
+        _, ids = tracker.update(boxes[order], np.full(len(boxes), 0.9), np.zeros(len(boxes), int), img)
+        assert len(ids) == len(boxes) and ids.dtype == np.int64
+        for obj, i in zip(order, ids):
+            if i < 0: continue
+            assert ids_of.setdefault(obj, i) == i
+    assert len(ids_of) == len(boxes) and len(set(ids_of.values())) == len(boxes)
+
+
+def test_suppressed_box_has_no_id():
+    tracker = _tracker(nms_max_overlap=0.5)
+    start, speed, colors = _scene(num_objects=3)
+    for f in range(6):
+        img, boxes = _frame(start, speed, colors, f)
+        # A duplicate of the first box with a lower confidence is removed by the NMS
+        boxes = np.vstack([boxes, boxes[:1] + 1])
+        _, ids = tracker.update(boxes, [0.9, 0.9, 0.9, 0.5], [0, 0, 0, 0], img)
+    assert ids[3] == -1 and (ids[:3] > 0).all()
+
+
+def test_predict_between_keyframes():
+    tracker = _tracker()
+    boxes, ids = tracker.predict()
+    assert boxes.shape == (0, 4) and len(ids) == 0 and tracker.getUncertainty() == 0.0
+    start, speed, colors = _scene(num_objects=4)
+    for f in range(6):
+        img, boxes = _frame(start, speed, colors, f)
+        _, tracked_ids = tracker.update(boxes, np.full(4, 0.9), np.zeros(4, int), img)
+    uncertainty = tracker.getUncertainty()
+    for f in range(6, 9):
+        predicted, ids = tracker.predict()
+        assert sorted(ids) == sorted(tracked_ids)
+        _, boxes = _frame(start, speed, colors, f)
+        expected = boxes[[list(tracked_ids).index(i) for i in ids]]
+        assert np.allclose(predicted, expected, atol=3)
+        assert tracker.getUncertainty() > uncertainty
+        uncertainty = tracker.getUncertainty()
+    img, boxes = _frame(start, speed, colors, 9)
+    _, ids = tracker.update(boxes, np.full(4, 0.9), np.zeros(4, int), img)
+    assert np.array_equal(ids, tracked_ids)
+
+
+def test_features_are_float32():
+    tracker = _tracker()
+    tracker.encoder = lambda img, boxes: 10. * _ColorEncoder()(img, boxes).astype(np.float64)
+    start, speed, colors = _scene(num_objects=4)
+    for f in range(5):
+        img, boxes = _frame(start, speed, colors, f)
+        tracker.update(boxes, np.full(4, 0.9), np.zeros(4, int), img)
+    # The features are normalized once and kept in float32 by the tracks and the metric
+    for track in tracker.tracker.tracks:
+        for feature in track.features:
+            assert feature.dtype == np.float32 and np.isclose(np.linalg.norm(feature), 1)
+    assert tracker.metric._gallery.dtype == np.float32
+    for samples in tracker.metric.samples.values():
+        assert np.allclose(np.linalg.norm(samples, axis=1), 1, atol=1e-6)
@@ -0,0 +1,113 @@
+import threading
+
+import numpy as np
+import pytest
+
+from vsensebox.config.confighelper import getCFGDict
+from vsensebox.config.configurator import TCFG_DeepSORT, TRK_CONFIG_DIR
+from vsensebox.modules.trackers import encoderservice
+from vsensebox.modules.trackers.deepsort import DeepSORT
+from vsensebox.modules.trackers.encoderservice import EncoderService, getEncoderService
+from vsensebox.modules.trackers.utils.generate_detections import extract_image_patches
+
+
+class _StubImageEncoder(object):
+
+    # Encodes a patch by its mean color, and records the size of every call
+    image_shape = [16, 8, 3]
+    feature_dim = 3
+
+    def __init__(self, release=None):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = release
+
+    def __call__(self, patches, batch_size=32):
+        self.calls.append(len(patches))
+        self.started.set()
+        if self.release is not None: self.release.wait()
+        return patches.reshape(len(patches), -1, 3).mean(axis=1).astype(np.float32)
+
+
+def _patches(values):
+    return np.array([np.full((16, 8, 3), v, np.uint8) for v in values]).reshape(-1, 16, 8, 3)
+
+
+@pytest.fixture
+def service():
+    services = []
+
+    def make(**kwargs):
+        services.append(EncoderService(_StubImageEncoder(kwargs.pop("release", None)), **kwargs))
+        return services[-1]
+
+    yield make
+    for s in services: s.close()
+
+
+def test_requests_are_batched(service):
+    s = service(batch_size=12, max_wait=0.5)
+    futures = [s.submit(_patches([4 * i + j for j in range(4)])) for i in range(3)]
+    for i, future in enumerate(futures):
+        features = future.result(timeout=5)
+        assert features.shape == (4, 3)
+        assert np.array_equal(features[:, 0], [4 * i + j for j in range(4)])
+    assert s.image_encoder.calls == [12]
+
+
+def test_batch_is_sent_after_max_wait(service):
+    s = service(batch_size=100, max_wait=0.01)
+    assert np.array_equal(s.submit(_patches([7])).result(timeout=5), [[7, 7, 7]])
+    empty = s.submit(_patches([])).result(timeout=5)
+    assert empty.shape == (0, 3) and empty.dtype == np.float32
+    assert s.image_encoder.calls == [1]
+
+
+def test_encoder_error_fails_the_batch(service):
+    s = service()
+    s.image_encoder = None
+    with pytest.raises(TypeError):
+        s.submit(_patches([1])).result(timeout=5)
+
+
+def test_close_fails_the_waiting_frames(service):
+    release = threading.Event()
+    s = service(batch_size=1, release=release)
+    running = s.submit(_patches([1]))
+    assert s.image_encoder.started.wait(5)
+    waiting = s.submit(_patches([2]))
+    closing = threading.Thread(target=s.close)
+    closing.start()
+    assert s._stop_event.wait(5)
+    release.set()
+    closing.join()
+    assert np.array_equal(running.result(timeout=5), [[1, 1, 1]])
+    with pytest.raises(ValueError):
+        waiting.result(timeout=5)
+    with pytest.raises(ValueError):
+        s.submit(_patches([3]))
+
+
+def test_box_encoder(service):
+    s = service()
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 255, (120, 160, 3), dtype=np.uint8)
+    boxes = np.array([[10, 20, 30, 60], [50, 10, 40, 80], [100, 50, 20, 40]], dtype=np.float64)
+    expected = _StubImageEncoder()(extract_image_patches(img, boxes, s.image_shape))
+    box_encoder = s.createBoxEncoder()
+    assert np.allclose(box_encoder.submit(img, boxes).result(timeout=5), expected)
+    assert np.allclose(box_encoder(img, boxes[1:]), expected[1:])
+
+
+def test_encoder_service_is_shared(encoder_file, monkeypatch):
+    monkeypatch.setattr(encoderservice, "_services", {})
+    s = getEncoderService(encoder_file, backend="opencv")
+    try:
+        assert getEncoderService(encoder_file, batch_size=8, backend="opencv") is s
+        config = getCFGDict(TRK_CONFIG_DIR + "/deepsort.yaml")
+        config.update(model_file=encoder_file, encoder_backend="opencv", shared_encoder=True)
+        trackers = [DeepSORT(TCFG_DeepSORT(config)) for _ in range(2)]
+        assert trackers[0].encoder.service is trackers[1].encoder.service is s
+        assert trackers[0].encoder is not trackers[1].encoder
+    finally:
+        s.close()
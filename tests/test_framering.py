@@ -0,0 +1,104 @@
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from vsensebox.utils.framering import FrameRing
+
+
+def _frame(v, shape=(4, 6, 3)):
+    return np.full(shape, v, dtype=np.uint8)
+
+
+def _readSum(ring, handle, conn):
+    # Runs in a worker process
+    conn.send(int(ring.get(handle).sum()))
+    ring.release(handle)
+    ring.close()
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(num_slots=2, slot_bytes=4 * 6 * 3)
+    yield ring
+    ring.close()
+
+
+def test_put_and_get(ring):
+    handle = ring.put(_frame(7))
+    view = ring.get(handle)
+    assert view.shape == (4, 6, 3) and (view == 7).all()
+    assert ring.getNumFree() == 1
+    ring.release(handle)
+    assert ring.getNumFree() == 2
+
+
+def test_stale_handle(ring):
+    first = ring.put(_frame(1))
+    ring.release(first)
+    second = ring.put(_frame(2))
+    third = ring.put(_frame(3))
+    # The slot of the released frame is reused with a new sequence number
+    assert first.slot in (second.slot, third.slot)
+    with pytest.raises(ValueError):
+        ring.get(first)
+    with pytest.raises(ValueError):
+        ring.get(first, copy=True)
+    # Releasing a stale handle does not touch the reference of the new frame
+    ring.release(first)
+    assert ring.getNumFree() == 0
+    assert (ring.get(second) == 2).all() and (ring.get(third) == 3).all()
+
+
+def test_references(ring):
+    handle = ring.put(_frame(5))
+    ring.acquire(handle, 2)
+    ring.release(handle)
+    ring.release(handle)
+    assert ring.getNumFree() == 1
+    ring.release(handle)
+    assert ring.getNumFree() == 2
+
+
+def test_full_ring_and_copy(ring):
+    first = ring.put(_frame(1))
+    ring.put(_frame(2))
+    assert ring.put(_frame(3), timeout=0.05) is None
+    copy = ring.get(first, copy=True)
+    ring.release(first)
+    ring.put(_frame(4))
+    # The copy keeps the frame, the slot now holds another one
+    assert (copy == 1).all()
+
+
+def test_frame_too_large(ring):
+    with pytest.raises(ValueError):
+        ring.put(np.zeros((10, 10, 3), dtype=np.uint8))
+
+
+def test_worker_process_reads_the_frame(ring):
+    ctx = mp.get_context("spawn")
+    handle = ring.put(_frame(2))
+    ring.acquire(handle)
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=_readSum, args=(ring, handle, child_conn))
+    process.start()
+    assert parent_conn.recv() == 2 * 4 * 6 * 3
+    process.join(timeout=30)
+    ring.release(handle)
+    assert ring.getNumFree() == 2
+
+
+def test_close_with_a_live_view():
+    from multiprocessing import shared_memory
+    ring = FrameRing(num_slots=2, slot_bytes=4 * 6 * 3)
+    shm = ring._shm
+    view = ring.get(ring.put(_frame(7)))[1:]
+    ring.close()
+    # The block is unlinked but stays mapped while the view is alive
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=ring.name)
+    assert shm.buf is not None and (view == 7).all()
+    del view
+    assert shm.buf is None
+    ring.close()
@@ -0,0 +1,162 @@
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from vsensebox.config.confighelper import getCFGDict
+from vsensebox.config.configurator import TCFG_DeepSORT, TRK_CONFIG_DIR
+from vsensebox.modules.trackers.deepsort import DeepSORT
+from vsensebox.modules.trackers.utils.generate_detections import (
+    ImagePatchExtractor, ONNXImageEncoder, OpenCVImageEncoder, create_box_encoder,
+    create_image_encoder, extract_image_patch, extract_image_patches)
+
+IMAGE_SHAPE = (128, 64, 3)
+
+
+def _image_and_boxes(n=20, seed=0):
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 255, (360, 480, 3), dtype=np.uint8)
+    # Some boxes cross the borders of the image
+    boxes = np.column_stack([rng.uniform(-30, 460, n), rng.uniform(-30, 340, n),
+                             rng.uniform(8, 120, n), rng.uniform(16, 200, n)])
+    return img, boxes
+
+
+def test_patches_match_extract_image_patch():
+    img, boxes = _image_and_boxes()
+    patches = extract_image_patches(img, boxes, IMAGE_SHAPE)
+    assert patches.shape == (len(boxes), *IMAGE_SHAPE) and patches.dtype == np.uint8
+    for box, patch in zip(boxes, patches):
+        assert np.array_equal(patch, extract_image_patch(img, box, IMAGE_SHAPE[:2]))
+
+
+def test_boxes_outside_the_image_get_random_patches(capsys):
+    img, boxes = _image_and_boxes(n=3)
+    boxes = np.vstack([boxes, [[600, 100, 50, 100], [10, 10, 0, 0]]])
+    patches = extract_image_patches(img, boxes, IMAGE_SHAPE)
+    assert patches.shape == (5, *IMAGE_SHAPE)
+    assert extract_image_patch(img, boxes[3], IMAGE_SHAPE[:2]) is None
+    assert "Failed to extract image patch" in capsys.readouterr().out
+    for box, patch in zip(boxes[:3], patches[:3]):
+        assert np.array_equal(patch, extract_image_patch(img, box, IMAGE_SHAPE[:2]))
+
+
+def test_extractor_reuses_its_buffer():
+    extract_patches = ImagePatchExtractor(IMAGE_SHAPE)
+    img, boxes = _image_and_boxes(n=6)
+    first = extract_patches(img, boxes)
+    buffer = extract_patches._buffer
+    assert np.shares_memory(first, buffer)
+    second = extract_patches(img, boxes[:4])
+    assert len(second) == 4 and extract_patches._buffer is buffer
+    assert np.array_equal(second, extract_image_patches(img, boxes[:4], IMAGE_SHAPE))
+    # The buffer only grows when a frame has more boxes than it holds
+    img, boxes = _image_and_boxes(n=9, seed=1)
+    third = extract_patches(img, boxes)
+    assert len(extract_patches._buffer) == 12
+    assert np.array_equal(third, extract_image_patches(img, boxes, IMAGE_SHAPE))
+    assert extract_patches(img, np.zeros((0, 4))).shape == (0, *IMAGE_SHAPE)
+
+
+def _block_means(patches):
+    # The features of the test encoder: the mean of every channel over 32x32 cells
+    blocks = patches.reshape(len(patches), 4, 32, 2, 32, 3).mean(axis=(2, 4))
+    return blocks.transpose(0, 3, 1, 2).reshape(len(patches), -1)
+
+
+def test_opencv_encoder(encoder_file):
+    encoder = create_image_encoder(encoder_file, backend="opencv")
+    assert isinstance(encoder, OpenCVImageEncoder)
+    assert encoder.image_shape == list(IMAGE_SHAPE) and encoder.feature_dim == 24
+    img, boxes = _image_and_boxes(n=7)
+    patches = extract_image_patches(img, boxes, IMAGE_SHAPE)
+    features = encoder(patches, batch_size=3)
+    assert features.shape == (7, 24) and features.dtype == np.float32
+    assert np.allclose(features, _block_means(patches), atol=1e-3)
+    box_encoder = create_box_encoder(encoder_file, batch_size=4, backend="opencv")
+    assert np.allclose(box_encoder(img, boxes), features, atol=1e-5)
+
+
+def test_onnx_encoder(encoder_file):
+    pytest.importorskip("onnxruntime")
+    encoder = create_image_encoder(encoder_file, backend="onnx")
+    assert encoder.image_shape == list(IMAGE_SHAPE) and encoder.feature_dim == 24
+    img, boxes = _image_and_boxes(n=5)
+    patches = extract_image_patches(img, boxes, IMAGE_SHAPE)
+    assert np.allclose(encoder(patches, batch_size=2), _block_means(patches), atol=1e-3)
+
+
+def test_unknown_encoder_backend(encoder_file):
+    with pytest.raises(ValueError):
+        create_image_encoder(encoder_file, backend="caffe")
+    config = getCFGDict(TRK_CONFIG_DIR + "/deepsort.yaml")
+    config.update(model_file=encoder_file, encoder_backend="caffe")
+    with pytest.raises(ValueError):
+        DeepSORT(TCFG_DeepSORT(config))
+
+
+def test_opencv_encoder_image_shape(encoder_file):
+    encoder = create_image_encoder(encoder_file, backend="opencv", image_shape=(64, 32, 3))
+    assert encoder.image_shape == [64, 32, 3] and encoder.feature_dim == 6
+    config = getCFGDict(TRK_CONFIG_DIR + "/deepsort.yaml")
+    config.update(model_file=encoder_file, encoder_backend="opencv",
+                  encoder_image_shape=[64, 32, 3])
+    tracker = DeepSORT(TCFG_DeepSORT(config))
+    img, boxes = _image_and_boxes(n=4)
+    boxes[:, 2:] += boxes[:, :2]
+    tracker.update(boxes, np.full(4, 0.9), np.zeros(4, int), img)
+    assert len(tracker.tracker.tracks) > 0
+    assert all(t.features[0].shape == (6,) for t in tracker.tracker.tracks)
+
+
+def test_opencv_encoder_unreadable_model(tmp_path):
+    model_file = tmp_path / "model.pb"
+    model_file.write_bytes(b"not a graph")
+    with pytest.raises(ValueError, match="OpenCV DNN cannot run"):
+        create_image_encoder(str(model_file), backend="opencv")
+
+
+class _Session(object):
+
+    # An ONNX Runtime session whose model outputs features of 5 zeros
+    def __init__(self, input_shape, output_shape=("N", 5)):
+        self.inputs = [SimpleNamespace(name="images:0", shape=list(input_shape), type="tensor(float)")]
+        self.outputs = [SimpleNamespace(name="features:0", shape=list(output_shape))]
+        self.fed = []
+
+    def get_inputs(self):
+        return self.inputs
+
+    def get_outputs(self):
+        return self.outputs
+
+    def run(self, names, feeds):
+        self.fed.append(feeds["images:0"].shape)
+        return [np.zeros((len(feeds["images:0"]), 5), np.float32)]
+
+
+def _onnx_encoder(monkeypatch, session, **kwargs):
+    ort = SimpleNamespace(get_available_providers=lambda: ["CPUExecutionProvider"],
+                          InferenceSession=lambda path, providers: session)
+    monkeypatch.setitem(sys.modules, "onnxruntime", ort)
+    return ONNXImageEncoder("model.onnx", **kwargs)
+
+
+def test_onnx_encoder_layout(monkeypatch):
+    encoder = _onnx_encoder(monkeypatch, _Session(["N", 3, 128, 64]))
+    assert not encoder.channels_last and encoder.image_shape == [128, 64, 3]
+    encoder = _onnx_encoder(monkeypatch, _Session(["unk__1", 128, 64, 3], ["unk__2", "D"]))
+    assert encoder.channels_last and encoder.image_shape == [128, 64, 3]
+    # The feature dimension is found with a first forward pass when it is symbolic
+    assert encoder.feature_dim == 5 and encoder.session.fed == [(1, 128, 64, 3)]
+    for shape in (["N", "C", "H", "W"], ["N", 16, 128, 64], ["N", 128, 64]):
+        with pytest.raises(ValueError, match="layout"):
+            _onnx_encoder(monkeypatch, _Session(shape))
+
+
+def test_onnx_encoder_unknown_tensor(monkeypatch):
+    with pytest.raises(ValueError, match="images:0"):
+        _onnx_encoder(monkeypatch, _Session(["N", 3, 128, 64]), input_name="input")
+    with pytest.raises(ValueError, match="features:0"):
+        _onnx_encoder(monkeypatch, _Session(["N", 3, 128, 64]), output_name="embeddings")
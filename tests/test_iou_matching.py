@@ -0,0 +1,43 @@
+import numpy as np
+
+from vsensebox.modules.trackers.utils import iou_matching, linear_assignment
+from vsensebox.modules.trackers.utils.detection import Detection
+from vsensebox.modules.trackers.utils.kalman_filter import KalmanFilter
+from vsensebox.modules.trackers.utils.track import Track
+
+
+def _boxes(n, seed):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(0, 200, (n, 2)), rng.uniform(10, 80, (n, 2))])
+
+
+def test_iou_matrix_matches_iou():
+    bboxes, candidates = _boxes(7, 0), _boxes(9, 1)
+    matrix = iou_matching.iou_matrix(bboxes, candidates)
+    assert matrix.shape == (7, 9)
+    for i, bbox in enumerate(bboxes):
+        assert np.allclose(matrix[i], iou_matching.iou(bbox, candidates))
+    assert 0 < matrix.max() <= 1
+
+
+def test_iou_cost():
+    kf = KalmanFilter()
+    tlwh = _boxes(6, 2)
+    tracks = []
+    for i, box in enumerate(tlwh):
+        mean, covariance = kf.initiate(np.r_[box[:2] + box[2:] / 2, box[2] / box[3], box[3]])
+        tracks.append(Track(mean, covariance, i + 1, 3, 30))
+    tracks[4].time_since_update = 2
+    detections = [Detection(box, 0.9, 0, np.zeros(4, np.float32)) for box in _boxes(5, 3)]
+    detections.append(Detection(tlwh[1] + 2, 0.9, 0, np.zeros(4, np.float32)))
+    track_indices, detection_indices = [1, 3, 4], [0, 2, 5]
+    cost = iou_matching.iou_cost(tracks, detections, track_indices, detection_indices)
+    for row, i in enumerate(track_indices):
+        candidates = np.array([detections[j].tlwh for j in detection_indices])
+        expected = 1. - iou_matching.iou(tracks[i].to_tlwh(), candidates)
+        if tracks[i].time_since_update > 1:
+            expected[:] = linear_assignment.INFTY_COST
+        assert np.allclose(cost[row], expected)
+    assert cost[0, 2] < 0.3
+    assert iou_matching.iou_cost(tracks, detections, [], detection_indices).shape == (0, 3)
+    assert iou_matching.iou_cost(tracks, detections, track_indices, []).shape == (3, 0)
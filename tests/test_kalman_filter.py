@@ -0,0 +1,87 @@
+import numpy as np
+
+from vsensebox.modules.trackers.utils import linear_assignment
+from vsensebox.modules.trackers.utils.detection import Detection
+from vsensebox.modules.trackers.utils.kalman_filter import KalmanFilter, chi2inv95
+from vsensebox.modules.trackers.utils.track import Track
+
+
+def _states(kf, n=12, seed=0):
+    rng = np.random.default_rng(seed)
+    measurements = np.column_stack([rng.uniform(0, 800, (n, 2)), rng.uniform(0.3, 0.8, n),
+                                    rng.uniform(40, 200, n)])
+    states = [kf.initiate(m) for m in measurements]
+    mean = np.array([s[0] for s in states])
+    covariance = np.array([s[1] for s in states])
+    mean[:, 4:6] = rng.normal(0, 3, (n, 2))
+    return mean, covariance, measurements + rng.normal(0, [2, 2, 0.01, 2], measurements.shape)
+
+
+def test_multi_predict_matches_predict():
+    kf = KalmanFilter()
+    mean, covariance, _ = _states(kf)
+    multi_mean, multi_cov = kf.multi_predict(mean, covariance)
+    for i in range(len(mean)):
+        single_mean, single_cov = kf.predict(mean[i], covariance[i])
+        assert np.allclose(multi_mean[i], single_mean)
+        assert np.allclose(multi_cov[i], single_cov)
+
+
+def test_multi_project_matches_project():
+    kf = KalmanFilter()
+    mean, covariance, _ = _states(kf)
+    multi_mean, multi_cov = kf.multi_project(mean, covariance)
+    for i in range(len(mean)):
+        single_mean, single_cov = kf.project(mean[i], covariance[i])
+        assert np.allclose(multi_mean[i], single_mean)
+        assert np.allclose(multi_cov[i], single_cov)
+
+
+def test_multi_update_matches_update():
+    kf = KalmanFilter()
+    mean, covariance, measurements = _states(kf)
+    mean, covariance = kf.multi_predict(mean, covariance)
+    multi_mean, multi_cov = kf.multi_update(mean, covariance, measurements)
+    for i in range(len(mean)):
+        single_mean, single_cov = kf.update(mean[i], covariance[i], measurements[i])
+        assert np.allclose(multi_mean[i], single_mean)
+        assert np.allclose(multi_cov[i], single_cov)
+
+
+def test_empty_batch():
+    kf = KalmanFilter()
+    mean, covariance = kf.multi_predict(np.zeros((0, 8)), np.zeros((0, 8, 8)))
+    assert mean.shape == (0, 8) and covariance.shape == (0, 8, 8)
+
+
+def test_multi_gating_distance_matches_gating_distance():
+    kf = KalmanFilter()
+    mean, covariance, measurements = _states(kf)
+    for only_position in (False, True):
+        distances = kf.multi_gating_distance(mean, covariance, measurements, only_position)
+        assert distances.shape == (len(mean), len(measurements))
+        for i in range(len(mean)):
+            expected = kf.gating_distance(mean[i], covariance[i], measurements, only_position)
+            assert np.allclose(distances[i], expected)
+
+
+def test_gate_cost_matrix():
+    kf = KalmanFilter()
+    mean, covariance, measurements = _states(kf)
+    tracks = [Track(mean[i], covariance[i], i + 1, 3, 30) for i in range(len(mean))]
+    detections = [Detection(np.r_[m[:2] - [m[2] * m[3] / 2, m[3] / 2], m[2] * m[3], m[3]],
+                            0.9, 0, np.zeros(4, np.float32)) for m in measurements]
+    track_indices, detection_indices = [0, 2, 3, 7], [1, 2, 3, 5, 7]
+    cost = np.full((len(track_indices), len(detection_indices)), 0.5)
+    factors = kf.multi_gating_factors(mean, covariance)
+    for gating_factors in (None, factors):
+        gated = linear_assignment.gate_cost_matrix(
+            kf, cost.copy(), tracks, detections, track_indices, detection_indices,
+            gating_factors=gating_factors)
+        for row, i in enumerate(track_indices):
+            distances = kf.gating_distance(
+                mean[i], covariance[i], np.array([measurements[j] for j in detection_indices]))
+            expected = np.where(distances > chi2inv95[4], linear_assignment.INFTY_COST, 0.5)
+            assert np.allclose(gated[row], expected)
+        # The measurements of the tracks themselves are always within the gate
+        assert gated[1, 1] == 0.5 and gated[2, 2] == 0.5 and gated[3, 4] == 0.5
@@ -0,0 +1,102 @@
+import numpy as np
+
+from vsensebox.modules.trackers.utils.nn_matching import NearestNeighborDistanceMetric, \
+    normalize_features
+
+
+def _features(n, dim=8, seed=0):
+    return normalize_features(np.random.default_rng(seed).normal(size=(n, dim)))
+
+
+def test_budget_gallery_grows_after_a_slot_is_full():
+    metric = NearestNeighborDistanceMetric("cosine", 0.2, budget=3)
+    features = _features(8)
+    for i in range(4):
+        metric.partial_fit(features[i:i + 1], [1], [1])
+    # Growing the gallery keeps the ring head of target 1
+    metric.partial_fit(features[4:7], [1, 2, 3], [1, 2, 3])
+    metric.partial_fit(features[7:8], [1], [1, 2, 3])
+    kept = metric.samples[1]
+    assert len(kept) == 3
+    # Oldest first: samples 0 to 3 then 4 and 7 leave 7, 4 and 3
+    expected = features[[3, 4, 7]]
+    assert np.allclose(np.sort(kept, axis=0), np.sort(expected, axis=0))
+
+
+def test_budget_replaces_oldest_first():
+    metric = NearestNeighborDistanceMetric("euclidean", 0.2, budget=2)
+    for i in range(5):
+        metric.partial_fit(np.full((1, 2), i, dtype=np.float32), [7], [7])
+    assert sorted(metric.samples[7][:, 0].tolist()) == [3., 4.]
+
+
+def test_no_budget_keeps_all_samples_when_growing():
+    metric = NearestNeighborDistanceMetric("cosine", 0.2)
+    features = _features(12)
+    metric.partial_fit(features[:1], [1], [1])
+    metric.partial_fit(features[1:2], [1], [1])
+    metric.partial_fit(features[2:6], [1, 1, 2, 3], [1, 2, 3])
+    metric.partial_fit(features[6:12], [1, 2, 2, 3, 4, 5], [1, 2, 3, 4, 5])
+    assert np.allclose(np.sort(metric.samples[1], axis=0),
+                       np.sort(features[[0, 1, 2, 3, 6]], axis=0))
+    assert len(metric.samples[2]) == 3
+
+
+def test_inactive_targets_are_dropped():
+    metric = NearestNeighborDistanceMetric("cosine", 0.2, budget=4)
+    features = _features(3)
+    metric.partial_fit(features, [1, 2, 3], [1, 2, 3])
+    metric.partial_fit(features[:1], [1], [1])
+    assert sorted(metric.samples) == [1]
+    metric.partial_fit(features[1:3], [4, 5], [1, 4, 5])
+    assert sorted(metric.samples) == [1, 4, 5]
+    assert len(metric.samples[1]) == 2
+
+
+def test_distance_matches_brute_force():
+    rng = np.random.default_rng(1)
+    for name in ("cosine", "euclidean"):
+        metric = NearestNeighborDistanceMetric(name, 0.2, budget=5)
+        history = {}
+        for _ in range(8):
+            targets = [int(t) for t in rng.choice(6, size=4, replace=False)]
+            features = _features(4, seed=int(rng.integers(1000)))
+            metric.partial_fit(features, targets, targets)
+            history = {t: (history.get(t, []) + [f])[-5:] for t, f in zip(targets, features)}
+        queries = _features(3, seed=99)
+        targets = sorted(history)
+        cost = metric.distance(queries, targets)
+        for i, t in enumerate(targets):
+            samples = np.array(history[t])
+            if name == "cosine":
+                expected = (1. - samples @ queries.T).min(axis=0)
+            else:
+                expected = np.square(samples[:, None] - queries[None]).sum(axis=2).min(axis=0)
+            assert np.allclose(cost[i], expected, atol=1e-5)
+
+
+def test_normalize_features():
+    features = np.array([[3., 4.], [0., 0.], [-2., 0.]])
+    normalized = normalize_features(features)
+    assert normalized.dtype == np.float32
+    assert np.allclose(normalized, [[0.6, 0.8], [0., 0.], [-1., 0.]])
+    # The input is not modified
+    assert features[0, 0] == 3.
+    assert normalize_features(np.zeros((0, 128))).shape == (0, 128)
+    assert normalize_features([]).shape == (0, 0)
+    assert np.allclose(normalize_features([0., 2., 0.]), [[0., 1., 0.]])
+    assert normalize_features(np.ones((5, 1, 1, 4))).shape == (5, 4)
+
+
+def test_gallery_is_float32():
+    metric = NearestNeighborDistanceMetric("cosine", 0.2, budget=4, data_is_normalized=False)
+    rng = np.random.default_rng(2)
+    features = rng.normal(size=(3, 16))
+    metric.partial_fit(features, [1, 2, 3], [1, 2, 3])
+    assert metric._gallery.dtype == np.float32
+    assert metric.samples[1].dtype == np.float32
+    assert np.allclose(np.linalg.norm(metric.samples[2], axis=1), 1)
+    queries = rng.normal(size=(2, 16))
+    expected = 1. - normalize_features(features).astype(np.float64) @ \
+        normalize_features(queries).astype(np.float64).T
+    assert np.allclose(metric.distance(queries, [1, 2, 3]), expected, atol=1e-6)
@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+import pytest
+
+from vsensebox.utils.profiletools import NULL_PROFILER
+from vsensebox.vsense import vsense as vsense_module
+from vsensebox.vsense.pipeline import Pipeline
+from vsensebox.vsense.vsense import VSense
+
+
+class _StubDetector(object):
+
+    # Detects one box at the value of the first pixel
+    profiler = NULL_PROFILER
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def detect(self, img):
+        time.sleep(self.delay)
+        v = float(img[0, 0, 0])
+        boxes = np.array([[v, v, v + 10, v + 10]], dtype=np.float32)
+        return img, boxes, boxes, [], np.ones(1, np.float32), np.zeros(1, np.int32)
+
+
+class _StubTracker(object):
+
+    profiler = NULL_PROFILER
+
+    def update(self, boxes_xyxy, boxes_conf, boxes_cls=None, img=None):
+        return boxes_xyxy, np.arange(len(boxes_xyxy), dtype=np.int64) + 1
+
+
+def _frames(n, size=8):
+    return [np.full((size, size, 3), i % 256, dtype=np.uint8) for i in range(n)]
+
+
+@pytest.fixture
+def stub_vsense(monkeypatch):
+    def make(delay=0.0):
+        monkeypatch.setattr(vsense_module, "checkDet", lambda **kwargs: _StubDetector(delay))
+        monkeypatch.setattr(vsense_module, "checkTrk", lambda **kwargs: _StubTracker())
+        return VSense()
+    return make
+
+
+def test_pipeline_keeps_the_order(stub_vsense):
+    vsense = stub_vsense()
+    frames = list(Pipeline(vsense, _frames(30), trk_config_yaml=None, render=None))
+    assert [f.index for f in frames] == list(range(30))
+    for f in frames:
+        assert f.assets.boxes_xyxy[0, 0] == f.index and f.assets.ids[0] == 1
+        assert f.output is None
+
+
+def test_pipeline_skips_the_track_stage(stub_vsense):
+    frames = list(Pipeline(stub_vsense(), _frames(5), trk_config_yaml=False, render=None))
+    assert len(frames) == 5
+    assert all(f.assets.ids is None or len(f.assets.ids) == 0 for f in frames)
+
+
+def test_pipeline_render(stub_vsense):
+    frames = list(Pipeline(stub_vsense(), _frames(5, size=64), trk_config_yaml=None))
+    for f in frames:
+        assert f.output.shape == (64, 64, 3)
+    frames = list(Pipeline(stub_vsense(), _frames(5), trk_config_yaml=None,
+                           render=lambda img, assets: (img.shape, assets.ids.tolist())))
+    assert [f.output for f in frames] == [((8, 8, 3), [1])] * 5
+
+
+def test_pipeline_drops_oldest(stub_vsense):
+    vsense = stub_vsense(delay=0.005)
+    pipeline = Pipeline(vsense, _frames(60), trk_config_yaml=False, render=None, queue_size=1,
+                        drop_policy="drop_oldest")
+    indices = [f.index for f in pipeline]
+    assert indices == sorted(indices) and indices[-1] == 59
+    assert len(indices) + pipeline.dropped == 60
+
+
+def test_pipeline_drops_newest(stub_vsense):
+    vsense = stub_vsense(delay=0.005)
+    pipeline = Pipeline(vsense, _frames(60), trk_config_yaml=False, render=None, queue_size=1,
+                        drop_policy="drop_newest")
+    indices = [f.index for f in pipeline]
+    assert indices == sorted(indices) and indices[0] == 0
+    assert pipeline.dropped > 0 and len(indices) + pipeline.dropped == 60
+
+
+def test_pipeline_raises_the_stage_error(stub_vsense):
+    def render(img, assets):
+        if img[0, 0, 0] == 5: raise RuntimeError("render failed")
+        return img
+    pipeline = Pipeline(stub_vsense(), _frames(100), trk_config_yaml=None, render=render)
+    indices = []
+    with pytest.raises(RuntimeError, match="render failed"):
+        for f in pipeline:
+            indices.append(f.index)
+    assert indices == [0, 1, 2, 3, 4]
+    assert not any(t.is_alive() for t in pipeline._threads)
+
+
+def test_pipeline_stops_on_break(stub_vsense):
+    with Pipeline(stub_vsense(), _frames(1000), trk_config_yaml=None, render=None,
+                  queue_size=2) as pipeline:
+        for f in pipeline:
+            if f.index == 3: break
+    assert not any(t.is_alive() for t in pipeline._threads)
+
+
+def test_pipeline_bad_drop_policy(stub_vsense):
+    with pytest.raises(ValueError):
+        Pipeline(stub_vsense(), _frames(1), drop_policy="drop_all")
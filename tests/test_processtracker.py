@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from vsensebox.config.confighelper import getCFGDict
+from vsensebox.config.configurator import TRK_CONFIG_DIR
+from vsensebox.modules.trackers import checkTrk
+from vsensebox.modules.trackers.processtracker import ProcessTracker
+from vsensebox.modules.trackers.utils import sort
+
+
+def _config(name, encoder_file):
+    config = getCFGDict(TRK_CONFIG_DIR + "/" + name + ".yaml")
+    if name == "deepsort":
+        config.update(model_file=encoder_file, encoder_backend="opencv")
+    return config
+
+
+@pytest.mark.parametrize("name", ["sort", "deepsort", "centroid", "basiciou"])
+def test_same_ids_in_process_and_in_worker(name, encoder_file):
+    config = _config(name, encoder_file)
+    # The SORT IDs count from a class attribute, which the worker process starts at 0
+    sort.KalmanBoxTracker.count = 0
+    local = checkTrk(tracker=None, config_yaml=config, relative_to_vsensebox_root=False)
+    remote = ProcessTracker(config, capacity=4)
+    try:
+        rng = np.random.default_rng(0)
+        img = rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+        start = rng.uniform(0, 1000, (12, 2))
+        speed = rng.uniform(-6, 6, (12, 2))
+        seen = set()
+        for f in range(30):
+            xy = start + f * speed
+            boxes = np.hstack([xy, xy + [60, 120]])
+            shown = rng.random(len(boxes)) > 0.1
+            boxes = boxes[shown] + rng.normal(0, 1, (shown.sum(), 4))
+            conf = rng.uniform(0.5, 1, len(boxes))
+            cls = np.arange(12)[shown] % 2
+            _, ids = local.update(boxes.copy(), conf.copy(), cls.copy(), img=img)
+            _, remote_ids = remote.update(boxes, conf, cls, img=img)
+            assert np.array_equal(np.asarray(ids), remote_ids), f
+            seen.update(remote_ids.tolist())
+        assert len(seen) >= 12
+    finally:
+        remote.close()
@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+
+from vsensebox.utils.profiletools import StageProfiler, NULL_PROFILER
+from vsensebox.vsense import scheduler
+from vsensebox.vsense.scheduler import DetectorPool
+from vsensebox.vsense.vsense import VSense
+
+
+class _StubDetector(object):
+
+    profiler = NULL_PROFILER
+
+    def detect(self, img):
+        self.profiler.record("detect.inference", 0.002)
+        boxes = np.array([[0, 0, 10, 20]], dtype=np.float32)
+        return img, boxes, boxes, [], np.ones(1, np.float32), np.zeros(1, np.int32)
+
+    def detect_batch(self, imgs):
+        return [self.detect(img) for img in imgs]
+
+
+def test_stats():
+    profiler = StageProfiler(capacity=4)
+    for ms in (1, 2, 3, 4, 5, 6):
+        profiler.record("stage", ms / 1000.0)
+    stats = profiler.getStats()["stage"]
+    # The count covers all the samples, the statistics the last 4 ones
+    assert stats["count"] == 6
+    assert np.isclose(stats["mean"], 4.5) and np.isclose(stats["max"], 6.0)
+    with profiler.stage("block"):
+        pass
+    assert profiler.getStats()["block"]["count"] == 1
+    profiler.reset()
+    assert profiler.getStats() == {}
+    assert NULL_PROFILER.getStats() == {}
+
+
+def test_record_from_threads():
+    profiler = StageProfiler(capacity=64)
+
+    def work():
+        for _ in range(2000):
+            profiler.record("stage", 0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert profiler.getStats()["stage"]["count"] == 16000
+
+
+def test_shared_detector_records_in_the_caller_profiler(monkeypatch):
+    monkeypatch.setattr(scheduler, "checkDet", lambda **kwargs: _StubDetector())
+    pool = DetectorPool()
+    config = {"detector": "stub"}
+    first, second = VSense(profile=True, detector_pool=pool), VSense(profile=True, detector_pool=pool)
+    img = np.zeros((32, 32, 3), dtype=np.uint8)
+    for _ in range(3):
+        first.detect(img, config_yaml=config, img_is_mat=True)
+    second.detect_batch([img, img], config_yaml=config, imgs_are_mat=True)
+    assert len(pool) == 1
+    assert first.profiler.getStats()["detect.inference"]["count"] == 3
+    assert second.profiler.getStats()["detect.inference"]["count"] == 2
+    assert len(first.assets) == 1
+
+
+def test_deepsort_stages():
+    from vsensebox.config.confighelper import getCFGDict
+    from vsensebox.config.configurator import TRK_CONFIG_DIR, TCFG_DeepSORT
+    from vsensebox.modules.trackers.deepsort import DeepSORT
+
+    def encoder(img, boxes):
+        return np.asarray(boxes, dtype=np.float32).reshape(-1, 4) + 1.0
+
+    tracker = DeepSORT(TCFG_DeepSORT(getCFGDict(TRK_CONFIG_DIR + "/deepsort.yaml")), encoder=encoder)
+    tracker.profiler = StageProfiler()
+    boxes = np.array([[10., 10., 50., 90.], [200., 100., 240., 180.]])
+    for f in range(5):
+        _, ids = tracker.update(boxes + f, [0.9, 0.9], [0, 0])
+    assert sorted(ids) == [1, 2]
+    stats = tracker.profiler.getStats()
+    for stage in ("track.encode", "track.nms", "track.predict", "track.association", 
+                  "track.update", "track.ids"):
+        assert stats[stage]["count"] == 5
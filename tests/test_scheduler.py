@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import wait
+
+import numpy as np
+import pytest
+
+from vsensebox.utils.profiletools import NULL_PROFILER
+from vsensebox.vsense import scheduler
+from vsensebox.vsense.scheduler import DetectorPool, StreamScheduler
+
+
+class _StubDetector(object):
+
+    # Detects one box at the value of the first pixel, and keeps the size of its batches
+    profiler = NULL_PROFILER
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def detect(self, img):
+        return self.detect_batch([img])[0]
+
+    def detect_batch(self, imgs):
+        self.batch_sizes.append(len(imgs))
+        results = []
+        for img in imgs:
+            v = float(img[0, 0, 0])
+            boxes = np.array([[v, v, v + 10, v + 10]], dtype=np.float32)
+            results.append((img, boxes, boxes, [], np.ones(1, np.float32), np.zeros(1, np.int32)))
+        return results
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(scheduler, "checkDet", lambda **kwargs: _StubDetector())
+
+
+def _frame(v):
+    return np.full((8, 8, 3), v, dtype=np.uint8)
+
+
+def test_pool_shares_equal_configs(stub):
+    pool = DetectorPool()
+    first = pool.getDetector({"detector": "stub", "conf": 0.5})
+    assert pool.getDetector({"conf": 0.5, "detector": "stub"}) is first
+    assert pool.getDetector({"detector": "stub", "conf": 0.6}) is not first
+    assert len(pool) == 2
+
+
+def test_streams_get_their_own_results(stub):
+    with StreamScheduler({"detector": "stub"}, max_batch=4, max_wait=0.05) as sched:
+        streams = [sched.register() for _ in range(4)]
+        errors = []
+
+        def run(k, stream):
+            for f in range(10):
+                stream.detect(_frame(10 * k + f), img_is_mat=True)
+                if stream.assets.boxes_xyxy[0, 0] != 10 * k + f: errors.append((k, f))
+
+        threads = [threading.Thread(target=run, args=(k, s)) for k, s in enumerate(streams)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        assert errors == []
+        sizes = sched.detector.detector.batch_sizes
+        assert sum(sizes) == 40 and max(sizes) <= 4 and len(sizes) < 40
+
+
+def test_close_resolves_every_future(stub):
+    sched = StreamScheduler({"detector": "stub"}, max_batch=2, max_wait=0.01)
+    futures, refused = [], []
+    lock = threading.Lock()
+
+    def run():
+        for _ in range(200):
+            try:
+                future = sched.submit(_frame(1))
+            except ValueError:
+                with lock: refused.append(1)
+                return
+            with lock: futures.append(future)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads: t.start()
+    sched.close()
+    for t in threads: t.join()
+    done, not_done = wait(futures, timeout=5)
+    assert len(not_done) == 0
+    with pytest.raises(ValueError):
+        sched.submit(_frame(1))
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from vsensebox.config.configurator import TCFG_SORT, TRK_CONFIG_DIR
+from vsensebox.modules.trackers.sort import SORT
+from vsensebox.modules.trackers.utils import sort
+
+
+def _stream(num_frames=120, num_objects=40, seed=0):
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(0, 800, (num_objects, 2))
+    vel = rng.normal(0, 3, (num_objects, 2))
+    wh = rng.uniform(20, 80, (num_objects, 2))
+    frames = []
+    for f in range(num_frames):
+        pos += vel
+        shown = rng.random(num_objects) > 0.1
+        dets = np.concatenate([pos[shown], pos[shown] + wh[shown], rng.random((shown.sum(), 1))], 1)
+        dets[:, :4] += rng.normal(0, 1, (shown.sum(), 4))
+        if f % 40 == 39: dets = np.empty((0, 5))
+        frames.append(dets)
+    return frames
+
+
+@pytest.mark.parametrize("max_age, min_hits", [(1, 3), (3, 3), (5, 1)])
+def test_batch_sort_matches_sort(max_age, min_hits):
+    frames = _stream()
+    sort.KalmanBoxTracker.count = 0
+    reference = sort.Sort(max_age=max_age, min_hits=min_hits)
+    expected = [reference.update(dets) for dets in frames]
+    sort.KalmanBoxTracker.count = 0
+    batched = sort.BatchSort(max_age=max_age, min_hits=min_hits)
+    for dets, ref in zip(frames, expected):
+        out = batched.update(dets)
+        assert out.shape == ref.shape
+        assert np.array_equal(out[:, 4], ref[:, 4])
+        assert np.allclose(out[:, :4], ref[:, :4], atol=1e-6)
+
+
+def test_batch_sort_detection_indices():
+    sort.KalmanBoxTracker.count = 0
+    tracker = sort.BatchSort(max_age=3, min_hits=1)
+    for dets in _stream(num_frames=30):
+        out, indices = tracker.update(dets, return_indices=True)
+        assert len(out) == len(indices)
+        # Every returned object comes from the detection it was matched to in this frame
+        if len(out) > 0:
+            iou = sort.iou_batch(out[:, :4], dets[indices, :4])
+            assert (np.diag(iou) > 0.5).all()
+
+
+def test_ids_follow_shuffled_boxes():
+    tracker = SORT(TCFG_SORT(TRK_CONFIG_DIR + "/sort.yaml"))
+    rng = np.random.default_rng(4)
+    start = rng.uniform(0, 600, (10, 2))
+    ids_of = {}
+    for f in range(20):
+        order = rng.permutation(10)
+        xy = start[order] + 4 * f
+        boxes = np.hstack([xy, xy + 50])
+        _, ids = tracker.update(boxes, np.ones(10), np.zeros(10, dtype=int))
+        assert len(ids) == 10
+        for obj, i in zip(order, ids):
+            if i < 0: continue
+            assert ids_of.setdefault(obj, i) == i
+    assert len(set(ids_of.values())) == 10
+
+
+def _moving(f, num_objects=3):
+    xy = np.column_stack([100. * np.arange(num_objects) + 5 * f, np.full(num_objects, 50. + 2 * f)])
+    return np.hstack([xy, xy + [40, 80], np.ones((num_objects, 1))])
+
+
+def test_batch_sort_coast():
+    sort.KalmanBoxTracker.count = 0
+    tracker = sort.BatchSort(max_age=1, min_hits=1)
+    for f in range(6):
+        out = tracker.update(_moving(f))
+    ids = np.sort(out[:, 4])
+    uncertainty = tracker.uncertainty()
+    for f in range(6, 9):
+        coasted = tracker.coast()
+        # The tracks keep moving and are not counted as missed
+        assert np.array_equal(np.sort(coasted[:, 4]), ids)
+        order = np.argsort(coasted[:, 4])
+        assert np.allclose(coasted[order, :4], _moving(f)[:, :4], atol=2)
+        assert (tracker.uncertainty() > uncertainty).all()
+        uncertainty = tracker.uncertainty()
+    out = tracker.update(_moving(9))
+    assert np.array_equal(np.sort(out[:, 4]), ids)
+
+
+def test_sort_predict():
+    tracker = SORT(TCFG_SORT(TRK_CONFIG_DIR + "/sort.yaml"))
+    boxes, ids = tracker.predict()
+    assert boxes.shape == (0, 4) and len(ids) == 0 and tracker.getUncertainty() == 0.0
+    for f in range(6):
+        dets = _moving(f)
+        _, tracked_ids = tracker.update(dets[:, :4], dets[:, 4], np.zeros(3, dtype=int))
+    boxes, ids = tracker.predict()
+    assert ids.dtype == np.int64 and sorted(ids) == sorted(tracked_ids)
+    assert tracker.getUncertainty() > 0
+    _, next_ids = tracker.update(_moving(7)[:, :4], np.ones(3), np.zeros(3, dtype=int))
+    assert np.array_equal(next_ids, tracked_ids)
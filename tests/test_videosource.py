@@ -0,0 +1,44 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from vsensebox.vsense.videosource import VideoSource, putFrame
+
+
+def _frames(n):
+    return [np.full((8, 8, 3), i, dtype=np.uint8) for i in range(n)]
+
+
+def test_put_frame_policies():
+    stop_event = threading.Event()
+    q = queue.Queue(maxsize=2)
+    assert putFrame(q, 1, stop_event) == 0
+    assert putFrame(q, 2, stop_event) == 0
+    assert putFrame(q, 3, stop_event, "drop_newest") == 1
+    assert putFrame(q, 4, stop_event, "drop_oldest") == 1
+    assert [q.get_nowait(), q.get_nowait()] == [2, 4]
+    # A full queue blocks until the stop event is set
+    q.put(5)
+    q.put(6)
+    stop_event.set()
+    assert putFrame(q, 7, stop_event) == 0
+    assert q.qsize() == 2
+
+
+def test_video_source_stride():
+    frames = _frames(10)
+    indices = [index for index, img in VideoSource(frames, stride=3)]
+    assert indices == [0, 3, 6, 9]
+
+
+def test_video_source_latest_only():
+    source = VideoSource(_frames(50), latest_only=True)
+    indices = []
+    for index, img in source:
+        assert img[0, 0, 0] == index
+        indices.append(index)
+        time.sleep(0.005)
+    assert indices == sorted(indices) and indices[-1] == 49
+    assert len(indices) + source.dropped == 50
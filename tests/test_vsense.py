@@ -0,0 +1,254 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from vsensebox.config.configurator import TRK_CONFIG_DIR
+from vsensebox.modules.detectors.yolo_classic import YOLO_Classic
+from vsensebox.utils.profiletools import NULL_PROFILER
+from vsensebox.vsense import vsense as vsense_module
+from vsensebox.vsense.vsense import VSense, VSenseAssets
+
+
+class _StubDetector(object):
+
+    # Detects one box per unit of the first pixel, and counts the forward passes
+    profiler = NULL_PROFILER
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, img):
+        return self.detect_batch([img])[0]
+
+    def detect_batch(self, imgs):
+        self.calls += 1
+        results = []
+        for img in imgs:
+            n = int(img[0, 0, 0])
+            boxes_xywh = np.array([[10 * i, 5, 8, 16] for i in range(n)], dtype=np.float32).reshape(-1, 4)
+            boxes_xyxy = boxes_xywh.copy()
+            boxes_xyxy[:, 2:] += boxes_xyxy[:, :2]
+            results.append((img, boxes_xywh, boxes_xyxy, [], np.full(n, 0.5, np.float32),
+                            np.arange(n, dtype=np.int32)))
+        return results
+
+
+@pytest.fixture
+def detectors(monkeypatch):
+    created = []
+
+    def checkDet(**kwargs):
+        created.append(_StubDetector())
+        return created[-1]
+
+    monkeypatch.setattr(vsense_module, "checkDet", checkDet)
+    return created
+
+
+def _frame(n):
+    return np.full((16, 16, 3), n, dtype=np.uint8)
+
+
+def test_detect_batch(detectors):
+    vsense = VSense()
+    batch = vsense.detect_batch([_frame(n) for n in (2, 0, 3)], imgs_are_mat=True)
+    assert [len(assets) for assets in batch] == [2, 0, 3]
+    assert detectors[0].calls == 1
+    assert np.array_equal(batch[2].boxes_xyxy[1], [10, 5, 18, 21])
+    assert np.array_equal(batch[2].boxes_cls, [0, 1, 2])
+    # The results are returned, not stored in the assets of VSense
+    assert len(vsense.assets) == 0
+    vsense.detect(_frame(1), img_is_mat=True)
+    assert len(vsense.assets) == 1 and len(detectors) == 1
+
+
+class _StubNet(object):
+
+    # Returns two darknet region outputs of shape (N * rows, 5 + classes)
+    def __init__(self, outs):
+        self.outs = outs
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self, names):
+        return self.outs
+
+
+def test_yolo_classic_detect_batch():
+    detector = YOLO_Classic.__new__(YOLO_Classic)
+    detector.cfg = SimpleNamespace(classes=None, min_width=5, conf=0.5, nms=0.4, imgsz=32)
+    detector.out_names = ["a", "b"]
+
+    def row(x, y, w, h, cls, score):
+        r = np.zeros(5 + 3, dtype=np.float32)
+        r[:4] = (x, y, w, h)
+        r[5 + cls] = score
+        return r
+
+    # Per image: a box, its duplicate of lower score, a box under the threshold,
+    # and, in the second output, a box of another class at the same place
+    first = [[row(0.25, 0.25, 0.2, 0.2, 0, 0.9), row(0.26, 0.25, 0.2, 0.2, 0, 0.8)],
+             [row(0.75, 0.5, 0.1, 0.4, 1, 0.7), row(0.5, 0.5, 0.3, 0.3, 2, 0.1)]]
+    second = [[row(0.25, 0.25, 0.2, 0.2, 2, 0.6)], [row(0.5, 0.5, 0.5, 0.5, 0, 0.95)]]
+    outs = (np.array(first).reshape(-1, 8), np.array(second).reshape(-1, 8))
+    detector.net = _StubNet(outs)
+    imgs = [np.zeros((100, 200, 3), np.uint8), np.zeros((50, 100, 3), np.uint8)]
+    results = detector.detect_batch(imgs)
+    assert detector.net.blob.shape == (2, 3, 32, 32)
+    _, boxes_xywh, boxes_xyxy, _, confs, cls = results[0]
+    order = np.argsort(-confs)
+    assert np.allclose(confs[order], [0.9, 0.6]) and np.array_equal(cls[order], [0, 2])
+    assert np.array_equal(boxes_xywh[order[0]], [30, 15, 40, 20])
+    _, boxes_xywh, boxes_xyxy, _, confs, cls = results[1]
+    order = np.argsort(-confs)
+    assert np.allclose(confs[order], [0.95, 0.7]) and np.array_equal(cls[order], [0, 1])
+    assert np.array_equal(boxes_xyxy[order[1]], [70, 15, 80, 35])
+
+
+class _RegionModel(object):
+
+    # The decoding of darknet region outputs by cv::dnn::DetectionModel, one box at a time
+    def __init__(self, outs):
+        self.outs = outs
+
+    def detect(self, img, confThreshold, nmsThreshold):
+        frame_h, frame_w = img.shape[:2]
+        classes, confidences, boxes = [], [], []
+        for row in np.concatenate(self.outs):
+            class_id = int(np.argmax(row[5:]))
+            if row[5 + class_id] < confThreshold: continue
+            center_x, center_y = int(row[0] * frame_w), int(row[1] * frame_h)
+            width, height = int(row[2] * frame_w), int(row[3] * frame_h)
+            left = max(0, min(center_x - int(width / 2), frame_w - 1))
+            top = max(0, min(center_y - int(height / 2), frame_h - 1))
+            classes.append(class_id)
+            confidences.append(float(row[5 + class_id]))
+            boxes.append([left, top, max(1, min(width, frame_w - left)),
+                          max(1, min(height, frame_h - top))])
+        keep = []
+        for c in set(classes):
+            indices = [i for i in range(len(classes)) if classes[i] == c]
+            kept = cv2.dnn.NMSBoxes([boxes[i] for i in indices], [confidences[i] for i in indices],
+                                    confThreshold, nmsThreshold)
+            keep += [indices[k] for k in np.asarray(kept, dtype=int).flatten()]
+        return (np.array(classes)[keep], np.array(confidences, np.float32)[keep],
+                np.array(boxes).reshape(-1, 4)[keep])
+
+
+def test_yolo_classic_detect_batch_matches_detect():
+    rng = np.random.default_rng(3)
+    detector = YOLO_Classic.__new__(YOLO_Classic)
+    detector.cfg = SimpleNamespace(classes=None, min_width=1, conf=0.5, nms=0.4, imgsz=32)
+    detector.out_names = ["a", "b"]
+    # Fractional centers, and boxes crossing the borders of the frame
+    outs = [np.column_stack([rng.uniform(-0.1, 1.1, (n, 2)), rng.uniform(0.01, 0.4, (n, 2)),
+                             np.zeros(n), rng.random((n, 4))]).astype(np.float32) for n in (60, 30)]
+    img = np.zeros((97, 131, 3), np.uint8)
+    detector.net = _StubNet(outs)
+    detector.model = _RegionModel(outs)
+    expected = detector.detect(img)
+    result = detector.detect_batch([img])[0]
+    assert len(expected[1]) > 10 and len(result[1]) == len(expected[1])
+    for e, r in zip(expected[1:], result[1:]):
+        if len(e) == 0: continue
+        assert np.array_equal(np.asarray(e)[np.lexsort(expected[1].T)],
+                              np.asarray(r)[np.lexsort(result[1].T)])
+
+
+def test_assets_layout():
+    assets = VSenseAssets()
+    assert assets.boxes.shape == (0, 8) and len(assets) == 0 and assets.ids.dtype == np.int64
+    assets.update(boxes_xyxy=[[1, 2, 11, 22], [5, 5, 6, 9]], boxes_conf=[0.9, 0.4],
+                  boxes_cls=[3, 1], ids=[7, 8])
+    assert assets.boxes.dtype == np.float32 and assets.boxes.flags["C_CONTIGUOUS"]
+    assert np.array_equal(assets.boxes[0], [1, 2, 11, 22, 1, 2, 10, 20])
+    # boxes_xyxy and boxes_xywh are views of the same rows
+    assert np.shares_memory(assets.boxes_xyxy, assets.boxes)
+    assert np.shares_memory(assets.boxes_xywh, assets.boxes)
+    assets.update(boxes_xywh=np.array([[1, 2, 10, 20]]))
+    assert np.array_equal(assets.boxes_xyxy, [[1, 2, 11, 22]])
+    assert len(assets.ids) == 0 and len(assets.boxes_conf) == 0
+    assets.boxes_xyxy = [[0, 0, 4, 8]]
+    assert np.array_equal(assets.boxes_xywh, [[0, 0, 4, 8]])
+
+
+def test_assets_as_list():
+    assets = VSenseAssets()
+    assets.update(boxes_xyxy=[[1, 2, 11, 22], [5, 5, 6, 9]], boxes_conf=[0.5, 0.25],
+                  boxes_cls=[3, 1], ids=[7, 8], masks=[None])
+    boxes = assets.asList("boxes_xyxy")
+    assert isinstance(boxes, list) and len(boxes) == 2
+    assert np.array_equal(boxes[1], [5, 5, 6, 9])
+    assert assets.asList("boxes_conf") == [0.5, 0.25]
+    assert assets.asList("ids") == [7, 8] and isinstance(assets.asList("ids")[0], int)
+    assert assets.asList("boxes_cls") == [3, 1]
+    assert assets.asList("masks") == [None] and assets.asList("keypoints") == []
+
+
+class _MovingDetector(_StubDetector):
+
+    # Detects three boxes moving by (5, 2) per unit of the first pixel
+    def detect_batch(self, imgs):
+        self.calls += 1
+        results = []
+        for img in imgs:
+            f = float(img[0, 0, 0])
+            xy = np.column_stack([100. * np.arange(3) + 5 * f, np.full(3, 50. + 2 * f)])
+            boxes_xyxy = np.hstack([xy, xy + [40, 80]]).astype(np.float32)
+            boxes_xywh = np.hstack([xy, np.tile([40, 80], (3, 1))]).astype(np.float32)
+            results.append((img, boxes_xywh, boxes_xyxy, [],
+                            np.array([0.9, 0.8, 0.7], np.float32), np.array([4, 5, 6], np.int32)))
+        return results
+
+
+@pytest.fixture
+def moving_detector(monkeypatch):
+    detector = _MovingDetector()
+    monkeypatch.setattr(vsense_module, "checkDet", lambda **kwargs: detector)
+    return detector
+
+
+def test_run_keyframe_interval(moving_detector):
+    vsense = VSense()
+    frames = [_frame(f) for f in range(12)]
+    conf_of, ids = {}, set()
+    for index, img, assets in vsense.run(frames, keyframe_interval=3):
+        assert len(assets) == 3 and vsense.assets is assets
+        # The predicted boxes follow the objects, which keep their IDs, confidences and classes
+        for box, i, conf, cls in zip(assets.boxes_xyxy, assets.ids, assets.boxes_conf,
+                                     assets.boxes_cls):
+            assert conf_of.setdefault(int(i), (round(float(conf), 2), int(cls))) == \
+                (round(float(conf), 2), int(cls))
+            # The velocity is known from the second keyframe
+            if index > 3: assert abs(box[0] - (5 * index + 100 * (cls - 4))) < 1
+        ids.update(assets.ids.tolist())
+    assert moving_detector.calls == 4 and len(ids) == 3
+
+
+def test_run_max_uncertainty(moving_detector):
+    frames = [_frame(f) for f in range(20)]
+    list(VSense().run(frames[:6], keyframe_interval=10, max_uncertainty=0.0))
+    # Every tracked object is uncertain, so every frame is a keyframe
+    assert moving_detector.calls == 6
+    moving_detector.calls = 0
+    ids = set()
+    for index, img, assets in VSense().run(frames, keyframe_interval=10, max_uncertainty=0.5):
+        ids.update(assets.ids.tolist())
+    # The velocity is unknown after the first keyframe, then the uncertainty grows
+    # from one keyframe to the next until the interval is reached
+    assert moving_detector.calls == 4 and len(ids) == 3
+
+
+def test_predict_needs_a_predicting_tracker(moving_detector):
+    vsense = VSense()
+    centroid_yaml = TRK_CONFIG_DIR + "/centroid.yaml"
+    assert not vsense.canPredict(centroid_yaml)
+    with pytest.raises(ValueError):
+        vsense.predict(config_yaml=centroid_yaml)
+    # Without a tracker which can predict, every frame is a keyframe
+    list(vsense.run([_frame(f) for f in range(4)], trk_config_yaml=centroid_yaml,
+                    keyframe_interval=2))
+    assert moving_detector.calls == 4
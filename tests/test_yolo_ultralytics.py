@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from vsensebox.modules.detectors.yolo_ultralytics import YOLO_Ultralytics, extractResult
+
+
+class _StubModel(object):
+
+    # Returns prepared Ultralytics-like results instead of running a network
+    def __init__(self, results):
+        self.results = results
+
+    def predict(self, source, **kwargs):
+        n = len(source) if isinstance(source, list) else 1
+        return self.results[:n]
+
+
+def _result(boxes, keypoints=None):
+    data = torch.tensor(boxes, dtype=torch.float32).reshape(-1, 6)
+    kpts = None
+    if keypoints is not None:
+        kpts = SimpleNamespace(data=torch.tensor(keypoints, dtype=torch.float32).reshape(-1, 17, 3))
+    return SimpleNamespace(boxes=SimpleNamespace(data=data), keypoints=kpts,
+                           speed={"preprocess": 1.0, "inference": 2.0, "postprocess": 0.5})
+
+
+def _detector(results, min_width=10, classes=None):
+    detector = YOLO_Ultralytics.__new__(YOLO_Ultralytics)
+    detector.cfg = SimpleNamespace(imgsz=640, conf=0.25, classes=classes, device="cpu", max_det=100,
+                                   line_width=None, min_width=min_width, model_file="stub.pt")
+    detector.model = _StubModel(results)
+    return detector
+
+
+def _pose_boxes():
+    boxes = [[10.7, 20.2, 60.9, 140.5, 0.9, 0],
+             [200., 50., 205., 90., 0.8, 0],
+             [300.2, 10., 380., 200., 0.7, 0]]
+    # The keypoints of every person are inside its box
+    keypoints = [[[b[0] + 1 + k, b[1] + 1 + k, 0.5] for k in range(17)] for b in boxes]
+    return boxes, keypoints
+
+
+def test_extract_result():
+    boxes, keypoints = _pose_boxes()
+    xyxy, conf, cls, kpts = extractResult(_result(boxes, keypoints))
+    assert xyxy.shape == (3, 4) and kpts.shape == (3, 17, 3)
+    assert np.allclose(xyxy, np.array(boxes)[:, :4])
+    assert np.allclose(conf, [0.9, 0.8, 0.7]) and np.allclose(cls, 0)
+    assert np.allclose(kpts, keypoints)
+    xyxy, conf, cls, kpts = extractResult(_result(boxes))
+    assert len(xyxy) == 3 and kpts is None
+
+
+def test_extract_result_without_boxes():
+    xyxy, conf, cls, kpts = extractResult(_result(np.zeros((0, 6)), np.zeros((0, 17, 3))))
+    assert xyxy.shape == (0, 4) and conf.shape == (0,) and kpts.shape == (0, 17, 3)
+
+
+def test_detect():
+    boxes, keypoints = _pose_boxes()
+    detector = _detector([_result(boxes, keypoints)])
+    img = np.zeros((240, 400, 3), dtype=np.uint8)
+    _, boxes_xywh, boxes_xyxy, kpts, confs, cls = detector.detect(img)
+    # The narrow box is filtered out by min_width, the others are truncated to whole pixels
+    assert np.array_equal(boxes_xyxy, [[10, 20, 60, 140], [300, 10, 380, 200]])
+    assert np.array_equal(boxes_xywh, [[10, 20, 50, 120], [300, 10, 80, 190]])
+    assert np.allclose(confs, [0.9, 0.7]) and cls.dtype == np.int32
+    # The keypoints stay aligned with their boxes
+    assert np.allclose(kpts, np.array(keypoints)[[0, 2]])
+    inside = (kpts[:, :, :2] >= boxes_xyxy[:, None, :2]) & (kpts[:, :, :2] <= boxes_xyxy[:, None, 2:])
+    assert inside.all()
+
+
+def test_detect_without_boxes():
+    detector = _detector([_result(np.zeros((0, 6)), np.zeros((0, 17, 3)))])
+    _, boxes_xywh, boxes_xyxy, kpts, confs, cls = detector.detect(np.zeros((8, 8, 3), np.uint8))
+    assert boxes_xywh.shape == (0, 4) and boxes_xyxy.shape == (0, 4)
+    assert len(kpts) == 0 and len(confs) == 0 and len(cls) == 0
+
+
+def test_detect_batch_class_filter():
+    boxes = [[0., 0., 50., 50., 0.9, 1], [0., 0., 50., 50., 0.8, 2]]
+    detector = _detector([_result(boxes), _result(boxes[::-1])], classes=[2])
+    results = detector.detect_batch([np.zeros((8, 8, 3), np.uint8)] * 2)
+    assert len(results) == 2
+    for _, _, _, kpts, confs, cls in results:
+        assert np.array_equal(cls, [2]) and np.allclose(confs, [0.8]) and kpts == []
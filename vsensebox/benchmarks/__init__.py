@@ -0,0 +1,17 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+from .streams import SyntheticCrowd, MOTDetections
+from .runner import TRACKER_NAMES, StubEncoder, createTracker, benchmarkTracker, runBenchmarks
+
+__all__ = (
+    "SyntheticCrowd", 
+    "MOTDetections", 
+    "TRACKER_NAMES", 
+    "StubEncoder", 
+    "createTracker", 
+    "benchmarkTracker", 
+    "runBenchmarks"
+)
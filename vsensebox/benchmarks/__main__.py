@@ -0,0 +1,59 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import argparse
+
+from vsensebox.benchmarks.streams import SyntheticCrowd, MOTDetections
+from vsensebox.benchmarks.runner import TRACKER_NAMES, runBenchmarks
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m vsensebox.benchmarks",
+        description="Benchmark the trackers of VSenseBox on CPU, offline.")
+    parser.add_argument("--trackers", nargs="+", default=list(TRACKER_NAMES),
+                        help="Trackers to benchmark.")
+    parser.add_argument("--mot", default=None,
+                        help="Path of a MOTChallenge det.txt file, instead of a synthetic crowd.")
+    parser.add_argument("--min-conf", type=float, default=None,
+                        help="Minimum confidence of the MOTChallenge detections.")
+    parser.add_argument("--objects", type=int, default=100, help="Objects of the synthetic crowd.")
+    parser.add_argument("--frames", type=int, default=300, help="Frames of the synthetic crowd.")
+    parser.add_argument("--speed", type=float, default=4.0, 
+                        help="Mean speed in pixels per frame of the synthetic crowd.")
+    parser.add_argument("--occlusion", type=float, default=0.05,
+                        help="Probability that an object of the synthetic crowd is missed.")
+    parser.add_argument("--jitter", type=float, default=1.0,
+                        help="Noise in pixels of the boxes of the synthetic crowd.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic crowd.")
+    parser.add_argument("--warmup", type=int, default=10,
+                        help="First frames excluded from the latency statistics.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the memory measurement.")
+    parser.add_argument("--output", default=None, help="Path of the JSON report.")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.mot is not None:
+        stream = MOTDetections(args.mot, min_conf=args.min_conf)
+    else:
+        stream = SyntheticCrowd(
+            num_objects=args.objects, 
+            num_frames=args.frames, 
+            speed=args.speed, 
+            occlusion=args.occlusion, 
+            jitter=args.jitter, 
+            seed=args.seed
+        )
+    runBenchmarks(
+        stream, 
+        trackers=args.trackers, 
+        warmup=args.warmup, 
+        measure_memory=not args.no_memory, 
+        output_json=args.output
+    )
+
+if __name__ == "__main__":
+    main()
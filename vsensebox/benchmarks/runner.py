@@ -0,0 +1,264 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import gc
+import json
+import platform
+import tracemalloc
+import numpy as np
+from time import perf_counter
+
+from vsensebox.config.strings import USTR
+from vsensebox.config.confighelper import getCFGDict
+from vsensebox.config.configurator import (TRK_CONFIG_DIR, TCFG_Centroid, TCFG_SORT,
+                                           TCFG_DeepSORT, TCFG_BasicIoU)
+from vsensebox.utils.commontools import joinFPathFull, getAbsPathFDS
+from vsensebox.utils.logtools import add_info_log, add_error_log
+
+TRACKER_NAMES = ("Centroid", "BasicIoU", "SORT", "DeepSORT")
+
+
+class StubEncoder(object):
+
+    """A box encoder for DeepSORT which does not need TensorFlow nor the image: every
+    box gets a fixed random unit feature per ground-truth object, given beforehand with
+    :meth:`setLabels`, or a fresh random unit feature when its object is unknown.
+
+    Attributes
+    ----------
+    dim : int
+        Dimension of the features.
+    """
+
+    def __init__(self, dim=128, seed=0):
+        """Construct a StubEncoder.
+
+        Parameters
+        ----------
+        dim : int, default=128
+            Dimension of the features.
+        seed : int, default=0
+            Seed of the random generator.
+        """
+        self.dim = int(dim)
+        self._rng = np.random.default_rng(seed)
+        self._table = np.zeros((0, self.dim), dtype=np.float32)
+        self._labels = None
+
+    def _getRandomFeatures(self, n):
+        features = self._rng.normal(size=(n, self.dim)).astype(np.float32)
+        features /= np.linalg.norm(features, axis=1, keepdims=True)
+        return features
+
+    def setLabels(self, labels):
+        """Set the ground-truth object of every box of the next call.
+
+        Parameters
+        ----------
+        labels : ndarray[int64] or None
+            An array of object identities, -1 where unknown.
+        """
+        self._labels = labels
+        if labels is not None and len(labels) > 0 and labels.max() >= len(self._table):
+            grow = max(int(labels.max()) + 1, 2 * len(self._table)) - len(self._table)
+            self._table = np.concatenate((self._table, self._getRandomFeatures(grow)))
+
+    def __call__(self, img, boxes):
+        labels, self._labels = self._labels, None
+        if labels is None or len(labels) != len(boxes):
+            return self._getRandomFeatures(len(boxes))
+        features = np.empty((len(labels), self.dim), dtype=np.float32)
+        known = labels >= 0
+        features[known] = self._table[labels[known]]
+        features[~known] = self._getRandomFeatures(len(labels) - np.count_nonzero(known))
+        return features
+
+
+def createTracker(name, config=None, encoder=None):
+    """Create a tracker from its internal configuration file, with optional overrides.
+
+    Parameters
+    ----------
+    name : str
+        Name of the tracker; for example, :code:`"SORT"`.
+    config : dict, default=None
+        A dictionary of parameters which override the internal configuration.
+    encoder : callable, default=None
+        Box encoder of DeepSORT, a :class:`StubEncoder` if None.
+
+    Returns
+    -------
+    tracker object
+        A tracker object; for example, :class:`Centroid` or :class:`SORT`.
+    """
+    from vsensebox.modules.trackers.centroid import Centroid
+    from vsensebox.modules.trackers.basiciou import BasicIoU
+    from vsensebox.modules.trackers.sort import SORT
+    from vsensebox.modules.trackers.deepsort import DeepSORT
+    trackers = {
+        USTR.getUnifiedFormat('centroid'): ('centroid.yaml', TCFG_Centroid, Centroid),
+        USTR.getUnifiedFormat('basiciou'): ('basiciou.yaml', TCFG_BasicIoU, BasicIoU),
+        USTR.getUnifiedFormat('sort'): ('sort.yaml', TCFG_SORT, SORT),
+        USTR.getUnifiedFormat('deepsort'): ('deepsort.yaml', TCFG_DeepSORT, DeepSORT)
+    }
+    trk_name = USTR.getUnifiedFormat(name)
+    if trk_name not in trackers:
+        msg = "createTracker() -> Unknown tracker: " + str(name)
+        add_error_log(msg)
+        raise ValueError(msg)
+    yaml_name, tcfg, tracker = trackers[trk_name]
+    cfg_dict = getCFGDict(joinFPathFull(TRK_CONFIG_DIR, yaml_name))
+    if config: cfg_dict.update(config)
+    cfg = tcfg(cfg_dict, relative_to_vsensebox_root=True)
+    if trk_name == USTR.getUnifiedFormat('deepsort'):
+        return tracker(cfg, encoder=encoder if encoder is not None else StubEncoder())
+    return tracker(cfg)
+
+def _runFrames(tracker, frames):
+    encoder = getattr(tracker, "encoder", None)
+    set_labels = encoder.setLabels if isinstance(encoder, StubEncoder) else None
+    latencies = np.empty(len(frames))
+    ids = set()
+    for i, f in enumerate(frames):
+        if set_labels is not None: set_labels(f.labels)
+        start = perf_counter()
+        _, frame_ids = tracker.update(f.boxes_xyxy, f.boxes_conf, boxes_cls=f.boxes_cls, img=None)
+        latencies[i] = perf_counter() - start
+        ids.update(np.asarray(frame_ids).tolist())
+    ids.discard(-1)
+    return latencies, len(ids)
+
+def _getRSS():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+def benchmarkTracker(name, frames, config=None, warmup=10, measure_memory=True):
+    """Run the detections of :obj:`frames` through a fresh tracker and measure it.
+
+    The timing run and the memory run use two different trackers, so that the
+    overhead of :mod:`tracemalloc` does not affect the latencies.
+
+    Parameters
+    ----------
+    name : str
+        Name of the tracker; for example, :code:`"SORT"`.
+    frames : list[DetectionFrame, ...]
+        The detection frames, for example :code:`list(SyntheticCrowd())`.
+    config : dict, default=None
+        A dictionary of parameters which override the internal configuration.
+    warmup : int, default=10
+        Number of first frames excluded from the latency statistics.
+    measure_memory : bool, default=True
+        Whether to measure the memory with a second run.
+
+    Returns
+    -------
+    dict
+        The measurements: frames per second, latency percentiles in milliseconds,
+        number of distinct IDs and memory in megabytes.
+    """
+    gc.collect()
+    rss_before = _getRSS()
+    latencies, num_ids = _runFrames(createTracker(name, config), frames)
+    rss_after = _getRSS()
+    timed = np.zeros(1)
+    if len(latencies) > 0:
+        timed = latencies[min(warmup, len(latencies) - 1):] * 1000.0
+    p50, p95, p99 = np.percentile(timed, [50, 95, 99])
+    result = {
+        "tracker": name,
+        "config": config or {},
+        "frames": len(frames),
+        "detections": int(sum(len(f) for f in frames)),
+        "fps": float(len(timed) / (timed.sum() / 1000.0)) if timed.sum() > 0 else None,
+        "latency_ms": {
+            "mean": float(timed.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(timed.max())
+        },
+        "ids": num_ids,
+        "memory_mb": {
+            "peak_traced": None,
+            "rss_growth": (rss_after - rss_before) / 2**20 if rss_before is not None else None
+        }
+    }
+    if measure_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            _runFrames(createTracker(name, config), frames)
+            result["memory_mb"]["peak_traced"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result
+
+def getEnvironment():
+    """Get the versions and the machine the benchmark runs on.
+
+    :meta private:
+    """
+    from vsensebox import __version__
+    return {
+        "vsensebox": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine()
+    }
+
+def runBenchmarks(stream, trackers=TRACKER_NAMES, configs=None, warmup=10,
+                  measure_memory=True, output_json=None, terminal_log=True):
+    """Benchmark the given :obj:`trackers` on the same detection :obj:`stream`.
+
+    Parameters
+    ----------
+    stream : SyntheticCrowd or MOTDetections
+        The stream of detections.
+    trackers : list[str, ...], default=TRACKER_NAMES
+        Names of the trackers to benchmark.
+    configs : dict, default=None
+        A dictionary mapping a tracker name to a dictionary of parameters which
+        override its internal configuration.
+    warmup : int, default=10
+        Number of first frames excluded from the latency statistics.
+    measure_memory : bool, default=True
+        Whether to measure the memory with a second run of every tracker.
+    output_json : str, default=None
+        Path of the JSON file the report is written to, if given.
+    terminal_log : bool, default=True
+        Whether to print the summary table as well as logging it.
+
+    Returns
+    -------
+    dict
+        The report, with keys :code:`"environment"`, :code:`"stream"` and
+        :code:`"results"` (a list of the dictionaries of :func:`benchmarkTracker`).
+    """
+    configs = configs or {}
+    frames = list(stream)
+    report = {
+        "environment": getEnvironment(),
+        "stream": stream.getInfo(),
+        "results": [benchmarkTracker(name, frames, configs.get(name), warmup, measure_memory)
+                    for name in trackers]
+    }
+    lines = ["{:<10} {:>9} {:>9} {:>9} {:>9} {:>7} {:>10}".format(
+        "tracker", "fps", "p50 ms", "p95 ms", "p99 ms", "ids", "peak MB")]
+    for r in report["results"]:
+        peak = r["memory_mb"]["peak_traced"]
+        lines.append("{:<10} {:>9.1f} {:>9.3f} {:>9.3f} {:>9.3f} {:>7d} {:>10}".format(
+            r["tracker"], r["fps"] or 0.0, r["latency_ms"]["p50"], r["latency_ms"]["p95"],
+            r["latency_ms"]["p99"], r["ids"], "-" if peak is None else "{:.2f}".format(peak)))
+    add_info_log("Tracker benchmark:\n" + "\n".join(lines),
+                 terminal_log=terminal_log, add_new_line=True)
+    if output_json is not None:
+        with open(getAbsPathFDS(output_json), 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+    return report
@@ -0,0 +1,210 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import numpy as np
+
+from vsensebox.utils.commontools import isExist, getAbsPathFDS, getFileName
+from vsensebox.utils.logtools import add_error_log
+
+
+class DetectionFrame(object):
+
+    """One frame of a detection stream, in the format expected by the trackers.
+
+    Attributes
+    ----------
+    boxes_xyxy : ndarray[float64], shape (N, 4)
+        An array of bounding boxes; for example, [[X1, Y1, X2, Y2], ...].
+    boxes_conf : ndarray[float64], shape (N,)
+        An array of detection confidences corresponding to :attr:`boxes_xyxy`.
+    boxes_cls : ndarray[int64], shape (N,)
+        An array of detection classes corresponding to :attr:`boxes_xyxy`.
+    labels : ndarray[int64], shape (N,)
+        An array of ground-truth object identities corresponding to :attr:`boxes_xyxy`,
+        -1 where the identity is unknown.
+    """
+
+    __slots__ = ("boxes_xyxy", "boxes_conf", "boxes_cls", "labels")
+
+    def __init__(self, boxes_xyxy, boxes_conf, boxes_cls, labels):
+        self.boxes_xyxy = boxes_xyxy
+        self.boxes_conf = boxes_conf
+        self.boxes_cls = boxes_cls
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.boxes_xyxy)
+
+
+class SyntheticCrowd(object):
+
+    """A reproducible stream of detections of a synthetic crowd.
+
+    Every object moves with a velocity which drifts randomly from frame to frame and
+    bounces on the borders of the frame. Each frame, an object is missed with
+    probability :attr:`occlusion` and its detected box is jittered by a Gaussian
+    noise of :attr:`jitter` pixels.
+
+    Attributes
+    ----------
+    num_objects : int
+        Number of objects in the crowd.
+    num_frames : int
+        Number of frames of the stream.
+    frame_size : tuple[int, int]
+        Width and height of the frame.
+    box_size : tuple[float, float]
+        Minimum and maximum height of the boxes; the width is half of the height.
+    speed : float
+        Mean speed of the objects in pixels per frame.
+    occlusion : float
+        Probability that an object is not detected in a frame.
+    jitter : float
+        Standard deviation in pixels of the noise added to the box coordinates.
+    seed : int
+        Seed of the random generator, the same seed gives the same stream.
+    """
+
+    def __init__(self,
+                 num_objects=100,
+                 num_frames=300,
+                 frame_size=(1920, 1080),
+                 box_size=(40.0, 160.0),
+                 speed=4.0,
+                 occlusion=0.05,
+                 jitter=1.0,
+                 seed=0):
+        """Construct a SyntheticCrowd, see the attributes for the parameters.
+        """
+        self.num_objects = int(num_objects)
+        self.num_frames = int(num_frames)
+        self.frame_size = tuple(frame_size)
+        self.box_size = tuple(box_size)
+        self.speed = float(speed)
+        self.occlusion = float(occlusion)
+        self.jitter = float(jitter)
+        self.seed = int(seed)
+
+    def getInfo(self):
+        """Get the parameters of the stream as a dictionary.
+
+        Returns
+        -------
+        dict
+            A dictionary describing the stream, used in the benchmark report.
+        """
+        return {
+            "stream": "synthetic",
+            "num_objects": self.num_objects,
+            "num_frames": self.num_frames,
+            "frame_size": list(self.frame_size),
+            "box_size": list(self.box_size),
+            "speed": self.speed,
+            "occlusion": self.occlusion,
+            "jitter": self.jitter,
+            "seed": self.seed
+        }
+
+    def __len__(self):
+        return self.num_frames
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed)
+        n = self.num_objects
+        size = np.array(self.frame_size, dtype=np.float64)
+        heights = rng.uniform(self.box_size[0], self.box_size[1], n)
+        half = np.stack((heights / 4, heights / 2), axis=1)
+        centers = rng.uniform(half, size - half)
+        angles = rng.uniform(0, 2 * np.pi, n)
+        speeds = rng.uniform(0.5, 1.5, n) * self.speed
+        velocities = np.stack((np.cos(angles), np.sin(angles)), axis=1) * speeds[:, None]
+        labels = np.arange(n, dtype=np.int64)
+        for _ in range(self.num_frames):
+            velocities += rng.normal(0, 0.1 * self.speed + 1e-6, (n, 2))
+            centers += velocities
+            low, high = centers < half, centers > size - half
+            velocities[low | high] *= -1
+            centers = np.clip(centers, half, size - half)
+            visible = rng.random(n) >= self.occlusion
+            boxes_xyxy = np.concatenate((centers - half, centers + half), axis=1)[visible]
+            boxes_xyxy += rng.normal(0, self.jitter, boxes_xyxy.shape)
+            num_visible = len(boxes_xyxy)
+            yield DetectionFrame(
+                boxes_xyxy,
+                rng.uniform(0.5, 1.0, num_visible),
+                np.zeros(num_visible, dtype=np.int64),
+                labels[visible]
+            )
+
+
+class MOTDetections(object):
+
+    """A stream of detections read from a MOTChallenge :code:`det.txt` file, whose
+    lines are :code:`frame, id, left, top, width, height, conf, x, y, z`.
+
+    Attributes
+    ----------
+    det_txt : str
+        Path of the :code:`det.txt` file.
+    min_conf : float
+        Detections whose confidence is lower than :attr:`min_conf` are ignored.
+    """
+
+    def __init__(self, det_txt, min_conf=None):
+        """Read all the detections of :obj:`det_txt`.
+
+        Parameters
+        ----------
+        det_txt : str
+            Path of the :code:`det.txt` file.
+        min_conf : float, default=None
+            Detections whose confidence is lower than :obj:`min_conf` are ignored.
+        """
+        if not isExist(det_txt):
+            msg = "MOTDetections() -> The input 'det_txt' does not exist: " + str(det_txt)
+            add_error_log(msg)
+            raise ValueError(msg)
+        self.det_txt = getAbsPathFDS(det_txt)
+        self.min_conf = min_conf
+        dets = np.loadtxt(self.det_txt, delimiter=',', ndmin=2)
+        if min_conf is not None and len(dets) > 0:
+            dets = dets[dets[:, 6] >= float(min_conf)]
+        frames = dets[:, 0].astype(np.int64) if len(dets) > 0 else np.zeros(0, dtype=np.int64)
+        order = np.argsort(frames, kind="stable")
+        self._dets = dets[order]
+        self.num_frames = int(frames.max()) if len(frames) > 0 else 0
+        # Detection and frame numbers begin at 1
+        self._bounds = np.searchsorted(frames[order], np.arange(1, self.num_frames + 2))
+
+    def getInfo(self):
+        """Get the description of the stream as a dictionary.
+
+        Returns
+        -------
+        dict
+            A dictionary describing the stream, used in the benchmark report.
+        """
+        return {
+            "stream": "mot",
+            "det_txt": getFileName(self.det_txt),
+            "num_frames": self.num_frames,
+            "num_detections": len(self._dets),
+            "min_conf": self.min_conf
+        }
+
+    def __len__(self):
+        return self.num_frames
+
+    def __iter__(self):
+        for i in range(self.num_frames):
+            dets = self._dets[self._bounds[i]:self._bounds[i + 1]]
+            boxes_xyxy = dets[:, 2:6].copy()
+            boxes_xyxy[:, 2:4] += boxes_xyxy[:, 0:2]
+            yield DetectionFrame(
+                boxes_xyxy,
+                dets[:, 6].copy(),
+                np.zeros(len(dets), dtype=np.int64),
+                dets[:, 1].astype(np.int64)
+            )
@@ -3,7 +3,10 @@
 # Copyright (C) 2024 UMONS-Numediart
 
 
+import os
+import copy
 import json
+import time
 import yaml
 from yaml.loader import SafeLoader
 
@@ -11,6 +14,9 @@ from .strings import USTR
 from vsensebox.utils.commontools import getAbsPathFDS, isExist
 from vsensebox.utils.logtools import add_error_log
 
+# Resolved documents of YAML/JSON files: {abs path: (stamp, document)}
+_CFG_CACHE = {}
+
 
 def isDictString(input_string):
     """Check whether the :obj:`input_string` is a valid raw dictionary.
@@ -58,13 +64,57 @@ def getCFGDict(input):
     doc = {}
     if isinstance(input, str):
         if ".yaml" in input.lower() or ".json" in input.lower():
-            doc = loadDocument(getAbsPathFDS(input))
+            doc = loadCachedDocument(getAbsPathFDS(input))
         else:
             doc = loadRawYAMLString(input)
     elif isinstance(input, dict):
         doc = input
     return doc
 
+def getCFGStamp(input):
+    """Get a stamp which changes whenever the YAML/JSON file :obj:`input` is modified.
+
+    Parameters
+    ----------
+    input : str or dict
+        A YAML/JSON file path, or a raw/ready dictionary.
+
+    Returns
+    -------
+    tuple(int, int) or None
+        The modification time in nanoseconds and the size of the file, or :code:`None` 
+        if the :obj:`input` is not a file or does not exist.
+    """
+    stamp = None
+    if isinstance(input, str) and (".yaml" in input.lower() or ".json" in input.lower()):
+        try:
+            stat = os.stat(getAbsPathFDS(input))
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+    return stamp
+
+def loadCachedDocument(yaml_json):
+    """Same as :func:`loadDocument` but the file :obj:`yaml_json` is only parsed again 
+    when its stamp, see :func:`getCFGStamp`, has changed since the last call.
+
+    Parameters
+    ----------
+    yaml_json : str
+        A path of a YAML/JSON file.
+
+    Returns
+    -------
+    dict
+        A configuration dictionary of a single document.
+    """
+    stamp = getCFGStamp(yaml_json)
+    cached = _CFG_CACHE.get(yaml_json)
+    if stamp is None or cached is None or cached[0] != stamp:
+        cached = (stamp, loadDocument(yaml_json))
+        _CFG_CACHE[yaml_json] = cached
+    return copy.deepcopy(cached[1])
+
 def getListCFGDoc(input):
     """Get a list of configuration dictionary of document from the given :obj:`input`.
 
@@ -266,3 +316,62 @@ def dumpListDocDict(output_file, doc_list, header):
         add_error_log(msg)
         raise ValueError(msg)
 
+
+class CFGWatcher(object):
+
+    """
+    A class used to tell whether a configuration input has changed without touching 
+    the file system on every call; the file itself is checked at most once every 
+    :attr:`interval` seconds.
+
+    Attributes
+    ----------
+    input : str or dict
+        The last configuration input, a YAML/JSON file path, or a raw/ready dictionary.
+    stamp : tuple(int, int) or None
+        The last known stamp of :attr:`input`, see :func:`getCFGStamp`.
+    interval : float
+        Minimum number of seconds between two checks of the file.
+    """
+
+    def __init__(self, interval=1.0):
+        """Initialize the class.
+
+        Parameters
+        ----------
+        interval : float, default=1.0
+            Minimum number of seconds between two checks of the file.
+        """
+        self.input = None
+        self.stamp = None
+        self.interval = interval
+        self._checked_at = 0.0
+
+    def isChanged(self, input):
+        """Check whether :obj:`input` differs from the last one, or whether its file has 
+        been modified since the last check.
+
+        Parameters
+        ----------
+        input : str or dict
+            A YAML/JSON file path, or a raw/ready dictionary.
+
+        Returns
+        -------
+        bool
+            :code:`True` if the configuration must be (re)loaded.
+        """
+        now = time.monotonic()
+        if input is not self.input and (not isinstance(input, str) or input != self.input):
+            self.input = input
+            self.stamp = getCFGStamp(input)
+            self._checked_at = now
+            return True
+        if self.stamp is None or now - self._checked_at < self.interval:
+            return False
+        self._checked_at = now
+        stamp = getCFGStamp(input)
+        if stamp is not None and stamp != self.stamp:
+            self.stamp = stamp
+            return True
+        return False
@@ -541,6 +541,18 @@ class TCFG_DeepSORT(BaseCGF):
         Parameter :obj:`max_cosine_distance` of tracker DeepSORT.
     model_file : str
         Path of model file for tracker DeepSORT.
+    shared_encoder : bool
+        Whether the appearance encoder is an :class:`EncoderService` shared by all the 
+        trackers DeepSORT using :attr:`model_file`, which batches the patches of their frames.
+    encoder_max_wait : float
+        Maximum number of seconds a frame waits for others in the shared encoder.
+    encoder_backend : str
+        Backend running the appearance encoder from :attr:`model_file`: :code:`"tensorflow"` 
+        for a frozen graph, :code:`"opencv"` for a network read by OpenCV DNN, or 
+        :code:`"onnx"` for an ONNX model run by ONNX Runtime.
+    encoder_image_shape : list[int, int, int]
+        Shape (height, width, channels) of the patches given to the appearance encoder 
+        with the backend :code:`"opencv"`; the other backends read it from the model.
     from_dir : str
         Path of the root directory, relative to path of :attr:`model_file`.
     """
@@ -588,6 +600,10 @@ class TCFG_DeepSORT(BaseCGF):
                 self.nms_max_overlap = self.configs['nms_max_overlap']
                 self.max_cosine_distance = self.configs['max_cosine_distance']
                 self.model_file = getAdaptiveAbsPathFDS(self.from_dir, self.configs['model_file'])
+                self.shared_encoder = self.configs.get('shared_encoder', False)
+                self.encoder_max_wait = self.configs.get('encoder_max_wait', 0.005)
+                self.encoder_backend = self.configs.get('encoder_backend', 'tensorflow')
+                self.encoder_image_shape = list(self.configs.get('encoder_image_shape', [128, 64, 3]))
                 self.configs = self.getDocument()
             except Exception as e:
                 msg = "TCFG_DeepSORT : set() -> " + str(e)
@@ -611,7 +627,11 @@ class TCFG_DeepSORT(BaseCGF):
             "batch_size": self.batch_size,
             "nms_max_overlap": self.nms_max_overlap,
             "max_cosine_distance": self.max_cosine_distance,
-            "model_file": normalizePathFDS(IN_ROOT_DIR, self.model_file)
+            "model_file": normalizePathFDS(IN_ROOT_DIR, self.model_file),
+            "shared_encoder": self.shared_encoder,
+            "encoder_max_wait": self.encoder_max_wait,
+            "encoder_backend": self.encoder_backend,
+            "encoder_image_shape": self.encoder_image_shape
         }
         return deepsort_doc
 
@@ -4,8 +4,9 @@
 
 
 import cv2
+import numpy as np
 
-from vsensebox.utils.commontools import to_xyxy
+from vsensebox.utils.profiletools import NULL_PROFILER
 
 
 class YOLO_Classic(object):
@@ -20,8 +21,14 @@ class YOLO_Classic(object):
         YOLO_Classic.
     model: cv::dnn::DetectionModel
         A detection model object of OpenCV's deep learning network.
+    net: cv::dnn::Net
+        The underlying network of :attr:`model`, used directly for batched inference.
+    profiler : StageProfiler or NullProfiler
+        The profiler recording the stages of the detection.
     """
 
+    profiler = NULL_PROFILER
+
     def __init__(self, cfg):
         """Initialize according to the given configuration :obj:`cfg` 
         as :class:`DCFG_YOLOCLS` object.
@@ -36,9 +43,58 @@ class YOLO_Classic(object):
         net = cv2.dnn.readNet(cfg.model_file, cfg.model_cfg_file)
         net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
         net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+        self.net = net
+        self.out_names = net.getUnconnectedOutLayersNames()
         self.model = cv2.dnn_DetectionModel(net)
         self.model.setInputParams(size=(cfg.imgsz, cfg.imgsz), scale=1/255.0)
 
+    def _getResult(self, _classes, confidences, boxes):
+        _classes = np.asarray(_classes, dtype=np.int32).reshape(-1)
+        confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        boxes_xywh = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        keep = np.isin(_classes, self.cfg.classes) & (boxes_xywh[:, 2] >= self.cfg.min_width)
+        boxes_xywh = boxes_xywh[keep].astype(np.float32)
+        boxes_xyxy = boxes_xywh.copy()
+        boxes_xyxy[:, 2:] += boxes_xyxy[:, :2]
+        return boxes_xywh, boxes_xyxy, [], confidences[keep], _classes[keep]
+
+    def _decodeBatch(self, outs, imgs):
+        # Same decoding as cv::dnn::DetectionModel for darknet region outputs: 
+        # the best class score is the confidence, and NMS is applied per class.
+        num_imgs = len(imgs)
+        outs = np.concatenate(
+            [o.reshape(num_imgs, -1, o.shape[-1]) for o in outs], axis=1)
+        results = []
+        for img, out in zip(imgs, outs):
+            class_ids = np.argmax(out[:, 5:], axis=1)
+            scores = out[np.arange(len(out)), class_ids + 5]
+            keep = scores >= float(self.cfg.conf)
+            out, class_ids, scores = out[keep], class_ids[keep], scores[keep]
+            frame_h, frame_w = img.shape[:2]
+            # The center and the size are truncated to int before the corner, which 
+            # is clipped to the frame, as cv::dnn::DetectionModel does
+            center_x = (out[:, 0] * frame_w).astype(np.int32)
+            center_y = (out[:, 1] * frame_h).astype(np.int32)
+            width = (out[:, 2] * frame_w).astype(np.int32)
+            height = (out[:, 3] * frame_h).astype(np.int32)
+            left = np.clip(center_x - np.fix(width / 2).astype(np.int32), 0, frame_w - 1)
+            top = np.clip(center_y - np.fix(height / 2).astype(np.int32), 0, frame_h - 1)
+            width = np.maximum(1, np.minimum(width, frame_w - left))
+            height = np.maximum(1, np.minimum(height, frame_h - top))
+            boxes = np.stack((left, top, width, height), axis=1)
+            indices = []
+            if len(boxes) > 0:
+                indices = cv2.dnn.NMSBoxesBatched(
+                    boxes.tolist(), 
+                    scores.tolist(), 
+                    class_ids.tolist(), 
+                    float(self.cfg.conf), 
+                    float(self.cfg.nms)
+                )
+            indices = np.asarray(indices, dtype=np.int64).flatten()
+            results.append((class_ids[indices], scores[indices], boxes[indices]))
+        return results
+
     def detect(self, img):
         """Detect general object with object's class filter :obj:`classes` in a 
         given :obj:`Mat` like object.
@@ -52,36 +108,66 @@ class YOLO_Classic(object):
         -------
         Mat
             A :obj:`Mat` like object.
-        list[ndarray[int int int int], ...]
-            A list of bounding box :code:`ndarray[x y width height]`.
-        list[ndarray[int int int int], ...]
-            A list of bounding box :code:`ndarray[x1 y1 x2 y2]`.
+        ndarray[float32], shape (N, 4)
+            An array of bounding boxes :code:`[x y width height]`.
+        ndarray[float32], shape (N, 4)
+            An array of bounding boxes :code:`[x1 y1 x2 y2]`.
         list[]
             A list of detected bodies' keypoints.
-        list[float]
-            A list of the detection confidence of every detected object.
-        list[int]
-            A list of detection classes.
+        ndarray[float32], shape (N,)
+            An array of the detection confidence of every detected object.
+        ndarray[int32], shape (N,)
+            An array of detection classes.
         """
-        boxes_xywh = []
-        boxes_xyxy = []
-        keypoints = []
-        confs = []
-        cls = []
         if self.cfg.classes is None:
             self.cfg.classes = [i for i in range(0, 80)]
-        _classes, confidences, boxes = self.model.detect(
-            img, 
-            confThreshold=float(self.cfg.conf), 
-            nmsThreshold=float(self.cfg.nms)
-        )
-        if len(boxes) > 0:
-            for cl, conf, box_xywh in zip(_classes.flatten(), confidences, boxes):
-                if cl in self.cfg.classes and box_xywh[2] >= self.cfg.min_width:
-                    box_xywh = box_xywh.astype(int)
-                    boxes_xywh.append(box_xywh)
-                    box_xyxy = to_xyxy(box_xywh)
-                    boxes_xyxy.append(box_xyxy)
-                    confs.append(float(conf))
-                    cls.append(int(cl))
+        with self.profiler.stage("detect.inference"):
+            _classes, confidences, boxes = self.model.detect(
+                img, 
+                confThreshold=float(self.cfg.conf), 
+                nmsThreshold=float(self.cfg.nms)
+            )
+        with self.profiler.stage("detect.result"):
+            boxes_xywh, boxes_xyxy, keypoints, confs, cls = self._getResult(
+                _classes, confidences, boxes)
         return img, boxes_xywh, boxes_xyxy, keypoints, confs, cls
+
+    def detect_batch(self, imgs):
+        """Detect general object with object's class filter :obj:`classes` in a 
+        list of :obj:`Mat` like objects using a single forward pass.
+
+        Parameters
+        ----------
+        imgs : list[Mat, ...]
+            A list of :obj:`Mat` like objects.
+
+        Returns
+        -------
+        list[tuple, ...]
+            A list of per-image results, each of which is in the same format as 
+            the returned tuple of :meth:`detect`.
+        """
+        if self.cfg.classes is None:
+            self.cfg.classes = [i for i in range(0, 80)]
+        if len(imgs) == 0:
+            return []
+        with self.profiler.stage("detect.preprocess"):
+            blob = cv2.dnn.blobFromImages(
+                imgs, 
+                scalefactor=1/255.0, 
+                size=(self.cfg.imgsz, self.cfg.imgsz), 
+                swapRB=False, 
+                crop=False
+            )
+        with self.profiler.stage("detect.inference"):
+            self.net.setInput(blob)
+            outs = self.net.forward(self.out_names)
+        with self.profiler.stage("detect.postprocess"):
+            decoded = self._decodeBatch(outs, imgs)
+        results = []
+        with self.profiler.stage("detect.result"):
+            for img, (_classes, confidences, boxes) in zip(imgs, decoded):
+                boxes_xywh, boxes_xyxy, keypoints, confs, cls = self._getResult(
+                    _classes, confidences, boxes)
+                results.append((img, boxes_xywh, boxes_xyxy, keypoints, confs, cls))
+        return results
@@ -3,10 +3,46 @@
 # Copyright (C) 2024 UMONS-Numediart
 
 
-import cv2
+import torch
+import numpy as np
 
-from vsensebox.utils.commontools import to_xywh
 from vsensebox.utils.logtools import ignore_this_logger
+from vsensebox.utils.profiletools import NULL_PROFILER
+
+
+def toHostArray(tensor):
+    """Copy a tensor from any device to a NumPy array. A CUDA tensor is copied in one 
+    non-blocking transfer into pinned host memory.
+
+    :meta private:
+    """
+    tensor = tensor.detach()
+    if tensor.device.type == "cpu":
+        return tensor.numpy()
+    pinned = tensor.is_cuda
+    host = torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=pinned)
+    host.copy_(tensor, non_blocking=pinned)
+    if pinned:
+        torch.cuda.current_stream(tensor.device).synchronize()
+    return host.numpy()
+
+def extractResult(result):
+    """Extract only boxes, confidences, classes and keypoints of an Ultralytics 
+    :obj:`Results`, packed into a single tensor which is copied to host memory once.
+
+    :meta private:
+    """
+    data = result.boxes.data
+    parts = [data[:, :4], data[:, -2:]]
+    if result.keypoints is not None:
+        kpt_shape = result.keypoints.data.shape[1:]
+        # An explicit size, as -1 cannot be inferred for a frame without boxes
+        parts.append(result.keypoints.data.reshape(len(data), int(np.prod(kpt_shape))))
+    packed = toHostArray(torch.cat([p.float() for p in parts], dim=1))
+    keypoints = None
+    if result.keypoints is not None:
+        keypoints = packed[:, 6:].reshape(len(packed), *kpt_shape)
+    return packed[:, :4], packed[:, 4], packed[:, 5], keypoints
 
 
 class YOLO_Ultralytics(object):
@@ -21,8 +57,13 @@ class YOLO_Ultralytics(object):
         of detector YOLO_Ultralytics.
     model: ultralytics.yolo.engine.YOLO
         A detection model object of YOLO_Ultralytics.
+    profiler : StageProfiler or NullProfiler
+        The profiler recording the stages reported by Ultralytics' :code:`Results.speed` 
+        and the extraction of the results.
     """
 
+    profiler = NULL_PROFILER
+
     def __init__(self, cfg):
         """Initialize according to the given configuration :obj:`cfg` 
         as :class:`DCFG_YOLOULT` object.
@@ -34,10 +75,6 @@ class YOLO_Ultralytics(object):
             of detector YOLO_Ultralytics.
         """
         self.cfg = cfg
-        self.cpu_only = False
-        if isinstance(self.cfg.device, str):
-            if self.cfg.device.lower() == 'cpu':
-                self.cpu_only = True
         ignore_this_logger("ultralytics")
         if "nas" in self.cfg.model_file:
             # YOLO NAS isn't stable yet :/
@@ -47,6 +84,49 @@ class YOLO_Ultralytics(object):
             from ultralytics import YOLO
             self.model = YOLO(self.cfg.model_file)
 
+    def _recordSpeed(self, dets):
+        # Ultralytics already times its stages, in milliseconds per image
+        if not self.profiler.enabled or len(dets) == 0:
+            return
+        speed = getattr(dets[0], "speed", None) or {}
+        for stage in ("preprocess", "inference", "postprocess"):
+            if speed.get(stage) is not None:
+                self.profiler.record("detect." + stage, speed[stage] * len(dets) / 1000.0)
+
+    def _predict(self, source):
+        dets = self.model.predict(
+            source,
+            imgsz=int(self.cfg.imgsz),
+            conf=float(self.cfg.conf),
+            classes=self.cfg.classes,
+            show_boxes=False,
+            device=self.cfg.device,
+            max_det=int(self.cfg.max_det),
+            line_width=self.cfg.line_width,
+            verbose=False
+        )
+        self._recordSpeed(dets)
+        return dets
+
+    def _getResult(self, det):
+        dt_boxes_xyxy, dt_confidences, dt_classes, dt_keypoints = extractResult(det)
+        dt_classes = dt_classes.astype(np.int32)
+        # One row per box: [x1 y1 x2 y2 x y w h], truncated to whole pixels
+        boxes = np.empty((len(dt_classes), 8), dtype=np.float32)
+        np.trunc(dt_boxes_xyxy, out=boxes[:, :4])
+        boxes[:, 4:6] = boxes[:, 0:2]
+        np.subtract(boxes[:, 2:4], boxes[:, 0:2], out=boxes[:, 6:8])
+        keep = boxes[:, 6] >= self.cfg.min_width
+        if self.cfg.classes is not None:
+            keep &= np.isin(dt_classes, self.cfg.classes)
+        boxes = boxes[keep]
+        keypoints = []
+        if dt_keypoints is not None:
+            # Ultralytics gives the keypoints in the order of the boxes
+            keypoints = dt_keypoints[keep]
+        confs = dt_confidences[keep]
+        return boxes[:, 4:], boxes[:, :4], keypoints, confs, dt_classes[keep]
+
     def detect(self, img):
         """Detect general object with object's class filter :obj:`classes` 
         in a given :obj:`Mat` like object.
@@ -60,61 +140,44 @@ class YOLO_Ultralytics(object):
         -------
         Mat
             A :obj:`Mat` like object.
-        list[ndarray[int int int int], ...]
-            A list of bounding box :code:`ndarray[x y width height]`.
-        list[ndarray[int int int int], ...]
-            A list of bounding box :code:`ndarray[x1 y1 x2 y2]`.
-        list[]
-            A list of detected bodies' keypoints.
-        list[float]
-            A list of the detection confidence of every detected object.
-        list[int]
-            A list of detection classes.
+        ndarray[float32], shape (N, 4)
+            An array of bounding boxes :code:`[x y width height]`.
+        ndarray[float32], shape (N, 4)
+            An array of bounding boxes :code:`[x1 y1 x2 y2]`.
+        ndarray[float32], shape (N, K, 3) or list[]
+            An array of detected bodies' keypoints, in the order of the boxes, or an 
+            empty list for a model without keypoints.
+        ndarray[float32], shape (N,)
+            An array of the detection confidence of every detected object.
+        ndarray[int32], shape (N,)
+            An array of detection classes.
         """
-        numpy_dets = []
-        boxes_xyxy = []
-        boxes_xywh = []
-        keypoints = []
-        confs = []
-        cls = []
-        dets = self.model.predict(
-            img,
-            imgsz=int(self.cfg.imgsz),
-            conf=float(self.cfg.conf),
-            classes=self.cfg.classes,
-            show_boxes=False,
-            device=self.cfg.device,
-            max_det=int(self.cfg.max_det),
-            line_width=self.cfg.line_width,
-            verbose=False
-        )
-        if self.cpu_only:
-            numpy_dets = dets[0].numpy()
-        else:
-            numpy_dets = dets[0].cuda().cpu().to("cpu").numpy()
-        dt_boxes_xyxy = numpy_dets.boxes.xyxy
-        dt_confidences = numpy_dets.boxes.conf
-        dt_classes = numpy_dets.boxes.cls
-        dt_keypoints = dets[0].keypoints
-        if dt_keypoints is not None:
-            for box_xyxy, conf, kp, cl in zip(dt_boxes_xyxy, dt_confidences, 
-                                              reversed(dt_keypoints), dt_classes):
-                box_xyxy = box_xyxy.astype(int)
-                box_xywh = to_xywh(box_xyxy)
-                if box_xywh[2] >= self.cfg.min_width:
-                    boxes_xywh.append(box_xywh)
-                    boxes_xyxy.append(box_xyxy)
-                    keypoint = kp.data[0]
-                    keypoints.append(keypoint)
-                    confs.append(float(conf))
-                    cls.append(int(cl))
-        elif len(dt_boxes_xyxy) > 0:
-            for box_xyxy, conf, cl in zip(dt_boxes_xyxy, dt_confidences, dt_classes):
-                box_xyxy = box_xyxy.astype(int)
-                box_xywh = to_xywh(box_xyxy)
-                if box_xywh[2] >= self.cfg.min_width:
-                    boxes_xywh.append(box_xywh)
-                    boxes_xyxy.append(box_xyxy)
-                    confs.append(float(conf))
-                    cls.append(int(cl))
+        dets = self._predict(img)
+        with self.profiler.stage("detect.result"):
+            boxes_xywh, boxes_xyxy, keypoints, confs, cls = self._getResult(dets[0])
         return img, boxes_xywh, boxes_xyxy, keypoints, confs, cls
+
+    def detect_batch(self, imgs):
+        """Detect general object with object's class filter :obj:`classes` 
+        in a list of :obj:`Mat` like objects using a single forward pass.
+
+        Parameters
+        ----------
+        imgs : list[Mat, ...]
+            A list of :obj:`Mat` like objects.
+
+        Returns
+        -------
+        list[tuple, ...]
+            A list of per-image results, each of which is in the same format 
+            as the returned tuple of :meth:`detect`.
+        """
+        if len(imgs) == 0:
+            return []
+        dets = self._predict(list(imgs))
+        results = []
+        with self.profiler.stage("detect.result"):
+            for img, det in zip(imgs, dets):
+                boxes_xywh, boxes_xyxy, keypoints, confs, cls = self._getResult(det)
+                results.append((img, boxes_xywh, boxes_xyxy, keypoints, confs, cls))
+        return results
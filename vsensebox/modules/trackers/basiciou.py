@@ -6,6 +6,7 @@
 import torch
 import torchvision.ops.boxes as bops
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 
 
 class BasicIoU(object):
@@ -21,56 +22,46 @@ class BasicIoU(object):
         cfg : TCFG_BasicIoU
             A :class:`TCFG_BasicIoU` object which manages the configurations of tracker BasicIoU.
         """
-        self.prev_cls = []
-        self.prev_ids = []
-        self.curr_ids = []
-        self.prev_boxes_xyxy = []
+        self.prev_cls = np.empty(0, dtype=np.int64)
+        self.prev_ids = np.empty(0, dtype=np.int64)
+        self.curr_ids = np.empty(0, dtype=np.int64)
+        self.prev_boxes_xyxy = np.empty((0, 4))
         self.min_iou = cfg.min_iou
         self.use_gpu = False
         if str(cfg.device) == "0":
             self.use_gpu = True
             torch.set_default_device('cuda')
+        self._next_id = 0
 
-    def _generateID(self):
-        self.used_ids = list(set(self.used_ids))
-        if len(self.used_ids) == 0: aID = 0
-        else: aID = max(self.used_ids) + 1
-        self.used_ids.append(aID)
-        return aID
-    
-    def _getIoU(self, box_xyxy_1, box_xyxy_2):
-        iou = 0.0
+    def _generateIDs(self, n):
+        ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._next_id += n
+        return ids
+
+    def _getIoUMatrix(self, boxes_xyxy_1, boxes_xyxy_2):
+        """Return the (len(boxes_xyxy_1), len(boxes_xyxy_2)) IoU matrix, computed 
+        with a single :func:`box_iou` call on GPU, or with NumPy otherwise.
+        """
         if self.use_gpu:
-            box1 = torch.tensor(np.array([box_xyxy_1]), dtype=torch.float)
-            box2 = torch.tensor(np.array([box_xyxy_2]), dtype=torch.float)
-            iou = bops.box_iou(box1, box2)
-        else:
-            xA = np.maximum(box_xyxy_1[0], box_xyxy_2[0])
-            yA = np.maximum(box_xyxy_1[1], box_xyxy_2[1])
-            xB = np.minimum(box_xyxy_1[2], box_xyxy_2[2])
-            yB = np.minimum(box_xyxy_1[3], box_xyxy_2[3])
-            interArea = max(0, xB - xA + 1) * max(0, yB - yA + 1)
-            boxAArea = (box_xyxy_1[2] - box_xyxy_1[0] + 1) * (box_xyxy_1[3] - box_xyxy_1[1] + 1)
-            boxBArea = (box_xyxy_2[2] - box_xyxy_2[0] + 1) * (box_xyxy_2[3] - box_xyxy_2[1] + 1)
-            iou = interArea / float(boxAArea + boxBArea - interArea)
-        return iou
-
-    def _findPID(self, box_xyxy, box_class):
-        pindex = -1
-        max_iou = -1
-        i = 0
-        for b in self.prev_boxes_xyxy:
-            iou = self._getIoU(box_xyxy, b)
-            if iou > max_iou and self.prev_cls[i] == box_class:
-                max_iou = iou
-                pindex = i
-            i += 1
-        if max_iou < self.min_iou: pindex = -1
-        return pindex
+            ious = bops.box_iou(torch.as_tensor(boxes_xyxy_1, dtype=torch.float),
+                                torch.as_tensor(boxes_xyxy_2, dtype=torch.float))
+            return ious.cpu().numpy()
+        b1 = boxes_xyxy_1[:, None, :]
+        b2 = boxes_xyxy_2[None, :, :]
+        iw = np.maximum(0, np.minimum(b1[..., 2], b2[..., 2]) - np.maximum(b1[..., 0], b2[..., 0]) + 1)
+        ih = np.maximum(0, np.minimum(b1[..., 3], b2[..., 3]) - np.maximum(b1[..., 1], b2[..., 1]) + 1)
+        interArea = iw * ih
+        boxAArea = (b1[..., 2] - b1[..., 0] + 1) * (b1[..., 3] - b1[..., 1] + 1)
+        boxBArea = (b2[..., 2] - b2[..., 0] + 1) * (b2[..., 3] - b2[..., 1] + 1)
+        return interArea / (boxAArea + boxBArea - interArea)
 
     def update(self, boxes_xyxy, boxes_conf, boxes_cls=None, img=None):
         """Update the tracker and return a track list.
 
+        Each current box takes the ID of at most one previous box of the same class 
+        whose IoU is at least :attr:`min_iou`, chosen by a one-to-one assignment 
+        maximizing the total IoU; the others get new IDs.
+
         Parameters
         ----------
         boxes_xyxy : list[[X1, Y1, X2, Y2], ...]
@@ -78,7 +69,8 @@ class BasicIoU(object):
         boxes_conf : list[float, ...]
             Being consistent with other trackers, will be ignored.
         boxes_cls : list[int, ...], default=None
-            A list of detection class corresponding to boxes_xyxy.
+            A list of detection class corresponding to boxes_xyxy, 
+            all boxes are considered of the same class if None.
         img : any, default=None
             Being consistent with other trackers, will be ignored.
 
@@ -86,36 +78,33 @@ class BasicIoU(object):
         -------
         list[[X1, Y1, X2, Y2], ...]
             A list of boxes; for example, [[X1, Y1, X2, Y2], [X1, Y1, X2, Y2], ...].
-        list[int]
-            A list of IDs corresponding to the the list of boxes.
+        ndarray[int64]
+            An array of IDs corresponding to the the list of boxes.
         """
 
         self.prev_ids = self.curr_ids
 
-        self.curr_ids = []
-        self.used_ids = []
-        hang_indexes = []
-
-        len_bb = len(boxes_xyxy)
-
-        if len_bb > 0:
-            for i in range(0, len_bb):
-                self.curr_ids.append(-1)
-                pindex = self._findPID(boxes_xyxy[i], boxes_cls[i])
-                if pindex >= 0:
-                    prev_id = self.prev_ids[pindex]
-                    if prev_id in self.used_ids:
-                        hang_indexes.append(i)
-                    else:
-                        self.curr_ids[i] = prev_id
-                        self.used_ids.append(prev_id)
-                else:
-                    hang_indexes.append(i)
-            if len(hang_indexes) > 0:
-                for index in hang_indexes:
-                    self.curr_ids[index] = self._generateID()
-        
-        self.prev_cls = boxes_cls
-        self.prev_boxes_xyxy = boxes_xyxy
+        # Copies, as they are kept for the next frame while the caller may reuse its arrays
+        curr_boxes_xyxy = np.array(boxes_xyxy, dtype=np.float64).reshape(-1, 4)
+        len_bb = len(curr_boxes_xyxy)
+        if boxes_cls is None:
+            curr_cls = np.zeros(len_bb, dtype=np.int64)
+        else:
+            curr_cls = np.array(boxes_cls).reshape(-1)
+
+        self.curr_ids = np.full(len_bb, -1, dtype=np.int64)
+
+        if len_bb > 0 and len(self.prev_boxes_xyxy) > 0:
+            ious = self._getIoUMatrix(curr_boxes_xyxy, self.prev_boxes_xyxy)
+            candidates = (ious >= self.min_iou) & (curr_cls[:, None] == self.prev_cls[None, :])
+            rows, cols = linear_sum_assignment(np.where(candidates, ious, 0.0), maximize=True)
+            keep = candidates[rows, cols]
+            self.curr_ids[rows[keep]] = self.prev_ids[cols[keep]]
+
+        hang = self.curr_ids < 0
+        self.curr_ids[hang] = self._generateIDs(np.count_nonzero(hang))
+
+        self.prev_cls = curr_cls
+        self.prev_boxes_xyxy = curr_boxes_xyxy
         
         return boxes_xyxy, self.curr_ids
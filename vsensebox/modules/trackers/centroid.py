@@ -3,7 +3,9 @@
 # Copyright (C) 2024 UMONS-Numediart
 
 
-from math import dist
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial import cKDTree
 
 
 class Centroid(object):
@@ -11,6 +13,10 @@ class Centroid(object):
     """Class reprensented a Centroid tracker.
     """
 
+    # Above this number of previous x current centroids, candidate pairs are found 
+    # with a KD-tree instead of a full distance matrix.
+    kdtree_min_pairs = 10000
+
     def __init__(self, cfg):
         """Initialize according to the given :obj:`cfg` and :obj:`auto_load`.
 
@@ -19,47 +25,58 @@ class Centroid(object):
         cfg : TCFG_Centroid
             A :class:`TCFG_Centroid` object which manages the configurations of tracker Centroid.
         """
-        self.previous_ct = []
-        self.previous_id = []
-        self.current_ct = []
-        self.current_id = []
+        self.previous_ct = np.empty((0, 2))
+        self.previous_id = np.empty(0, dtype=np.int64)
+        self.current_ct = np.empty((0, 2))
+        self.current_id = np.empty(0, dtype=np.int64)
         self.max_spread = cfg.max_spread
         self.pref_y = cfg.pref_y
+        self._next_id = 0
+
+    def _generateIDs(self, n):
+        ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._next_id += n
+        return ids
 
-    def _generateID(self):
-        self.used_ids = list(set(self.used_ids))
-        if len(self.used_ids) == 0: aID = 0
-        else: aID = max(self.used_ids) + 1
-        self.used_ids.append(aID)
-        return aID
-    
-    def _findRepspoint(self, box_xyxy):
-        x = int((box_xyxy[0] + box_xyxy[2]) / 2)
-        y = 0
+    def _findRepspoints(self, boxes_xyxy):
+        boxes_xyxy = np.asarray(boxes_xyxy, dtype=np.float64).reshape(-1, 4)
+        points = np.empty((len(boxes_xyxy), 2))
+        points[:, 0] = np.trunc((boxes_xyxy[:, 0] + boxes_xyxy[:, 2]) / 2)
         if self.pref_y.lower() == "center":
-            y = int((box_xyxy[1] + box_xyxy[3]) / 2)
+            points[:, 1] = np.trunc((boxes_xyxy[:, 1] + boxes_xyxy[:, 3]) / 2)
         elif self.pref_y.lower() == "bottom":
-            y = max(box_xyxy[1], box_xyxy[3])
+            points[:, 1] = np.maximum(boxes_xyxy[:, 1], boxes_xyxy[:, 3])
         else:
-            y = min(box_xyxy[1], box_xyxy[3])
-        return (x, y)
-
-    def _findPID(self, point):
-        pindex = -1
-        min_d = 8192
-        i = 0
-        for ct in self.previous_ct:
-            d = dist(point, ct)
-            if d < min_d:
-                min_d = d
-                pindex = i
-            i += 1
-        if min_d > self.max_spread: pindex = -1
-        return pindex
+            points[:, 1] = np.minimum(boxes_xyxy[:, 1], boxes_xyxy[:, 3])
+        return points
+
+    def _getCandidates(self):
+        """Return the rows of :attr:`previous_ct` and of :attr:`current_ct` which have 
+        at least one counterpart within :attr:`max_spread`, and the distance matrix 
+        between them, with ``inf`` for the pairs further than :attr:`max_spread`.
+        """
+        len_p, len_c = len(self.previous_ct), len(self.current_ct)
+        if len_p * len_c <= self.kdtree_min_pairs:
+            d = np.hypot(*(self.current_ct[None, :, :] - self.previous_ct[:, None, :]).T).T
+            d[d > self.max_spread] = np.inf
+            prows = np.flatnonzero(np.isfinite(d).any(axis=1))
+            crows = np.flatnonzero(np.isfinite(d).any(axis=0))
+            return prows, crows, d[np.ix_(prows, crows)]
+        pairs = cKDTree(self.previous_ct).sparse_distance_matrix(
+            cKDTree(self.current_ct), self.max_spread, output_type="ndarray")
+        prows, pi = np.unique(pairs["i"], return_inverse=True)
+        crows, ci = np.unique(pairs["j"], return_inverse=True)
+        d = np.full((len(prows), len(crows)), np.inf)
+        d[pi, ci] = pairs["v"]
+        return prows, crows, d
 
     def update(self, boxes_xyxy, boxes_conf, boxes_cls=None, img=None):
         """Update the tracker and return a track list.
 
+        Each current centroid takes the ID of at most one previous centroid within 
+        :attr:`max_spread`, chosen by a one-to-one assignment minimizing the total 
+        distance; the others get new IDs.
+
         Parameters
         ----------
         boxes_xyxy : list[[X1, Y1, X2, Y2], ...]
@@ -75,35 +92,28 @@ class Centroid(object):
         -------
         list[[X1, Y1, X2, Y2], ...]
             A list of boxes; for example, [[X1, Y1, X2, Y2], [X1, Y1, X2, Y2], ...].
-        list[int]
-            A list of IDs corresponding to the the list of boxes.
+        ndarray[int64]
+            An array of IDs corresponding to the the list of boxes.
         """
 
         self.previous_ct = self.current_ct
         self.previous_id = self.current_id
 
-        self.current_id = []
-        self.used_ids = []
-
-        self.current_ct = [self._findRepspoint(b) for b in boxes_xyxy]
-        hang_indexes_in_clist = []
-        len_bb = len(boxes_xyxy)
-        if len_bb > 0:
-            for i in range(0, len_bb):
-                self.current_id.append(-1)
-                pindex = self._findPID(self.current_ct[i])
-                if pindex >= 0:
-                    prev_id = self.previous_id[pindex]
-                    if prev_id in self.used_ids:
-                        hang_indexes_in_clist.append(i)
-                    else:
-                        self.current_id[i] = prev_id
-                        self.used_ids.append(prev_id)
-                else:
-                    hang_indexes_in_clist.append(i)
-            len_hlist = len(hang_indexes_in_clist)
-            if len_hlist > 0:
-                for index in hang_indexes_in_clist:
-                    self.current_id[index] = self._generateID()
-        
+        self.current_ct = self._findRepspoints(boxes_xyxy)
+        self.current_id = np.full(len(self.current_ct), -1, dtype=np.int64)
+
+        if len(self.previous_ct) > 0 and len(self.current_ct) > 0:
+            prows, crows, d = self._getCandidates()
+            if d.size > 0:
+                # inf cannot be handled by the solver, a cost larger than any 
+                # sum of gated distances keeps those pairs unmatched when possible.
+                finite = np.isfinite(d)
+                cost = np.where(finite, d, d[finite].sum() + 1.0)
+                rows, cols = linear_sum_assignment(cost)
+                keep = finite[rows, cols]
+                self.current_id[crows[cols[keep]]] = self.previous_id[prows[rows[keep]]]
+
+        hang = self.current_id < 0
+        self.current_id[hang] = self._generateIDs(np.count_nonzero(hang))
+
         return boxes_xyxy, self.current_id
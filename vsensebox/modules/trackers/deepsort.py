@@ -4,9 +4,11 @@
 
 
 import numpy as np
+from concurrent.futures import Future
 
 from vsensebox.utils.commontools import to_xywh
-from vsensebox.utils.logtools import ignore_this_logger
+from vsensebox.utils.logtools import add_error_log, ignore_this_logger
+from vsensebox.utils.profiletools import NULL_PROFILER
 
 ignore_this_logger("tensorflow")
 ignore_this_logger("preprocessing")
@@ -17,29 +19,57 @@ ignore_this_logger("tracker")
 
 from .utils import preprocessing
 from .utils import nn_matching
-from .utils import generate_detections as gdet
 from .utils.detection import Detection as DSDetection
 from .utils.tracker import Tracker as DSTracker
-from .utils.box_matching import matchDetTrkByXYXY
+from .utils.generate_detections import ENCODER_BACKENDS, create_box_encoder
 
 
 class DeepSORT(object):
 
     """Class used as a custom layer or interface for interacting with DeepSORT tracker.
+
+    Attributes
+    ----------
+    profiler : StageProfiler or NullProfiler
+        The profiler recording the stages of the tracking.
     """
 
-    def __init__(self, cfg):
+    profiler = NULL_PROFILER
+
+    def __init__(self, cfg, encoder=None):
         """Initialize according to the given :obj:`cfg` and :obj:`auto_load`.
 
         Parameters
         ----------
         cfg : TCFG_DeepSORT
             A :class:`TCFG_DeepSORT` object which manages the configurations of tracker DeepSORT.
+        encoder : callable, default=None
+            A box encoder :code:`encoder(img, boxes_xywh) -> features`, used instead of 
+            the encoder loaded from :obj:`cfg.model_file` with the backend 
+            :obj:`cfg.encoder_backend`; for example, 
+            a stub encoder for benchmarking without TensorFlow. An encoder which also has 
+            :code:`submit(img, boxes_xywh) -> Future`, like :class:`BoxEncoder`, is 
+            waited for only after the NMS and the Kalman prediction.
         """
         self.nms_max_overlap = cfg.nms_max_overlap
-        self.encoder = gdet.create_box_encoder(cfg.model_file, batch_size=cfg.batch_size)
+        backend = getattr(cfg, "encoder_backend", "tensorflow")
+        image_shape = getattr(cfg, "encoder_image_shape", (128, 64, 3))
+        if encoder is None and backend not in ENCODER_BACKENDS:
+            msg = ("DeepSORT() -> The encoder backend must be one of " + 
+                   str(list(ENCODER_BACKENDS)) + ", not " + str(backend) + ".")
+            add_error_log(msg)
+            raise ValueError(msg)
+        if encoder is None and getattr(cfg, "shared_encoder", False):
+            from .encoderservice import getEncoderService
+            encoder = getEncoderService(cfg.model_file, batch_size=cfg.batch_size, 
+                                        max_wait=cfg.encoder_max_wait, backend=backend, 
+                                        image_shape=image_shape).createBoxEncoder()
+        elif encoder is None:
+            encoder = create_box_encoder(cfg.model_file, batch_size=cfg.batch_size, 
+                                         backend=backend, image_shape=image_shape)
+        self.encoder = encoder
         self.metric = nn_matching.NearestNeighborDistanceMetric(
-            "cosine", cfg.max_cosine_distance,cfg.nn_budget
+            "cosine", cfg.max_cosine_distance, cfg.nn_budget, data_is_normalized=True
         )
         self.tracker = DSTracker(self.metric)
 
@@ -62,33 +92,88 @@ class DeepSORT(object):
         -------
         list[[X1, Y1, X2, Y2], ...]
             A list of boxes; for example, [[X1, Y1, X2, Y2], [X1, Y1, X2, Y2], ...].
-        list[int]
-            A list of IDs corresponding to the the list of boxes.
+        ndarray[int64]
+            An array of IDs corresponding to the the list of boxes, -1 for a box which 
+            is not matched to a confirmed track.
         """
 
         dconfidences = boxes_conf
         dclasses = boxes_cls
         dboxes = [to_xywh(b) for b in boxes_xyxy]
-        dfeatures = self.encoder(img, dboxes)
-        detections = [DSDetection(dbox, dconfidence, dclass, dfeature) 
-                        for dbox, dconfidence, dclass, dfeature in 
-                        zip(dboxes, dconfidences, dclasses, dfeatures)]
-        dboxes = np.array([d.tlwh for d in detections])
-        scores = np.array([d.confidence for d in detections])
-        indices = preprocessing.non_max_suppression(dboxes, self.nms_max_overlap, scores)
-        detections = [detections[i] for i in indices]
-
-        self.tracker.predict()
-        self.tracker.update(detections)
-
-        boxes_xyxy_trk = []
-        ids_trk = []
-        for t in self.tracker.tracks:
-            if not t.is_confirmed() or t.time_since_update > 1:
-                continue
-            bxyxy = t.to_tlbr().tolist()
-            boxes_xyxy_trk.append(bxyxy)
-            ids_trk.append(int(t.track_id))
-        ids = matchDetTrkByXYXY(boxes_xyxy, boxes_xyxy_trk, ids_trk)
+        with self.profiler.stage("track.encode"):
+            if hasattr(self.encoder, "submit"):
+                dfeatures = self.encoder.submit(img, dboxes)
+            else:
+                dfeatures = self.encoder(img, dboxes)
+        with self.profiler.stage("track.nms"):
+            indices = preprocessing.non_max_suppression(
+                np.asarray(dboxes, dtype=np.float64).reshape(-1, 4), self.nms_max_overlap, 
+                np.asarray(dconfidences, dtype=np.float64).reshape(-1))
+
+        with self.profiler.stage("track.predict"):
+            self.tracker.predict()
+        # The features of a shared encoder are computed meanwhile
+        if isinstance(dfeatures, Future):
+            with self.profiler.stage("track.encode.wait"):
+                dfeatures = dfeatures.result()
+        # Normalized once, the gallery of the metric keeps unit float32 features
+        dfeatures = nn_matching.normalize_features(dfeatures)
+        detections = [DSDetection(dboxes[i], dconfidences[i], dclasses[i], dfeatures[i]) 
+                      for i in indices]
+        with self.profiler.stage("track.association"):
+            association = self.tracker.match(detections)
+        with self.profiler.stage("track.update"):
+            self.tracker.update(detections, association)
+
+        # Each track knows the detection it was updated with, which maps back 
+        # to boxes_xyxy through the indices kept by the NMS.
+        with self.profiler.stage("track.ids"):
+            ids = np.full(len(boxes_xyxy), -1, dtype=np.int64)
+            for t in self.tracker.tracks:
+                if not t.is_confirmed() or t.detection_index < 0:
+                    continue
+                ids[indices[t.detection_index]] = t.track_id
 
         return boxes_xyxy, ids
+
+    def _getCoastedTracks(self):
+        # The confirmed tracks updated on the last updated frame
+        return [t for t in self.tracker.tracks if t.is_confirmed() and t.time_since_update == 0]
+
+    def predict(self):
+        """Advance the tracker by one frame without detections, for a frame on which the 
+        detector is not run, and return the predicted boxes of the objects tracked in the 
+        last updated frame; the frame is not counted as a miss.
+
+        Returns
+        -------
+        ndarray[float64], shape (N, 4)
+            An array of predicted boxes; for example, [[X1, Y1, X2, Y2], ...].
+        ndarray[int64]
+            An array of IDs corresponding to the predicted boxes.
+        """
+        with self.profiler.stage("track.predict"):
+            self.tracker.coast()
+        tracks = self._getCoastedTracks()
+        boxes = np.array([t.to_tlbr() for t in tracks]).reshape(-1, 4)
+        return boxes, np.array([t.track_id for t in tracks], dtype=np.int64)
+
+    def getUncertainty(self):
+        """Get the uncertainty of the position of the tracked objects in the next frame.
+
+        Returns
+        -------
+        float
+            The largest standard deviation of a predicted center relative to the size of 
+            its box, 0 if no object is tracked.
+        """
+        tracks = self._getCoastedTracks()
+        if len(tracks) == 0:
+            return 0.0
+        mean, covariance = self.tracker.kf.multi_predict(
+            np.asarray([t.mean for t in tracks]),
+            np.asarray([t.covariance for t in tracks]))
+        # The state is [X, Y, aspect ratio, height, ...], so the area is a * h^2
+        size = np.sqrt(np.maximum(mean[:, 2], 1e-6)) * mean[:, 3]
+        std = np.sqrt(covariance[:, 0, 0] + covariance[:, 1, 1])
+        return float((std / np.maximum(size, 1e-6)).max())
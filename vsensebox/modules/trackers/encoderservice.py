@@ -0,0 +1,231 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import queue
+import threading
+import numpy as np
+from time import monotonic
+from concurrent.futures import Future
+
+from vsensebox.utils.commontools import getAbsPathFDS
+from vsensebox.utils.logtools import add_error_log
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+class _Request(object):
+
+    __slots__ = ("patches", "future")
+
+    def __init__(self, patches):
+        self.patches = patches
+        self.future = Future()
+
+
+class BoxEncoder(object):
+
+    """A box encoder for :class:`DeepSORT` sending its image patches to an
+    :class:`EncoderService`; the patches are extracted on the calling thread, into a
+    buffer of its own which is reused once the features of the previous frame are done,
+    so every tracker needs its own box encoder, see :meth:`EncoderService.createBoxEncoder`.
+    """
+
+    def __init__(self, service):
+        from .utils.generate_detections import ImagePatchExtractor
+        self.service = service
+        self._extract_patches = ImagePatchExtractor(service.image_shape)
+
+    def submit(self, img, boxes):
+        """Extract the patches of :obj:`boxes` in :obj:`img` and submit them to the next
+        batch of the service.
+
+        Parameters
+        ----------
+        img : Mat
+            A :obj:`Mat` like object.
+        boxes : list[[X, Y, W, H], ...]
+            A list of boxes.
+
+        Returns
+        -------
+        Future
+            A future of the features of the boxes, an ndarray of shape (N, D).
+        """
+        return self.service.submit(self._extract_patches(img, boxes))
+
+    def __call__(self, img, boxes):
+        return self.submit(img, boxes).result()
+
+
+class EncoderService(object):
+
+    """A service running the appearance encoder of :class:`DeepSORT` on a worker thread,
+    which gathers the image patches of several frames, for example of the streams of
+    several trackers, into full batches of :attr:`batch_size` patches instead of encoding
+    every frame on its own with a partial batch.
+
+    The worker waits for a frame, then for at most :attr:`max_wait` seconds or until
+    :attr:`batch_size` patches are waiting, and runs the encoder once on all of them.
+    :class:`DeepSORT` submits its patches through a :class:`BoxEncoder` before its NMS and
+    Kalman prediction, and waits for the features only afterwards.
+
+    Attributes
+    ----------
+    image_encoder : ImageEncoder
+        The underlying encoder, :code:`image_encoder(patches, batch_size) -> features`.
+    image_shape : list[int, int, int]
+        Shape (height, width, channels) of the patches.
+    batch_size : int
+        Number of patches of a full batch.
+    max_wait : float
+        Maximum number of seconds the first frame of a batch waits for others.
+    """
+
+    def __init__(self, image_encoder, batch_size=32, max_wait=0.005):
+        """Construct an EncoderService and start its worker thread.
+
+        Parameters
+        ----------
+        image_encoder : ImageEncoder
+            The underlying encoder, which has the attributes :obj:`image_shape` and
+            :obj:`feature_dim`.
+        batch_size : int, default=32
+            Number of patches of a full batch.
+        max_wait : float, default=0.005
+            Maximum number of seconds the first frame of a batch waits for others.
+        """
+        self.image_encoder = image_encoder
+        self.image_shape = list(image_encoder.image_shape)
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = float(max_wait)
+        self._requests = queue.Queue()
+        self._stop_event = threading.Event()
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="vsensebox-encoder", daemon=True)
+        self._worker.start()
+
+    def createBoxEncoder(self):
+        """Create a box encoder using this service, to give to :class:`DeepSORT`.
+
+        Returns
+        -------
+        BoxEncoder
+            A box encoder.
+        """
+        return BoxEncoder(self)
+
+    def submit(self, patches):
+        """Submit image patches to the next batch.
+
+        Parameters
+        ----------
+        patches : ndarray
+            An array of shape (N, height, width, channels) of image patches.
+
+        Returns
+        -------
+        Future
+            A future of the features of the patches, an ndarray of shape (N, D).
+        """
+        request = _Request(patches)
+        if len(patches) == 0:
+            request.future.set_result(np.zeros((0, self.image_encoder.feature_dim), np.float32))
+            return request.future
+        # Under the lock, a frame is either queued before close() stops the worker, so 
+        # that it is encoded or failed, or refused
+        with self._submit_lock:
+            if self._stop_event.is_set():
+                msg = "EncoderService() -> The service is closed."
+                add_error_log(msg)
+                raise ValueError(msg)
+            self._requests.put(request)
+        return request.future
+
+    def _collect(self):
+        try:
+            batch = [self._requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        num_patches = len(batch[0].patches)
+        deadline = monotonic() + self.max_wait
+        while num_patches < self.batch_size:
+            remaining = deadline - monotonic()
+            try:
+                request = (self._requests.get(timeout=remaining) if remaining > 0
+                           else self._requests.get_nowait())
+            except queue.Empty:
+                break
+            batch.append(request)
+            num_patches += len(request.patches)
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            if not batch: continue
+            try:
+                patches = batch[0].patches if len(batch) == 1 else \
+                    np.concatenate([r.patches for r in batch])
+                features = self.image_encoder(patches, self.batch_size)
+                start = 0
+                for request in batch:
+                    end = start + len(request.patches)
+                    request.future.set_result(features[start:end])
+                    start = end
+            except Exception as e:
+                add_error_log("EncoderService() -> " + type(e).__name__ + ": " + str(e))
+                for request in batch:
+                    if not request.future.done(): request.future.set_exception(e)
+
+    def close(self):
+        """Stop the worker thread; the frames still waiting fail with :obj:`ValueError`.
+        """
+        with self._submit_lock:
+            self._stop_event.set()
+        self._worker.join()
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            request.future.set_exception(ValueError("EncoderService() -> The service is closed."))
+
+
+def getEncoderService(model_file, batch_size=32, max_wait=0.005, backend="tensorflow",
+                      image_shape=(128, 64, 3)):
+    """Get the encoder service of the model :obj:`model_file`, shared by all the
+    :class:`DeepSORT` trackers using it with the same backend and patch shape, and
+    created on the first call.
+
+    Parameters
+    ----------
+    model_file : str
+        Path of the model file of the encoder.
+    batch_size : int, default=32
+        Number of patches of a full batch, when the service is created.
+    max_wait : float, default=0.005
+        Maximum number of seconds the first frame of a batch waits for others, when the
+        service is created.
+    backend : str, default="tensorflow"
+        Backend of the encoder, :code:`"tensorflow"`, :code:`"opencv"` or :code:`"onnx"`.
+    image_shape : tuple[int, int, int], default=(128, 64, 3)
+        Shape (height, width, channels) of the patches for the :code:`"opencv"` backend, 
+        which cannot read it from the model.
+
+    Returns
+    -------
+    EncoderService
+        The shared encoder service.
+    """
+    key = (getAbsPathFDS(model_file), backend, tuple(image_shape))
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            from .utils.generate_detections import create_image_encoder
+            service = EncoderService(create_image_encoder(model_file, backend, image_shape=image_shape),
+                                     batch_size=batch_size, max_wait=max_wait)
+            _services[key] = service
+    return service
@@ -0,0 +1,266 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import weakref
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+from vsensebox.utils.logtools import add_error_log
+from vsensebox.utils.framering import FrameHandle
+
+
+def _attachSharedMemory(name):
+    # The segments are owned, and unlinked, by the main process only; before Python 3.13, 
+    # the worker registers them again to the resource tracker it shares with the main 
+    # process, which is harmless.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class _BoxBuffers(object):
+
+    """Views of a shared memory block holding up to :attr:`capacity` detections: boxes
+    :code:`float64 (capacity, 4)`, confidences :code:`float64`, classes :code:`int64`
+    and the resulting IDs :code:`int64`.
+    """
+
+    _ROW_BYTES = 4 * 8 + 8 + 8 + 8
+
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, capacity) * self._ROW_BYTES)
+        else:
+            self.shm = _attachSharedMemory(name)
+        buf = self.shm.buf
+        self.boxes = np.ndarray((capacity, 4), dtype=np.float64, buffer=buf)
+        self.conf = np.ndarray((capacity,), dtype=np.float64, buffer=buf, offset=capacity * 32)
+        self.cls = np.ndarray((capacity,), dtype=np.int64, buffer=buf, offset=capacity * 40)
+        self.ids = np.ndarray((capacity,), dtype=np.int64, buffer=buf, offset=capacity * 48)
+
+    def close(self, unlink=False):
+        self.boxes = self.conf = self.cls = self.ids = None
+        self.shm.close()
+        if unlink: self.shm.unlink()
+
+
+class _ImageBuffer(object):
+
+    """A view of a shared memory block holding one image of a fixed shape and dtype.
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attachSharedMemory(name)
+        self.img = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def close(self, unlink=False):
+        self.img = None
+        self.shm.close()
+        if unlink: self.shm.unlink()
+
+
+def _work(conn, config_yaml, relative_to_vsensebox_root, frame_ring):
+    # Entry point of the worker process
+    from vsensebox.modules.trackers import checkTrk
+    boxes, image = None, None
+    try:
+        tracker = checkTrk(tracker=None, config_yaml=config_yaml,
+                           relative_to_vsensebox_root=relative_to_vsensebox_root)
+        conn.send(("ready", None))
+    except Exception as e:
+        conn.send(("error", type(e).__name__ + ": " + str(e)))
+        return
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        cmd = msg[0]
+        try:
+            if cmd == "boxes":
+                if boxes is not None: boxes.close()
+                boxes = _BoxBuffers(msg[2], name=msg[1])
+                conn.send(("ok", None))
+            elif cmd == "image":
+                if image is not None: image.close()
+                image = _ImageBuffer(msg[2], msg[3], name=msg[1])
+                conn.send(("ok", None))
+            elif cmd == "update":
+                n, has_cls, img = msg[1], msg[2], msg[3]
+                if isinstance(img, FrameHandle):
+                    img = frame_ring.get(img)
+                else:
+                    img = image.img if img else None
+                # Copies, as the trackers may keep the boxes of the previous frame, for
+                # example BasicIoU, while the main process overwrites the buffers
+                _, ids = tracker.update(
+                    boxes.boxes[:n].copy(),
+                    boxes.conf[:n].copy(),
+                    boxes_cls=boxes.cls[:n].copy() if has_cls else None,
+                    img=img
+                )
+                img = None
+                boxes.ids[:n] = ids
+                conn.send(("ok", None))
+            elif cmd == "close":
+                break
+        except Exception as e:
+            conn.send(("error", type(e).__name__ + ": " + str(e)))
+    if boxes is not None: boxes.close()
+    if image is not None: image.close()
+    if frame_ring is not None: frame_ring.close()
+    conn.close()
+
+def _release(process, conn, buffers):
+    # Called when a ProcessTracker is closed or garbage collected
+    try:
+        conn.send(("close",))
+    except (OSError, ValueError):
+        pass
+    process.join(timeout=5)
+    if process.is_alive(): process.terminate()
+    conn.close()
+    for b in buffers:
+        if b is not None: b.close(unlink=True)
+
+
+class ProcessTracker(object):
+
+    """A proxy running any tracker, for example :class:`SORT` or :class:`DeepSORT`, in a
+    worker process of its own, so that the trackers of several streams do not share
+    the GIL of the main process.
+
+    It has the same :meth:`update` as the trackers. The detections, the image and the
+    resulting IDs go through shared memory buffers which are only reallocated when they
+    are too small; just a short command goes through the pipe for every frame. With a
+    :obj:`frame_ring`, :meth:`update` also takes a :class:`FrameHandle` as :obj:`img`,
+    and the worker reads the frame from the ring without any copy.
+
+    Attributes
+    ----------
+    config_yaml : str or dict
+        Configuration of the tracker.
+    capacity : int
+        Current maximum number of boxes of a frame, doubled when exceeded.
+    """
+
+    def __init__(self, config_yaml, relative_to_vsensebox_root=False, capacity=256, 
+                 frame_ring=None):
+        """Start the worker process and create the tracker in it.
+
+        Parameters
+        ----------
+        config_yaml : str or dict
+            A YAML/JSON file path, or a raw/ready dictionary.
+        relative_to_vsensebox_root : bool, default=False
+            Passed to :func:`checkTrk` in the worker process.
+        capacity : int, default=256
+            Initial maximum number of boxes of a frame.
+        frame_ring : FrameRing, default=None
+            The :class:`FrameRing` the frames given as :class:`FrameHandle` are in.
+        """
+        self.config_yaml = config_yaml
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_work,
+            args=(child_conn, config_yaml, relative_to_vsensebox_root, frame_ring),
+            name="vsensebox-tracker",
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._boxes = None
+        self._image = None
+        self._buffers = [None, None]
+        self._finalizer = weakref.finalize(self, _release, self._process, self._conn, self._buffers)
+        self._receive()
+        self._setCapacity(int(capacity))
+
+    @property
+    def capacity(self):
+        return self._boxes.capacity
+
+    def _receive(self):
+        try:
+            status, msg = self._conn.recv()
+        except EOFError:
+            status, msg = "error", "The worker process has exited."
+        if status == "error":
+            msg = "ProcessTracker() -> " + str(msg)
+            add_error_log(msg)
+            raise ValueError(msg)
+
+    def _setCapacity(self, capacity):
+        old = self._boxes
+        self._boxes = _BoxBuffers(capacity)
+        self._buffers[0] = self._boxes
+        self._conn.send(("boxes", self._boxes.shm.name, capacity))
+        self._receive()
+        if old is not None: old.close(unlink=True)
+
+    def _setImage(self, img):
+        old = self._image
+        self._image = _ImageBuffer(img.shape, img.dtype)
+        self._buffers[1] = self._image
+        self._conn.send(("image", self._image.shm.name, self._image.shape, self._image.dtype.str))
+        self._receive()
+        if old is not None: old.close(unlink=True)
+
+    def update(self, boxes_xyxy, boxes_conf, boxes_cls=None, img=None):
+        """Update the tracker in the worker process and return a track list.
+
+        Parameters
+        ----------
+        boxes_xyxy : list[[X1, Y1, X2, Y2], ...]
+            A list of boxes; for example, [[X1, Y1, X2, Y2], [X1, Y1, X2, Y2], ...].
+        boxes_conf : list[float, ...]
+            A list of detection confidences corresponding to boxes_xyxy.
+        boxes_cls : list[int, ...], default=None
+            A list of detection class corresponding to boxes_xyxy.
+        img : Mat or FrameHandle, default=None
+            A :obj:`Mat` like object, only copied to the worker process when given, or 
+            the handle of a frame in the :obj:`frame_ring`, which is not copied.
+
+        Returns
+        -------
+        list[[X1, Y1, X2, Y2], ...]
+            The given :obj:`boxes_xyxy`.
+        ndarray[int64]
+            An array of IDs corresponding to the the list of boxes.
+        """
+        n = len(boxes_xyxy)
+        if n > self._boxes.capacity:
+            self._setCapacity(max(n, 2 * self._boxes.capacity))
+        if n > 0:
+            self._boxes.boxes[:n] = np.asarray(boxes_xyxy).reshape(-1, 4)
+            self._boxes.conf[:n] = np.asarray(boxes_conf).reshape(-1)
+        has_cls = boxes_cls is not None and len(boxes_cls) == n
+        if has_cls and n > 0:
+            self._boxes.cls[:n] = np.asarray(boxes_cls).reshape(-1)
+        if isinstance(img, np.ndarray):
+            if self._image is None or self._image.shape != img.shape or self._image.dtype != img.dtype:
+                self._setImage(img)
+            self._image.img[...] = img
+            img = True
+        elif not isinstance(img, FrameHandle):
+            img = False
+        self._conn.send(("update", n, has_cls, img))
+        self._receive()
+        return boxes_xyxy, self._boxes.ids[:n].copy()
+
+    def close(self):
+        """Stop the worker process and free the shared memory buffers.
+        """
+        self._finalizer()
@@ -5,17 +5,24 @@
 
 import numpy as np
 from vsensebox.utils.logtools import ignore_this_logger
+from vsensebox.utils.profiletools import NULL_PROFILER
 
 ignore_this_logger("sort")
-from .utils.sort import Sort as ST
-from .utils.box_matching import matchDetTrkByXYXYForSORT
+from .utils.sort import BatchSort as ST
 
 
 class SORT(object):
 
     """Class used as a custom layer or interface for interacting with SORT tracker.
+
+    Attributes
+    ----------
+    profiler : StageProfiler or NullProfiler
+      The profiler recording the stages of the tracking.
     """
 
+    profiler = NULL_PROFILER
+
     def __init__(self, cfg):
         """Initialize according to the given :obj:`cfg` and :obj:`auto_load`.
 
@@ -44,13 +51,45 @@ class SORT(object):
         -------
         list[[X1, Y1, X2, Y2], ...]
             A list of boxes; for example, [[X1, Y1, X2, Y2], [X1, Y1, X2, Y2], ...].
-        list[int]
-            A list of IDs corresponding to the the list of boxes.
+        ndarray[int64]
+            An array of IDs corresponding to the the list of boxes, -1 for a box which 
+            is not tracked yet.
         """
-        detection = []
-        for b, c in zip(boxes_xyxy, boxes_conf):
-          b = np.append(b, c)
-          detection.append(b)
-        track = self.st.update(np.array(detection)).astype(int)
-        ids = matchDetTrkByXYXYForSORT(boxes_xyxy, track, max_spread=10)
+        detection = np.empty((len(boxes_xyxy), 5))
+        if len(detection) > 0:
+          detection[:, :4] = boxes_xyxy
+          detection[:, 4] = boxes_conf
+        with self.profiler.stage("track.update"):
+          track, det_indices = self.st.update(detection, return_indices=True)
+        with self.profiler.stage("track.ids"):
+          ids = np.full(len(boxes_xyxy), -1, dtype=np.int64)
+          ids[det_indices] = track[:, 4].astype(np.int64)
         return boxes_xyxy, ids
+
+    def predict(self):
+        """Advance the tracker by one frame without detections, for a frame on which the 
+        detector is not run, and return the predicted boxes of the objects tracked in the 
+        last updated frame; the frame is not counted as a miss.
+
+        Returns
+        -------
+        ndarray[float64], shape (N, 4)
+            An array of predicted boxes; for example, [[X1, Y1, X2, Y2], ...].
+        ndarray[int64]
+            An array of IDs corresponding to the predicted boxes.
+        """
+        with self.profiler.stage("track.predict"):
+          track = self.st.coast()
+        return track[:, :4], track[:, 4].astype(np.int64)
+
+    def getUncertainty(self):
+        """Get the uncertainty of the position of the tracked objects in the next frame.
+
+        Returns
+        -------
+        float
+            The largest standard deviation of a predicted center relative to the size of 
+            its box, 0 if no object is tracked.
+        """
+        u = self.st.uncertainty()
+        return float(u.max()) if len(u) > 0 else 0.0
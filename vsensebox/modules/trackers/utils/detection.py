@@ -22,7 +22,8 @@ class Detection(object):
     confidence : ndarray
         Detector confidence score.
     feature : ndarray | NoneType
-        A feature vector that describes the object contained in this image.
+        A float32 feature vector that describes the object contained in this
+        image.
 
     """
 
@@ -30,7 +31,7 @@ class Detection(object):
         self.tlwh = np.asarray(tlwh, dtype=np.float64)
         self.confidence = float(confidence)
         self.cls = cls
-        self.feature = np.asarray(feature, dtype=np.float64)
+        self.feature = np.asarray(feature, dtype=np.float32)
 
     def to_tlbr(self):
         """Convert bounding box to format `(min x, min y, max x, max y)`, i.e.,
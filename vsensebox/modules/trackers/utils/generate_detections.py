@@ -5,15 +5,14 @@ import argparse
 import numpy as np
 import cv2
 
+from vsensebox.utils.logtools import add_error_log
+
 
 # import logging
 # logging.disable(logging.WARNING)
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "1"
 os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 
-import tensorflow as tf
-tf.autograph.set_verbosity(1)
-
 # physical_devices = tf.config.experimental.list_physical_devices('GPU')
 # tf.config.experimental.set_memory_growth(physical_devices[0], True)
 
@@ -78,9 +77,106 @@ def extract_image_patch(image, bbox, patch_shape):
     return image
 
 
+def _get_patch_rois(image, boxes, patch_shape):
+    """Same as the aspect correction and the clipping of
+    `extract_image_patch()` for an Nx4 array of boxes; returns an Nx4 int32
+    array of (min x, min y, max x, max y) and a mask of the non-empty ones.
+    """
+    boxes = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+    # correct aspect ratio to patch shape
+    target_aspect = float(patch_shape[1]) / patch_shape[0]
+    new_width = target_aspect * boxes[:, 3]
+    boxes[:, 0] -= (new_width - boxes[:, 2]) / 2
+    boxes[:, 2] = new_width
+
+    # convert to top left, bottom right
+    boxes[:, 2:] += boxes[:, :2]
+    rois = boxes.astype(np.int32)
+
+    # clip at image boundaries
+    np.maximum(rois[:, :2], 0, out=rois[:, :2])
+    np.minimum(rois[:, 2:], np.asarray(image.shape[:2][::-1]) - 1, out=rois[:, 2:])
+    valid = np.all(rois[:, :2] < rois[:, 2:], axis=1)
+    return rois, valid
+
+
+def extract_image_patches(image, boxes, image_shape, out=None):
+    """Extract the image patches of all the bounding boxes, resized straight
+    into one array; a box whose patch cannot be extracted gets a random patch.
+
+    Parameters
+    ----------
+    image : ndarray
+        The full image.
+    boxes : array_like
+        The bounding boxes in format (x, y, width, height).
+    image_shape : array_like
+        The shape (height, width, channels) of the patches.
+    out : Optional[ndarray]
+        A uint8 array of shape (M, height, width, channels), M >= N, to write
+        the patches in. If None, a new array is allocated.
+
+    Returns
+    -------
+    ndarray
+        An array of shape (N, height, width, channels) of the patches, a view
+        of :arg:`out` if given.
+
+    """
+    rois, valid = _get_patch_rois(image, boxes, image_shape[:2])
+    n = len(rois)
+    if out is None:
+        out = np.empty((n, *image_shape), dtype=np.uint8)
+    patches = out[:n]
+    dsize = (int(image_shape[1]), int(image_shape[0]))
+    for i in np.flatnonzero(valid):
+        sx, sy, ex, ey = rois[i]
+        cv2.resize(image[sy:ey, sx:ex], dsize, dst=patches[i])
+    for i in np.flatnonzero(~valid):
+        print("WARNING: Failed to extract image patch: %s." % str(boxes[i]))
+        patches[i] = np.random.uniform(0., 255., image_shape).astype(np.uint8)
+    return patches
+
+
+class ImagePatchExtractor(object):
+    """Extracts the image patches of the bounding boxes of a frame into a
+    buffer reused from frame to frame, which only grows when a frame has more
+    boxes than it can hold.
+
+    The patches returned for a frame are overwritten by the next call.
+
+    Parameters
+    ----------
+    image_shape : array_like
+        The shape (height, width, channels) of the patches.
+
+    """
+
+    def __init__(self, image_shape):
+        self.image_shape = tuple(image_shape)
+        self._buffer = np.empty((0, *self.image_shape), dtype=np.uint8)
+
+    def __call__(self, image, boxes):
+        n = len(boxes)
+        if n > len(self._buffer):
+            self._buffer = np.empty(
+                (max(n, 2 * len(self._buffer)), *self.image_shape), dtype=np.uint8)
+        return extract_image_patches(image, boxes, self.image_shape, out=self._buffer)
+
+
 class ImageEncoder(object):
+    """The TensorFlow backend of the image encoder, running a frozen
+    inference graph in a session; TensorFlow is only imported here.
+
+    All the backends have the attributes `image_shape`, the (height, width,
+    channels) of the input patches, and `feature_dim`, and are called with
+    an (N, height, width, channels) uint8 array of BGR patches; they return
+    an (N, feature_dim) float32 array of features.
+    """
 
     def __init__(self, checkpoint_filename, input_name="images", output_name="features"):
+        import tensorflow as tf
+        tf.autograph.set_verbosity(1)
         with tf.Graph().as_default():
             gpu_options = tf.compat.v1.GPUOptions(per_process_gpu_memory_fraction=0.25)
             self.session = tf.compat.v1.Session(config=tf.compat.v1.ConfigProto(gpu_options=gpu_options, allow_soft_placement=True))
@@ -96,28 +192,175 @@ class ImageEncoder(object):
             self.image_shape = self.input_var.get_shape().as_list()[1:]
 
     def __call__(self, data_x, batch_size=32):
-        out = np.zeros((len(data_x), self.feature_dim), np.float64)
+        out = np.empty((len(data_x), self.feature_dim), np.float32)
         _run_in_batches(
             lambda x: self.session.run(self.output_var, feed_dict=x),
             {self.input_var: data_x}, out, batch_size)
         return out
 
 
+class OpenCVImageEncoder(object):
+    """The OpenCV DNN backend of the image encoder, for a network which
+    `cv2.dnn.readNet()` can read, such as a frozen TensorFlow graph or an
+    ONNX model taking the patches as float BGR pixels; it runs on the CPU
+    without TensorFlow.
+
+    OpenCV cannot read the `tf.map_fn` loop which preprocesses the patches
+    in `mars-small128.pb`, so that model needs a graph of the network alone
+    or, converted to ONNX, the ONNX backend.
+
+    The input shape is not read from the network, so it is given by
+    `image_shape`, and `feature_dim` is found with a first forward pass.
+    """
+
+    def __init__(self, checkpoint_filename, input_name="images", output_name="features",
+                 image_shape=(128, 64, 3)):
+        self.net = cv2.dnn.readNet(checkpoint_filename)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        layer_names = self.net.getLayerNames()
+        self.output_name = output_name if output_name in layer_names else None
+        self.image_shape = list(image_shape)
+        self.feature_dim = self._run(
+            np.zeros((1, *self.image_shape), np.uint8)).shape[-1]
+
+    def _run(self, data_x):
+        # NHWC uint8 -> NCHW float32, as cv2.dnn.blobFromImages() does
+        self.net.setInput(np.ascontiguousarray(
+            data_x.transpose(0, 3, 1, 2), dtype=np.float32))
+        out = self.net.forward(self.output_name) if self.output_name \
+            else self.net.forward()
+        return out.reshape(len(data_x), -1)
+
+    def __call__(self, data_x, batch_size=32):
+        out = np.empty((len(data_x), self.feature_dim), np.float32)
+        _run_in_batches(
+            lambda x: self._run(x["images"]), {"images": data_x}, out, batch_size)
+        return out
+
+
+class ONNXImageEncoder(object):
+    """The ONNX Runtime backend of the image encoder, for an ONNX export of
+    the network, for example converted from the frozen TensorFlow graph by
+    tf2onnx; it needs the `onnxruntime` package instead of TensorFlow.
+
+    The input layout, NHWC or NCHW, and its type, uint8 or float, are read
+    from the model.
+    """
+
+    def __init__(self, checkpoint_filename, input_name="images", output_name="features",
+                 providers=None):
+        import onnxruntime as ort
+        if providers is None:
+            providers = ort.get_available_providers()
+        self.session = ort.InferenceSession(checkpoint_filename, providers=providers)
+        self.input = self._find(self.session.get_inputs(), input_name)
+        self.output = self._find(self.session.get_outputs(), output_name)
+        self.channels_last, self.image_shape = self._get_layout(self.input.shape)
+        self.input_dtype = np.uint8 if self.input.type == "tensor(uint8)" else np.float32
+        self.feature_dim = self.output.shape[-1]
+        if not isinstance(self.feature_dim, int):
+            self.feature_dim = self._run(
+                np.zeros((1, *self.image_shape), np.uint8)).shape[-1]
+
+    @staticmethod
+    def _find(nodes, name):
+        # tf2onnx keeps the TensorFlow tensor names, such as "images:0"
+        for node in nodes:
+            if node.name in (name, name + ":0"):
+                return node
+        msg = "ONNXImageEncoder() -> The model has no tensor '%s', only %s." % (
+            name, [node.name for node in nodes])
+        add_error_log(msg)
+        raise ValueError(msg)
+
+    @staticmethod
+    def _get_layout(shape):
+        # The dimensions may be symbolic, given as strings, except those of a patch
+        dims = list(shape[1:])
+        if len(dims) == 3 and all(isinstance(d, int) for d in dims):
+            if dims[2] in (1, 3):
+                return True, dims
+            if dims[0] in (1, 3):
+                return False, [dims[1], dims[2], dims[0]]
+        msg = ("ONNXImageEncoder() -> Cannot find the layout of the input of shape %s, "
+               "expected (N, height, width, channels) or (N, channels, height, width) with "
+               "1 or 3 channels." % (list(shape),))
+        add_error_log(msg)
+        raise ValueError(msg)
+
+    def _run(self, data_x):
+        if not self.channels_last:
+            data_x = data_x.transpose(0, 3, 1, 2)
+        data_x = np.ascontiguousarray(data_x, dtype=self.input_dtype)
+        return self.session.run([self.output.name], {self.input.name: data_x})[0]
+
+    def __call__(self, data_x, batch_size=32):
+        out = np.empty((len(data_x), self.feature_dim), np.float32)
+        _run_in_batches(
+            lambda x: self._run(x["images"]), {"images": data_x}, out, batch_size)
+        return out
+
+
+ENCODER_BACKENDS = {
+    "tensorflow": ImageEncoder,
+    "opencv": OpenCVImageEncoder,
+    "onnx": ONNXImageEncoder
+}
+
+
+def create_image_encoder(model_filename, backend="tensorflow", input_name="images",
+                         output_name="features", image_shape=(128, 64, 3)):
+    """Create the image encoder of the given backend.
+
+    Parameters
+    ----------
+    model_filename : str
+        Path of the model file of the backend.
+    backend : str
+        One of the keys of `ENCODER_BACKENDS`: "tensorflow", "opencv" or
+        "onnx".
+    input_name : str
+        Name of the input of the network.
+    output_name : str
+        Name of the output of the network.
+    image_shape : array_like
+        The shape (height, width, channels) of the patches, for the "opencv"
+        backend; the other backends read it from the model.
+
+    Returns
+    -------
+    ImageEncoder | OpenCVImageEncoder | ONNXImageEncoder
+        The image encoder.
+
+    """
+    if backend not in ENCODER_BACKENDS:
+        msg = "create_image_encoder() -> Unknown encoder backend '%s', expected one of %s." % (
+            backend, list(ENCODER_BACKENDS))
+        add_error_log(msg)
+        raise ValueError(msg)
+    if backend == "opencv":
+        try:
+            return OpenCVImageEncoder(model_filename, input_name, output_name, image_shape)
+        except cv2.error as e:
+            msg = ("create_image_encoder() -> OpenCV DNN cannot run the encoder model '%s'; "
+                   "a graph with the tf.map_fn preprocessing of mars-small128.pb needs to "
+                   "be stripped to the network or converted to ONNX for the 'onnx' backend. "
+                   "%s" % (model_filename, str(e).strip()))
+            add_error_log(msg)
+            raise ValueError(msg)
+    return ENCODER_BACKENDS[backend](model_filename, input_name, output_name)
+
+
 def create_box_encoder(model_filename, input_name="images",
-                       output_name="features", batch_size=32):
-    image_encoder = ImageEncoder(model_filename, input_name, output_name)
-    image_shape = image_encoder.image_shape
+                       output_name="features", batch_size=32, backend="tensorflow",
+                       image_shape=(128, 64, 3)):
+    image_encoder = create_image_encoder(model_filename, backend, input_name, output_name,
+                                         image_shape)
+    extract_patches = ImagePatchExtractor(image_encoder.image_shape)
 
     def encoder(image, boxes):
-        image_patches = []
-        for box in boxes:
-            patch = extract_image_patch(image, box, image_shape[:2])
-            if patch is None:
-                print("WARNING: Failed to extract image patch: %s." % str(box))
-                patch = np.random.uniform(
-                    0., 255., image_shape).astype(np.uint8)
-            image_patches.append(patch)
-        image_patches = np.asarray(image_patches)
+        image_patches = extract_patches(image, boxes)
         return image_encoder(image_patches, batch_size)
 
     return encoder
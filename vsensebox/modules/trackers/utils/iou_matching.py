@@ -40,6 +40,41 @@ def iou(bbox, candidates):
     return area_intersection / (area_bbox + area_candidates - area_intersection)
 
 
+def iou_matrix(bboxes, candidates):
+    """Computer intersection over union between every pair of boxes.
+
+    Parameters
+    ----------
+    bboxes : ndarray
+        An Nx4 matrix of bounding boxes in format `(top left x, top left y,
+        width, height)`.
+    candidates : ndarray
+        An Mx4 matrix of candidate bounding boxes in the same format as
+        `bboxes`.
+
+    Returns
+    -------
+    ndarray
+        An NxM matrix, where element (i, j) is the intersection over union in
+        [0, 1] between `bboxes[i]` and `candidates[j]`, same as
+        `iou(bboxes[i], candidates)[j]`.
+
+    """
+    bboxes_tl = bboxes[:, np.newaxis, :2]
+    bboxes_br = bboxes_tl + bboxes[:, np.newaxis, 2:]
+    candidates_tl = candidates[np.newaxis, :, :2]
+    candidates_br = candidates_tl + candidates[np.newaxis, :, 2:]
+
+    tl = np.maximum(bboxes_tl, candidates_tl)
+    br = np.minimum(bboxes_br, candidates_br)
+    wh = np.maximum(0., br - tl)
+
+    area_intersection = wh.prod(axis=2)
+    area_bboxes = bboxes[:, 2:].prod(axis=1)[:, np.newaxis]
+    area_candidates = candidates[:, 2:].prod(axis=1)[np.newaxis, :]
+    return area_intersection / (area_bboxes + area_candidates - area_intersection)
+
+
 def iou_cost(tracks, detections, track_indices=None,
              detection_indices=None):
     """An intersection over union distance metric.
@@ -70,13 +105,12 @@ def iou_cost(tracks, detections, track_indices=None,
     if detection_indices is None:
         detection_indices = np.arange(len(detections))
 
-    cost_matrix = np.zeros((len(track_indices), len(detection_indices)))
-    for row, track_idx in enumerate(track_indices):
-        if tracks[track_idx].time_since_update > 1:
-            cost_matrix[row, :] = linear_assignment.INFTY_COST
-            continue
-
-        bbox = tracks[track_idx].to_tlwh()
-        candidates = np.asarray([detections[i].tlwh for i in detection_indices])
-        cost_matrix[row, :] = 1. - iou(bbox, candidates)
+    bboxes = np.asarray(
+        [tracks[i].to_tlwh() for i in track_indices]).reshape(-1, 4)
+    candidates = np.asarray(
+        [detections[i].tlwh for i in detection_indices]).reshape(-1, 4)
+    cost_matrix = 1. - iou_matrix(bboxes, candidates)
+    outdated = np.asarray(
+        [tracks[i].time_since_update > 1 for i in track_indices], dtype=bool)
+    cost_matrix[outdated, :] = linear_assignment.INFTY_COST
     return cost_matrix
@@ -227,3 +227,196 @@ class KalmanFilter(object):
             overwrite_b=True)
         squared_maha = np.sum(z * z, axis=0)
         return squared_maha
+
+    def _multi_diag(self, std):
+        """Build a stack of diagonal matrices from an NxK matrix of standard
+        deviations."""
+        ndim = std.shape[1]
+        diag = np.zeros((len(std), ndim, ndim))
+        diag[:, np.arange(ndim), np.arange(ndim)] = np.square(std)
+        return diag
+
+    def multi_predict(self, mean, covariance):
+        """Run Kalman filter prediction step for N stacked states at once.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean matrix of the object states at the previous
+            time step.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the object states at the
+            previous time step.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the mean matrix and covariance matrices of the predicted
+            states. Same as calling `predict` on every state.
+
+        """
+        height = mean[:, 3]
+        ones = np.ones_like(height)
+        std = np.stack([
+            self._std_weight_position * height,
+            self._std_weight_position * height,
+            1e-2 * ones,
+            self._std_weight_position * height,
+            self._std_weight_velocity * height,
+            self._std_weight_velocity * height,
+            1e-5 * ones,
+            self._std_weight_velocity * height], axis=1)
+        motion_cov = self._multi_diag(std)
+
+        mean = np.dot(mean, self._motion_mat.T)
+        covariance = self._motion_mat @ covariance @ self._motion_mat.T + motion_cov
+
+        return mean, covariance
+
+    def multi_project(self, mean, covariance):
+        """Project N stacked state distributions to measurement space.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean matrix of the states.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the states.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and the Nx4x4 projected covariance
+            matrices of the given state estimates.
+
+        """
+        height = mean[:, 3]
+        std = np.stack([
+            self._std_weight_position * height,
+            self._std_weight_position * height,
+            1e-1 * np.ones_like(height),
+            self._std_weight_position * height], axis=1)
+        innovation_cov = self._multi_diag(std)
+
+        mean = np.dot(mean, self._update_mat.T)
+        covariance = self._update_mat @ covariance @ self._update_mat.T
+        return mean, covariance + innovation_cov
+
+    def multi_update(self, mean, covariance, measurement):
+        """Run Kalman filter correction step for N stacked states at once.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean matrix of the predicted states.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the states.
+        measurement : ndarray
+            The Nx4 dimensional matrix of measurement vectors (x, y, a, h), one
+            per state.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the measurement-corrected state distributions.
+
+        """
+        projected_mean, projected_cov = self.multi_project(mean, covariance)
+
+        kalman_gain = np.linalg.solve(
+            projected_cov, (covariance @ self._update_mat.T).transpose(0, 2, 1)
+        ).transpose(0, 2, 1)
+        innovation = measurement - projected_mean
+
+        new_mean = mean + np.einsum('nij,nj->ni', kalman_gain, innovation)
+        new_covariance = covariance - \
+            kalman_gain @ projected_cov @ kalman_gain.transpose(0, 2, 1)
+        return new_mean, new_covariance
+
+    def multi_gating_factors(self, mean, covariance, only_position=False):
+        """Compute the factors needed to gate N stacked state distributions,
+        see `squared_mahalanobis`. They only depend on the states, so they can
+        be computed once per time step and reused for any set of measurements.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean matrix of the states.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the states.
+        only_position : Optional[bool]
+            If True, the factors are computed with respect to the bounding box
+            center position only.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nxk projected means and the Nxkxk inverses of the lower
+            Cholesky factors of the projected covariances, where k is 2 if
+            `only_position` is True, otherwise 4.
+
+        """
+        mean, covariance = self.multi_project(mean, covariance)
+        if only_position:
+            mean, covariance = mean[:, :2], covariance[:, :2, :2]
+        inverse_cholesky = np.linalg.inv(np.linalg.cholesky(covariance))
+        return mean, inverse_cholesky
+
+    def multi_gating_distance(self, mean, covariance, measurements,
+                              only_position=False):
+        """Compute gating distance between N stacked state distributions and M
+        measurements.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean matrix of the states.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the states.
+        measurements : ndarray
+            An Mx4 dimensional matrix of M measurements, each in
+            format (x, y, a, h) where (x, y) is the bounding box center
+            position, a the aspect ratio, and h the height.
+        only_position : Optional[bool]
+            If True, distance computation is done with respect to the bounding
+            box center position only.
+
+        Returns
+        -------
+        ndarray
+            Returns an NxM matrix, where element (i, j) contains the squared
+            Mahalanobis distance between the i-th state distribution and
+            `measurements[j]`.
+
+        """
+        projected_mean, inverse_cholesky = self.multi_gating_factors(
+            mean, covariance, only_position)
+        return squared_mahalanobis(
+            projected_mean, inverse_cholesky, measurements)
+
+
+def squared_mahalanobis(projected_mean, inverse_cholesky, measurements):
+    """Compute the squared Mahalanobis distance between N projected state
+    distributions and M measurements.
+
+    Parameters
+    ----------
+    projected_mean : ndarray
+        The Nxk projected means, see `KalmanFilter.multi_gating_factors`.
+    inverse_cholesky : ndarray
+        The Nxkxk inverses of the lower Cholesky factors of the projected
+        covariances, see `KalmanFilter.multi_gating_factors`.
+    measurements : ndarray
+        An Mx4 (or Mxk) dimensional matrix of M measurements in format
+        (x, y, a, h); only the first k columns are used.
+
+    Returns
+    -------
+    ndarray
+        Returns an NxM matrix of squared Mahalanobis distances.
+
+    """
+    ndim = projected_mean.shape[1]
+    d = measurements[np.newaxis, :, :ndim] - projected_mean[:, np.newaxis, :]
+    z = np.einsum('nij,nmj->nmi', inverse_cholesky, d)
+    return np.sum(z * z, axis=2)
@@ -148,7 +148,7 @@ def matching_cascade(
 
 def gate_cost_matrix(
         kf, cost_matrix, tracks, detections, track_indices, detection_indices,
-        gated_cost=INFTY_COST, only_position=False):
+        gated_cost=INFTY_COST, only_position=False, gating_factors=None):
     """Invalidate infeasible entries in cost matrix based on the state
     distributions obtained by Kalman filtering.
 
@@ -176,6 +176,11 @@ def gate_cost_matrix(
     only_position : Optional[bool]
         If True, only the x, y position of the state distribution is considered
         during gating. Defaults to False.
+    gating_factors : Optional[(ndarray, ndarray)]
+        The output of `kf.multi_gating_factors` for all `tracks` of the current
+        time step, computed with the same `only_position`. If given, it is
+        reused instead of projecting the tracks again, e.g. across the levels
+        of the matching cascade.
 
     Returns
     -------
@@ -187,9 +192,15 @@ def gate_cost_matrix(
     gating_threshold = kalman_filter.chi2inv95[gating_dim]
     measurements = np.asarray(
         [detections[i].to_xyah() for i in detection_indices])
-    for row, track_idx in enumerate(track_indices):
-        track = tracks[track_idx]
-        gating_distance = kf.gating_distance(
-            track.mean, track.covariance, measurements, only_position)
-        cost_matrix[row, gating_distance > gating_threshold] = gated_cost
+    if gating_factors is None:
+        projected_mean, inverse_cholesky = kf.multi_gating_factors(
+            np.asarray([tracks[i].mean for i in track_indices]),
+            np.asarray([tracks[i].covariance for i in track_indices]),
+            only_position)
+    else:
+        projected_mean = gating_factors[0][track_indices]
+        inverse_cholesky = gating_factors[1][track_indices]
+    gating_distance = kalman_filter.squared_mahalanobis(
+        projected_mean, inverse_cholesky, measurements)
+    cost_matrix[gating_distance > gating_threshold] = gated_cost
     return cost_matrix
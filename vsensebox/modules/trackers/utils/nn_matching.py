@@ -2,98 +2,30 @@
 import numpy as np
 
 
-def _pdist(a, b):
-    """Compute pair-wise squared distance between points in `a` and `b`.
+def normalize_features(features):
+    """Normalize feature vectors to unit length, once when they are encoded,
+    so that the cosine distance is a dot product.
 
     Parameters
     ----------
-    a : array_like
-        An NxM matrix of N samples of dimensionality M.
-    b : array_like
-        An LxM matrix of L samples of dimensionality M.
+    features : array_like
+        An NxM matrix of N features of dimensionality M, or a single feature
+        vector of length M.
 
     Returns
     -------
     ndarray
-        Returns a matrix of size len(a), len(b) such that eleement (i, j)
-        contains the squared distance between `a[i]` and `b[j]`.
+        The NxM float32 matrix of the normalized features.
 
     """
-    a, b = np.asarray(a), np.asarray(b)
-    if len(a) == 0 or len(b) == 0:
-        return np.zeros((len(a), len(b)))
-    a2, b2 = np.square(a).sum(axis=1), np.square(b).sum(axis=1)
-    r2 = -2. * np.dot(a, b.T) + a2[:, None] + b2[None, :]
-    r2 = np.clip(r2, 0., float(np.inf))
-    return r2
-
-
-def _cosine_distance(a, b, data_is_normalized=False):
-    """Compute pair-wise cosine distance between points in `a` and `b`.
-
-    Parameters
-    ----------
-    a : array_like
-        An NxM matrix of N samples of dimensionality M.
-    b : array_like
-        An LxM matrix of L samples of dimensionality M.
-    data_is_normalized : Optional[bool]
-        If True, assumes rows in a and b are unit length vectors.
-        Otherwise, a and b are explicitly normalized to lenght 1.
-
-    Returns
-    -------
-    ndarray
-        Returns a matrix of size len(a), len(b) such that eleement (i, j)
-        contains the squared distance between `a[i]` and `b[j]`.
-
-    """
-    if not data_is_normalized:
-        a = np.asarray(a) / np.linalg.norm(a, axis=1, keepdims=True)
-        b = np.asarray(b) / np.linalg.norm(b, axis=1, keepdims=True)
-    return 1. - np.dot(a, b.T)
-
-
-def _nn_euclidean_distance(x, y):
-    """ Helper function for nearest neighbor distance metric (Euclidean).
-
-    Parameters
-    ----------
-    x : ndarray
-        A matrix of N row-vectors (sample points).
-    y : ndarray
-        A matrix of M row-vectors (query points).
-
-    Returns
-    -------
-    ndarray
-        A vector of length M that contains for each entry in `y` the
-        smallest Euclidean distance to a sample in `x`.
-
-    """
-    distances = _pdist(x, y)
-    return np.maximum(0.0, distances.min(axis=0))
-
-
-def _nn_cosine_distance(x, y):
-    """ Helper function for nearest neighbor distance metric (cosine).
-
-    Parameters
-    ----------
-    x : ndarray
-        A matrix of N row-vectors (sample points).
-    y : ndarray
-        A matrix of M row-vectors (query points).
-
-    Returns
-    -------
-    ndarray
-        A vector of length M that contains for each entry in `y` the
-        smallest cosine distance to a sample in `x`.
-
-    """
-    distances = _cosine_distance(x, y)
-    return distances.min(axis=0)
+    features = np.array(features, dtype=np.float32)
+    if features.ndim == 1 and len(features) > 0:
+        features = features.reshape(1, -1)
+    elif features.ndim != 2:
+        features = features.reshape(len(features), features.size // max(len(features), 1))
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    features /= np.maximum(norms, np.finfo(np.float32).tiny)
+    return features
 
 
 class NearestNeighborDistanceMetric(object):
@@ -101,6 +33,13 @@ class NearestNeighborDistanceMetric(object):
     A nearest neighbor distance metric that, for each target, returns
     the closest distance to any sample that has been observed so far.
 
+    The samples are stored in a gallery, a float32 ring buffer of shape
+    (slots, budget, dimensionality) with one slot per active target, so that
+    `distance` runs one matrix product and one min-reduction for all the
+    requested targets. The slots of the targets which are not active anymore
+    are reused, and the gallery only grows when more targets are active, or,
+    without budget, when a target has more samples than it can hold.
+
     Parameters
     ----------
     metric : str
@@ -111,28 +50,67 @@ class NearestNeighborDistanceMetric(object):
     budget : Optional[int]
         If not None, fix samples per class to at most this number. Removes
         the oldest samples when the budget is reached.
+    data_is_normalized : Optional[bool]
+        If True, the features are unit length float32 vectors, as returned by
+        `normalize_features`, and the cosine metric does not normalize them
+        again; otherwise, the cosine metric normalizes the samples once when
+        they are added to the gallery.
 
     Attributes
     ----------
-    samples : Dict[int -> List[ndarray]]
-        A dictionary that maps from target identities to the list of samples
-        that have been observed so far.
+    samples : Dict[int -> ndarray]
+        A dictionary that maps from target identities to the samples that have
+        been observed so far, in no particular order; a read-only view of the
+        gallery.
 
     """
 
-    def __init__(self, metric, matching_threshold, budget=None):
+    def __init__(self, metric, matching_threshold, budget=None,
+                 data_is_normalized=False):
 
 
-        if metric == "euclidean":
-            self._metric = _nn_euclidean_distance
-        elif metric == "cosine":
-            self._metric = _nn_cosine_distance
-        else:
+        if metric not in ("euclidean", "cosine"):
             raise ValueError(
                 "Invalid metric; must be either 'euclidean' or 'cosine'")
+        self._cosine = metric == "cosine"
+        self._normalize = self._cosine and not data_is_normalized
         self.matching_threshold = matching_threshold
         self.budget = budget
-        self.samples = {}
+        self._gallery = None
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._heads = np.zeros(0, dtype=np.int64)
+        self._slots = {}
+        self._free_slots = []
+
+    @property
+    def samples(self):
+        return {target: self._gallery[slot, :self._counts[slot]]
+                for target, slot in self._slots.items()}
+
+    def _allocate(self, num_slots, depth, dim):
+        """Grow the gallery to at least `num_slots` slots of `depth` samples.
+        """
+        if self._gallery is None:
+            old_slots, old_depth = 0, 0
+        else:
+            old_slots, old_depth = self._gallery.shape[:2]
+        num_slots = max(num_slots, 2 * old_slots) if num_slots > old_slots else old_slots
+        depth = max(depth, 2 * old_depth) if depth > old_depth else old_depth
+        if (num_slots, depth) == (old_slots, old_depth):
+            return
+        gallery = np.zeros((num_slots, depth, dim), dtype=np.float32)
+        if self._gallery is not None:
+            gallery[:old_slots, :old_depth] = self._gallery
+        self._gallery = gallery
+        self._free_slots.extend(range(num_slots - 1, old_slots - 1, -1))
+        new_slots = np.zeros(num_slots - old_slots, dtype=np.int64)
+        self._counts = np.concatenate((self._counts, new_slots))
+        self._heads = np.concatenate((self._heads, new_slots))
+        if depth > old_depth:
+            # The depth only grows without budget, where the samples of a
+            # slot are never overwritten, so they fill it from the start and
+            # the next one goes after them, even if the slot was full.
+            self._heads[:old_slots] = self._counts[:old_slots]
 
     def partial_fit(self, features, targets, active_targets):
         """Update the distance metric with new data.
@@ -147,11 +125,49 @@ class NearestNeighborDistanceMetric(object):
             A list of targets that are currently present in the scene.
 
         """
-        for feature, target in zip(features, targets):
-            self.samples.setdefault(target, []).append(feature)
-            if self.budget is not None:
-                self.samples[target] = self.samples[target][-self.budget:]
-        self.samples = {k: self.samples[k] for k in active_targets}
+        active_targets = set(active_targets)
+        for target in [t for t in self._slots if t not in active_targets]:
+            slot = self._slots.pop(target)
+            self._counts[slot] = 0
+            self._heads[slot] = 0
+            self._free_slots.append(slot)
+
+        keep = [i for i, t in enumerate(targets) if t in active_targets]
+        if len(keep) == 0:
+            return
+        features = np.asarray(features, dtype=np.float32)[keep]
+        if self._normalize:
+            features = normalize_features(features)
+        targets = [targets[i] for i in keep]
+
+        new_targets = [t for t in dict.fromkeys(targets) if t not in self._slots]
+        num_slots = len(self._slots) + len(new_targets)
+        depth = self.budget if self.budget is not None else 1
+        if self._gallery is not None:
+            depth = max(depth, self._gallery.shape[1])
+        if self.budget is None:
+            per_target = {}
+            for t in targets:
+                per_target[t] = per_target.get(t, 0) + 1
+            depth = max([depth] + [
+                per_target[t] + (self._counts[self._slots[t]] if t in self._slots else 0)
+                for t in per_target])
+        self._allocate(num_slots, depth, features.shape[1])
+        for target in new_targets:
+            self._slots[target] = self._free_slots.pop()
+
+        depth = self._gallery.shape[1]
+        slots = np.array([self._slots[t] for t in targets])
+        if len(np.unique(slots)) == len(slots):
+            heads = self._heads[slots]
+            self._gallery[slots, heads] = features
+            self._heads[slots] = (heads + 1) % depth
+            self._counts[slots] = np.minimum(self._counts[slots] + 1, depth)
+        else:
+            for slot, feature in zip(slots, features):
+                self._gallery[slot, self._heads[slot]] = feature
+                self._heads[slot] = (self._heads[slot] + 1) % depth
+                self._counts[slot] = min(self._counts[slot] + 1, depth)
 
     def distance(self, features, targets):
         """Compute distance between features and targets.
@@ -172,6 +188,29 @@ class NearestNeighborDistanceMetric(object):
 
         """
         cost_matrix = np.zeros((len(targets), len(features)))
-        for i, target in enumerate(targets):
-            cost_matrix[i, :] = self._metric(self.samples[target], features)
+        if len(targets) == 0 or len(features) == 0:
+            return cost_matrix
+        slots = np.array([self._slots[target] for target in targets])
+        counts = self._counts[slots]
+        depth = counts.max()
+        features = np.asarray(features, dtype=np.float32)
+        if self._normalize:
+            features = normalize_features(features)
+        gallery = self._gallery[slots, :depth]
+        num_targets, dim = len(slots), gallery.shape[2]
+        # One matrix product for the samples of all the targets, then the
+        # closest sample is the one of largest score
+        scores = (gallery.reshape(-1, dim) @ features.T).reshape(
+            num_targets, depth, len(features))
+        if not self._cosine:
+            scores *= 2.
+            scores -= np.square(gallery).sum(axis=2)[:, :, None]
+        if np.any(counts < depth):
+            scores[np.arange(depth)[None, :] >= counts[:, None]] = -np.inf
+        best = scores.max(axis=1)
+        if self._cosine:
+            cost_matrix[:] = 1. - best
+        else:
+            cost_matrix[:] = np.square(features).sum(axis=1)[None, :] - best
+            np.maximum(cost_matrix, 0., out=cost_matrix)
         return cost_matrix
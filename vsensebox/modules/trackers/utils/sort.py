@@ -175,31 +175,18 @@ def associate_detections_to_trackers(detections, trackers, iou_threshold=0.3):
     else:
       matched_indices = linear_assignment(-iou_matrix)
   else:
-    matched_indices = np.empty(shape=(0,2))
+    matched_indices = np.empty(shape=(0,2),dtype=int)
 
-  unmatched_detections = []
-  for d, det in enumerate(detections):
-    if(d not in matched_indices[:,0]):
-      unmatched_detections.append(d)
-  unmatched_trackers = []
-  for t, trk in enumerate(trackers):
-    if(t not in matched_indices[:,1]):
-      unmatched_trackers.append(t)
+  unmatched_detections = np.setdiff1d(np.arange(len(detections)), matched_indices[:,0])
+  unmatched_trackers = np.setdiff1d(np.arange(len(trackers)), matched_indices[:,1])
 
   #filter out matched with low IOU
-  matches = []
-  for m in matched_indices:
-    if(iou_matrix[m[0], m[1]]<iou_threshold):
-      unmatched_detections.append(m[0])
-      unmatched_trackers.append(m[1])
-    else:
-      matches.append(m.reshape(1,2))
-  if(len(matches)==0):
-    matches = np.empty((0,2),dtype=int)
-  else:
-    matches = np.concatenate(matches,axis=0)
+  low_iou = iou_matrix[matched_indices[:,0], matched_indices[:,1]] < iou_threshold
+  unmatched_detections = np.concatenate((unmatched_detections, matched_indices[low_iou,0]))
+  unmatched_trackers = np.concatenate((unmatched_trackers, matched_indices[low_iou,1]))
+  matches = matched_indices[~low_iou].reshape(-1,2)
 
-  return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+  return matches, unmatched_detections, unmatched_trackers
 
 
 class Sort(object):
@@ -260,6 +247,200 @@ class Sort(object):
     return np.empty((0,5))
 
 
+def convert_bboxes_to_z(bboxes):
+  """
+  Same as convert_bbox_to_z() for an Nx4 array of boxes, returns an Nx4 array of z
+  """
+  w = bboxes[:, 2] - bboxes[:, 0]
+  h = bboxes[:, 3] - bboxes[:, 1]
+  return np.stack((bboxes[:, 0] + w/2., bboxes[:, 1] + h/2., w * h, w / h), axis=1)
+
+
+def convert_xs_to_bboxes(xs):
+  """
+  Same as convert_x_to_bbox() for an Nx7 array of states, returns an Nx4 array of boxes
+  """
+  w = np.sqrt(xs[:, 2] * xs[:, 3])
+  h = xs[:, 2] / w
+  return np.stack((xs[:, 0]-w/2., xs[:, 1]-h/2., xs[:, 0]+w/2., xs[:, 1]+h/2.), axis=1)
+
+
+class BatchSort(object):
+  """
+  SORT with the states of all the tracked objects stacked into a Tx7 state array and a
+  Tx7x7 covariance array, so that every Kalman filter step runs once per frame for all
+  the tracks. The output is the same as Sort, and IDs are drawn from the same counter
+  as KalmanBoxTracker.
+  """
+  def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+    """
+    Sets key parameters for SORT
+    """
+    self.max_age = max_age
+    self.min_hits = min_hits
+    self.iou_threshold = iou_threshold
+    self.frame_count = 0
+
+    #define constant velocity model, same as KalmanBoxTracker
+    self.F = np.array([[1,0,0,0,1,0,0],[0,1,0,0,0,1,0],[0,0,1,0,0,0,1],[0,0,0,1,0,0,0],
+                       [0,0,0,0,1,0,0],[0,0,0,0,0,1,0],[0,0,0,0,0,0,1]], dtype=float)
+    self.H = np.array([[1,0,0,0,0,0,0],[0,1,0,0,0,0,0],[0,0,1,0,0,0,0],[0,0,0,1,0,0,0]], dtype=float)
+    self.R = np.eye(4)
+    self.R[2:,2:] *= 10.
+    self.P0 = np.eye(7)
+    self.P0[4:,4:] *= 1000. #give high uncertainty to the unobservable initial velocities
+    self.P0 *= 10.
+    self.Q = np.eye(7)
+    self.Q[-1,-1] *= 0.01
+    self.Q[4:,4:] *= 0.01
+
+    self.x = np.zeros((0, 7))
+    self.P = np.zeros((0, 7, 7))
+    self.ids = np.zeros(0, dtype=int)
+    self.time_since_update = np.zeros(0, dtype=int)
+    self.hits = np.zeros(0, dtype=int)
+    self.hit_streak = np.zeros(0, dtype=int)
+    self.age = np.zeros(0, dtype=int)
+    self.det_index = np.zeros(0, dtype=int)
+
+  def _keep(self, mask):
+    self.x = self.x[mask]
+    self.P = self.P[mask]
+    self.ids = self.ids[mask]
+    self.time_since_update = self.time_since_update[mask]
+    self.hits = self.hits[mask]
+    self.hit_streak = self.hit_streak[mask]
+    self.age = self.age[mask]
+    self.det_index = self.det_index[mask]
+
+  def _predict(self):
+    """
+    Advances all the state vectors and returns the predicted bounding box estimates.
+    """
+    self.x[(self.x[:, 6] + self.x[:, 2]) <= 0, 6] *= 0.0
+    self.x = self.x @ self.F.T
+    self.P = self.F @ self.P @ self.F.T + self.Q
+    self.age += 1
+    self.hit_streak[self.time_since_update > 0] = 0
+    self.time_since_update += 1
+    self.det_index[:] = -1
+    return convert_xs_to_bboxes(self.x)
+
+  def _update(self, indices, bboxes, det_indices):
+    """
+    Updates the state vectors of the tracks at indices with their observed bboxes.
+    """
+    x, P = self.x[indices], self.P[indices]
+    y = convert_bboxes_to_z(bboxes) - x @ self.H.T
+    PHT = P @ self.H.T
+    S = self.H @ PHT + self.R
+    K = PHT @ np.linalg.inv(S)
+    I_KH = np.eye(7) - K @ self.H
+    self.x[indices] = x + np.einsum('tij,tj->ti', K, y)
+    self.P[indices] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ self.R @ K.transpose(0, 2, 1)
+    self.time_since_update[indices] = 0
+    self.hits[indices] += 1
+    self.hit_streak[indices] += 1
+    self.det_index[indices] = det_indices
+
+  def _initiate(self, bboxes, det_indices):
+    """
+    Creates and initialises new tracks from unmatched bboxes.
+    """
+    n = len(bboxes)
+    x = np.zeros((n, 7))
+    x[:, :4] = convert_bboxes_to_z(bboxes)
+    self.x = np.concatenate((self.x, x))
+    self.P = np.concatenate((self.P, np.broadcast_to(self.P0, (n, 7, 7))))
+    self.ids = np.concatenate((self.ids, KalmanBoxTracker.count + np.arange(n)))
+    KalmanBoxTracker.count += n
+    zeros = np.zeros(n, dtype=int)
+    self.time_since_update = np.concatenate((self.time_since_update, zeros))
+    self.hits = np.concatenate((self.hits, zeros))
+    self.hit_streak = np.concatenate((self.hit_streak, zeros))
+    self.age = np.concatenate((self.age, zeros))
+    self.det_index = np.concatenate((self.det_index, det_indices))
+
+  def _shown(self):
+    """
+    Returns the indices of the tracks updated in the last frame which are output, in the
+    same order as Sort, which walks its trackers in reverse.
+    """
+    shown = (self.time_since_update < 1) & \
+            ((self.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits))
+    return np.flatnonzero(shown)[::-1]
+
+  def coast(self):
+    """
+    Advances all the state vectors by one frame without detections, for the frames on
+    which the detector is not run; unlike an update with empty detections, the frame is
+    not counted as a miss, so the tracks keep being output.
+    Returns the predicted [[x1,y1,x2,y2,ID],...] of the objects returned by the last update,
+    in the same order.
+    """
+    self.x[(self.x[:, 6] + self.x[:, 2]) <= 0, 6] *= 0.0
+    self.x = self.x @ self.F.T
+    self.P = self.F @ self.P @ self.F.T + self.Q
+    self.age += 1
+    shown = self._shown()
+    ret = np.concatenate(
+      (convert_xs_to_bboxes(self.x[shown]), (self.ids[shown] + 1)[:, None]), axis=1)
+    return ret[~np.any(np.isnan(ret), axis=1)]
+
+  def uncertainty(self):
+    """
+    Returns, for every object returned by the last update, the standard deviation of its
+    center predicted in the next frame, relative to the square root of its area.
+    """
+    shown = self._shown()
+    P = self.F @ self.P[shown] @ self.F.T + self.Q
+    return np.sqrt(P[:, 0, 0] + P[:, 1, 1]) / np.sqrt(np.maximum(self.x[shown, 2], 1e-6))
+
+  def update(self, dets=np.empty((0, 5)), return_indices=False):
+    """
+    Params:
+      dets - a numpy array of detections in the format [[x1,y1,x2,y2,score],[x1,y1,x2,y2,score],...]
+    Requires: this method must be called once for each frame even with empty detections (use np.empty((0, 5)) for frames without detections).
+    Returns the a similar array, where the last column is the object ID.
+
+    NOTE: The number of objects returned may differ from the number of detections provided.
+
+    If return_indices is True, also returns an array with, for every returned object, the
+    index of the detection in dets it was matched to or created from in this frame.
+    """
+    self.frame_count += 1
+    dets = np.asarray(dets, dtype=float).reshape(-1, 5)
+    # get predicted locations from existing trackers.
+    trks = self._predict()
+    valid = ~np.any(np.isnan(trks), axis=1)
+    if not valid.all():
+      self._keep(valid)
+      trks = trks[valid]
+    matched, unmatched_dets, _ = associate_detections_to_trackers(dets, trks, self.iou_threshold)
+
+    # update matched trackers with assigned detections
+    if len(matched) > 0:
+      self._update(matched[:, 1], dets[matched[:, 0], :4], matched[:, 0])
+
+    # create and initialise new trackers for unmatched detections
+    if len(unmatched_dets) > 0:
+      unmatched_dets = unmatched_dets.astype(int)
+      self._initiate(dets[unmatched_dets, :4], unmatched_dets)
+
+    shown = self._shown()
+    ret = np.concatenate(
+      (convert_xs_to_bboxes(self.x[shown]), (self.ids[shown] + 1)[:, None]), axis=1) # +1 as MOT benchmark requires positive
+    ret_indices = self.det_index[shown]
+
+    # remove dead tracklet
+    self._keep(self.time_since_update <= self.max_age)
+    if len(ret) == 0:
+      ret = np.empty((0,5))
+    if return_indices:
+      return ret, ret_indices
+    return ret
+
+
 def parse_args():
     """Parse input arguments."""
     parser = argparse.ArgumentParser(description='SORT demo')
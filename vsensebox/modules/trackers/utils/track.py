@@ -60,6 +60,9 @@ class Track:
     features : List[ndarray]
         A cache of features. On each measurement update, the associated feature
         vector is added to this list.
+    detection_index : int
+        Index of the detection associated with this track at the current time
+        step, in the list of detections given to the tracker, or -1 if none.
 
     """
 
@@ -71,6 +74,7 @@ class Track:
         self.hits = 1
         self.age = 1
         self.time_since_update = 0
+        self.detection_index = -1
 
         self.state = TrackState.Tentative
         self.features = []
@@ -119,9 +123,41 @@ class Track:
             The Kalman filter.
 
         """
-        self.mean, self.covariance = kf.predict(self.mean, self.covariance)
+        self.apply_prediction(*kf.predict(self.mean, self.covariance))
+
+    def apply_prediction(self, mean, covariance):
+        """Set the predicted state distribution of the current time step, for
+        example the output of a batched Kalman filter prediction step.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The predicted mean vector.
+        covariance : ndarray
+            The predicted covariance matrix.
+
+        """
+        self.mean, self.covariance = mean, covariance
         self.age += 1
         self.time_since_update += 1
+        self.detection_index = -1
+
+    def apply_coast(self, mean, covariance):
+        """Set the predicted state distribution of a time step without
+        measurement, on which no detection is run; unlike `apply_prediction`,
+        the time step does not count as a miss.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The predicted mean vector.
+        covariance : ndarray
+            The predicted covariance matrix.
+
+        """
+        self.mean, self.covariance = mean, covariance
+        self.age += 1
+        self.detection_index = -1
 
     def update(self, kf, detection):
         """Perform Kalman filter measurement update step and update the feature
@@ -135,8 +171,26 @@ class Track:
             The associated detection.
 
         """
-        self.mean, self.covariance = kf.update(
+        mean, covariance = kf.update(
             self.mean, self.covariance, detection.to_xyah())
+        self.apply_update(mean, covariance, detection)
+
+    def apply_update(self, mean, covariance, detection):
+        """Set the measurement-corrected state distribution, for example the
+        output of a batched Kalman filter correction step, and update the
+        feature cache.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The corrected mean vector.
+        covariance : ndarray
+            The corrected covariance matrix.
+        detection : Detection
+            The associated detection.
+
+        """
+        self.mean, self.covariance = mean, covariance
         self.features.append(detection.feature)
 
         self.hits += 1
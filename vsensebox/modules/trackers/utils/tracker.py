@@ -53,30 +53,77 @@ class Tracker:
 
         This function should be called once every time step, before `update`.
         """
-        for track in self.tracks:
-            track.predict(self.kf)
+        if len(self.tracks) == 0:
+            return
+        mean, covariance = self.kf.multi_predict(
+            np.asarray([t.mean for t in self.tracks]),
+            np.asarray([t.covariance for t in self.tracks]))
+        for i, track in enumerate(self.tracks):
+            track.apply_prediction(mean[i], covariance[i])
+
+    def coast(self):
+        """Propagate track state distributions one time step forward without
+        measurement, for a time step on which no detection is run.
+
+        Unlike `predict` followed by `update` with no detections, the tracks
+        are not marked as missed.
+        """
+        if len(self.tracks) == 0:
+            return
+        mean, covariance = self.kf.multi_predict(
+            np.asarray([t.mean for t in self.tracks]),
+            np.asarray([t.covariance for t in self.tracks]))
+        for i, track in enumerate(self.tracks):
+            track.apply_coast(mean[i], covariance[i])
+
+    def match(self, detections):
+        """Associate the detections to the tracks with the matching cascade,
+        then by IoU, without updating them.
 
-    def update(self, detections):
+        Parameters
+        ----------
+        detections : List[deep_sort.detection.Detection]
+            A list of detections at the current time step.
+
+        Returns
+        -------
+        (List[(int, int)], List[int], List[int])
+            The matched track and detection indices, the unmatched track
+            indices and the unmatched detection indices, to give to `update`.
+
+        """
+        return self._match(detections)
+
+    def update(self, detections, association=None):
         """Perform measurement update and track management.
 
         Parameters
         ----------
         detections : List[deep_sort.detection.Detection]
             A list of detections at the current time step.
+        association : Optional[Tuple]
+            The result of `match` for `detections`, if it is already computed.
 
         """
         # Run matching cascade.
-        matches, unmatched_tracks, unmatched_detections = \
-            self._match(detections)
+        if association is None:
+            association = self._match(detections)
+        matches, unmatched_tracks, unmatched_detections = association
 
         # Update track set.
-        for track_idx, detection_idx in matches:
-            self.tracks[track_idx].update(
-                self.kf, detections[detection_idx])
+        if len(matches) > 0:
+            mean, covariance = self.kf.multi_update(
+                np.asarray([self.tracks[i].mean for i, _ in matches]),
+                np.asarray([self.tracks[i].covariance for i, _ in matches]),
+                np.asarray([detections[j].to_xyah() for _, j in matches]))
+            for k, (track_idx, detection_idx) in enumerate(matches):
+                self.tracks[track_idx].apply_update(
+                    mean[k], covariance[k], detections[detection_idx])
+                self.tracks[track_idx].detection_index = detection_idx
         for track_idx in unmatched_tracks:
             self.tracks[track_idx].mark_missed()
         for detection_idx in unmatched_detections:
-            self._initiate_track(detections[detection_idx])
+            self._initiate_track(detections[detection_idx], detection_idx)
         self.tracks = [t for t in self.tracks if not t.is_deleted()]
 
         # Update distance metric.
@@ -93,13 +140,20 @@ class Tracker:
 
     def _match(self, detections):
 
+        # Project all tracks once, every cascade level reuses the factors.
+        gating_factors = None
+        if len(self.tracks) > 0:
+            gating_factors = self.kf.multi_gating_factors(
+                np.asarray([t.mean for t in self.tracks]),
+                np.asarray([t.covariance for t in self.tracks]))
+
         def gated_metric(tracks, dets, track_indices, detection_indices):
             features = np.array([dets[i].feature for i in detection_indices])
             targets = np.array([tracks[i].track_id for i in track_indices])
             cost_matrix = self.metric.distance(features, targets)
             cost_matrix = linear_assignment.gate_cost_matrix(
                 self.kf, cost_matrix, tracks, dets, track_indices,
-                detection_indices)
+                detection_indices, gating_factors=gating_factors)
 
             return cost_matrix
 
@@ -131,9 +185,11 @@ class Tracker:
         unmatched_tracks = list(set(unmatched_tracks_a + unmatched_tracks_b))
         return matches, unmatched_tracks, unmatched_detections
 
-    def _initiate_track(self, detection):
+    def _initiate_track(self, detection, detection_index=-1):
         mean, covariance = self.kf.initiate(detection.to_xyah())
-        self.tracks.append(Track(
+        track = Track(
             mean, covariance, self._next_id, self.n_init, self.max_age,
-            detection.feature))
+            detection.feature)
+        track.detection_index = detection_index
+        self.tracks.append(track)
         self._next_id += 1
@@ -0,0 +1,257 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import weakref
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+from vsensebox.utils.logtools import add_error_log, add_warning_log
+
+_HEADER_ALIGN = 64
+
+
+def _closeWhenDropped(shm, views):
+    # Unmapping the block while a view is alive would leave the view dangling
+    remaining = [len(views)]
+
+    def drop():
+        remaining[0] -= 1
+        if remaining[0] == 0: shm.close()
+
+    for view in views:
+        weakref.finalize(view, drop)
+
+
+class FrameHandle(object):
+
+    """A small picklable reference to a frame stored in a :class:`FrameRing`, which is
+    what the stages of a multi-process deployment pass to each other instead of frames.
+
+    Attributes
+    ----------
+    slot : int
+        Index of the slot of the ring holding the frame.
+    seq : int
+        Sequence number of the frame in its slot, used to detect a stale handle.
+    shape : tuple[int, ...]
+        Shape of the frame.
+    dtype : str
+        Data type of the frame, as :code:`numpy.dtype.str`.
+    """
+
+    __slots__ = ("slot", "seq", "shape", "dtype")
+
+    def __init__(self, slot, seq, shape, dtype):
+        self.slot = slot
+        self.seq = seq
+        self.shape = tuple(shape)
+        self.dtype = dtype
+
+    def __repr__(self):
+        return "FrameHandle(slot={}, seq={}, shape={}, dtype={})".format(
+            self.slot, self.seq, self.shape, self.dtype)
+
+
+class FrameRing(object):
+
+    """A ring of frame slots in one :mod:`multiprocessing.shared_memory` block.
+
+    The producer copies each frame once into a free slot with :meth:`put` and passes
+    the returned :class:`FrameHandle` along; every process holding the ring gets a
+    NumPy view of the frame with :meth:`get`, without copying it. A slot is reference
+    counted: :meth:`put` holds one reference, a stage handing the frame to several
+    consumers calls :meth:`acquire` for each extra one, and every holder calls
+    :meth:`release` when done; the slot is reused once no reference is left.
+
+    The ring is passed to worker processes as an argument of :class:`multiprocessing.Process`,
+    and only the process which created it unlinks the block.
+
+    Attributes
+    ----------
+    num_slots : int
+        Number of frame slots.
+    slot_bytes : int
+        Size in bytes of a slot, the largest frame the ring can hold.
+    name : str
+        Name of the shared memory block.
+    """
+
+    def __init__(self, num_slots=8, slot_bytes=1920 * 1080 * 3):
+        """Create a ring in a new shared memory block.
+
+        Parameters
+        ----------
+        num_slots : int, default=8
+            Number of frame slots.
+        slot_bytes : int, default=1920*1080*3
+            Size in bytes of a slot, the largest frame the ring can hold.
+        """
+        self.num_slots = int(num_slots)
+        self.slot_bytes = int(slot_bytes)
+        self._cond = mp.get_context("spawn").Condition()
+        header = self._getHeaderBytes(self.num_slots)
+        self._shm = shared_memory.SharedMemory(create=True, size=header + self.num_slots * self.slot_bytes)
+        self._owner = True
+        self._map()
+        self._header[:] = 0
+        self._next = 0
+
+    @staticmethod
+    def _getHeaderBytes(num_slots):
+        # Per slot: reference count and sequence number, as int64
+        return -(-num_slots * 16 // _HEADER_ALIGN) * _HEADER_ALIGN
+
+    def _map(self):
+        self.name = self._shm.name
+        # The views returned by get(), the block is not unmapped while one is alive
+        self._views = weakref.WeakValueDictionary()
+        self._header = np.ndarray((self.num_slots, 2), dtype=np.int64, buffer=self._shm.buf)
+        self._data_offset = self._getHeaderBytes(self.num_slots)
+
+    def __getstate__(self):
+        return {
+            "num_slots": self.num_slots,
+            "slot_bytes": self.slot_bytes,
+            "name": self.name,
+            "cond": self._cond
+        }
+
+    def __setstate__(self, state):
+        self.num_slots = state["num_slots"]
+        self.slot_bytes = state["slot_bytes"]
+        self._cond = state["cond"]
+        try:
+            self._shm = shared_memory.SharedMemory(name=state["name"], track=False)
+        except TypeError: # Python < 3.13
+            self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self._map()
+        self._next = 0
+
+    def _findFreeSlot(self):
+        for k in range(self.num_slots):
+            slot = (self._next + k) % self.num_slots
+            if self._header[slot, 0] == 0:
+                self._next = (slot + 1) % self.num_slots
+                return slot
+        return -1
+
+    def put(self, img, timeout=None):
+        """Copy :obj:`img` into a free slot, waiting for one if all are in use.
+
+        Parameters
+        ----------
+        img : ndarray
+            The frame, for example a :obj:`Mat` like object.
+        timeout : float, default=None
+            Maximum number of seconds to wait for a free slot, forever if None.
+
+        Returns
+        -------
+        FrameHandle or None
+            The handle of the frame, holding one reference, or None if no slot became
+            free within :obj:`timeout`.
+        """
+        img = np.asarray(img)
+        if img.nbytes > self.slot_bytes:
+            msg = ("FrameRing.put() -> The frame of " + str(img.nbytes) +
+                   " bytes is larger than the slots of " + str(self.slot_bytes) + " bytes.")
+            add_error_log(msg)
+            raise ValueError(msg)
+        with self._cond:
+            slot = self._findFreeSlot()
+            if slot < 0:
+                self._cond.wait_for(lambda: self._header[:, 0].min() == 0, timeout)
+                slot = self._findFreeSlot()
+                if slot < 0: return None
+            self._header[slot, 0] = 1
+            self._header[slot, 1] += 1
+            seq = int(self._header[slot, 1])
+        handle = FrameHandle(slot, seq, img.shape, img.dtype.str)
+        # The slot is reserved by its reference, no other frame is written in it
+        self._view(handle)[...] = img
+        return handle
+
+    def _view(self, handle):
+        return np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=self._shm.buf,
+                          offset=self._data_offset + handle.slot * self.slot_bytes)
+
+    def get(self, handle, copy=False):
+        """Get a NumPy view of the frame of :obj:`handle`, without copying it; it stays
+        valid until the last reference to the frame is released.
+
+        Parameters
+        ----------
+        handle : FrameHandle
+            The handle of the frame.
+        copy : bool, default=False
+            Whether to return a copy of the frame instead, made under the lock of the 
+            ring, so that it is the frame of :obj:`handle` even if the caller holds no 
+            reference to it.
+
+        Returns
+        -------
+        ndarray
+            A view of the frame in the shared memory block, or a copy of it.
+        """
+        # A slot is only reserved for another frame under the lock, so the frame 
+        # cannot be replaced between the check and the copy
+        with self._cond:
+            if self._header[handle.slot, 1] != handle.seq:
+                msg = "FrameRing.get() -> " + repr(handle) + " is stale, its slot has been reused."
+                add_error_log(msg)
+                raise ValueError(msg)
+            img = self._view(handle)
+            if copy: img = img.copy()
+            else: self._views[id(img)] = img
+        return img
+
+    def acquire(self, handle, count=1):
+        """Add :obj:`count` references to the frame of :obj:`handle`.
+        """
+        with self._cond:
+            self._header[handle.slot, 0] += count
+
+    def release(self, handle):
+        """Remove one reference to the frame of :obj:`handle`, making its slot free when
+        no reference is left.
+        """
+        with self._cond:
+            if self._header[handle.slot, 1] == handle.seq and self._header[handle.slot, 0] > 0:
+                self._header[handle.slot, 0] -= 1
+                if self._header[handle.slot, 0] == 0:
+                    self._cond.notify_all()
+
+    def getNumFree(self):
+        """Get the number of free slots.
+        """
+        with self._cond:
+            return int(np.count_nonzero(self._header[:, 0] == 0))
+
+    def close(self):
+        """Close the ring in this process; the process which created it also unlinks
+        the shared memory block. The views returned by :meth:`get` should be dropped
+        first; the block stays mapped in this process until the last of them is.
+        """
+        if self._shm is None: return
+        self._header = None
+        views = list(self._views.values())
+        if views:
+            add_warning_log("FrameRing.close() -> " + str(len(views)) + " views of the frames "
+                            "are still alive, the block is unmapped once they are dropped.")
+            _closeWhenDropped(self._shm, views)
+        else:
+            self._shm.close()
+        if self._owner: self._shm.unlink()
+        self._shm = None
+        self._views = weakref.WeakValueDictionary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,190 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import threading
+import numpy as np
+from time import perf_counter
+
+from vsensebox.utils.logtools import add_info_log
+
+
+class _StageTimer(object):
+
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler.record(self._name, perf_counter() - self._start)
+        return False
+
+
+class _NullTimer(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class StageProfiler(object):
+
+    """A profiler which records the latency of named stages, for example
+    :code:`"detect.inference"` or :code:`"track.association"`.
+
+    The last :attr:`capacity` samples of every stage are kept in a fixed-size ring
+    buffer, so recording a sample costs two clock reads and one array write; the
+    percentiles are only computed when :meth:`getStats` is called. It can be shared by
+    several threads, for example those of a :class:`Pipeline`.
+
+    Attributes
+    ----------
+    capacity : int
+        Number of the most recent samples kept for every stage.
+    enabled : bool
+        Always :code:`True` for a :class:`StageProfiler`.
+    """
+
+    enabled = True
+
+    def __init__(self, capacity=1024):
+        """Construct a StageProfiler.
+
+        Parameters
+        ----------
+        capacity : int, default=1024
+            Number of the most recent samples kept for every stage.
+        """
+        self.capacity = int(capacity)
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Get a context manager which records the time spent in its block as a sample
+        of stage :obj:`name`.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage.
+
+        Returns
+        -------
+        context manager
+            Use it as :code:`with profiler.stage("detect"): ...`.
+        """
+        return _StageTimer(self, name)
+
+    def record(self, name, seconds):
+        """Record a sample of stage :obj:`name` measured elsewhere.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage.
+        seconds : float
+            Duration of the stage in seconds.
+        """
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = np.empty(self.capacity)
+                self._counts[name] = 0
+            count = self._counts[name]
+            samples[count % self.capacity] = seconds
+            self._counts[name] = count + 1
+
+    def reset(self):
+        """Forget all the recorded samples.
+        """
+        with self._lock:
+            self._samples = {}
+            self._counts = {}
+
+    def getStats(self):
+        """Get the latency statistics of every stage, in milliseconds, computed over
+        the samples kept in the ring buffers.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping each stage name to a dictionary with keys
+            :code:`"count"` (total number of samples recorded), :code:`"mean"`,
+            :code:`"p50"`, :code:`"p95"`, :code:`"p99"` and :code:`"max"`.
+        """
+        with self._lock:
+            kept_samples = {name: (self._counts[name], 
+                                   samples[:min(self._counts[name], self.capacity)] * 1000.0)
+                            for name, samples in self._samples.items()}
+        stats = {}
+        for name, (count, kept) in kept_samples.items():
+            p50, p95, p99 = np.percentile(kept, [50, 95, 99])
+            stats[name] = {
+                "count": count,
+                "mean": float(kept.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(kept.max())
+            }
+        return stats
+
+    def log(self, terminal_log=True):
+        """Add the statistics of :meth:`getStats` to the log as a table.
+
+        Parameters
+        ----------
+        terminal_log : bool, default=True
+            Whether to print the table as well.
+        """
+        stats = self.getStats()
+        width = max([len(name) for name in stats] + [len("stage")])
+        lines = ["{:<{w}} {:>8} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+            "stage", "count", "mean", "p50", "p95", "p99", "max", w=width)]
+        for name in sorted(stats):
+            s = stats[name]
+            lines.append("{:<{w}} {:>8d} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+                name, s["count"], s["mean"], s["p50"], s["p95"], s["p99"], s["max"], w=width))
+        add_info_log("Stage latencies (ms):\n" + "\n".join(lines),
+                     terminal_log=terminal_log, add_new_line=True)
+
+
+class NullProfiler(object):
+
+    """A profiler with the same interface as :class:`StageProfiler` which records
+    nothing, used when profiling is disabled.
+    """
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def stage(self, name):
+        return self._timer
+
+    def record(self, name, seconds):
+        pass
+
+    def reset(self):
+        pass
+
+    def getStats(self):
+        return {}
+
+    def log(self, terminal_log=True):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -4,6 +4,9 @@
 
 
 from .vsense import VSense
+from .videosource import VideoSource
+from .pipeline import Pipeline
+from .scheduler import DetectorPool, StreamScheduler
 
-__all__ = "VSense"
+__all__ = "VSense", "VideoSource", "Pipeline", "DetectorPool", "StreamScheduler"
 
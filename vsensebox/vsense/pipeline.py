@@ -0,0 +1,237 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import queue
+import threading
+
+from vsensebox.vsense.vsense import VSenseAssets
+from vsensebox.vsense.videosource import iterFrames, putFrame
+from vsensebox.utils.logtools import add_error_log
+from vsensebox.utils.visualizetools import draw_boxes
+
+DROP_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+_STOP = object()
+
+
+def renderAssets(img, assets):
+    """Default render stage of a :class:`Pipeline`: draw the boxes, confidences and IDs
+    of :obj:`assets` on :obj:`img`.
+
+    Parameters
+    ----------
+    img : Mat
+        A :obj:`Mat` like object.
+    assets : VSenseAssets
+        The assets of :obj:`img`.
+
+    Returns
+    -------
+    Mat
+        A visualized :obj:`Mat` like object.
+    """
+    return draw_boxes(img, ids=assets.ids, boxes_xyxy=assets.boxes_xyxy,
+                      boxes_conf=assets.boxes_conf)
+
+
+class PipelineFrame(object):
+
+    """A frame going through a :class:`Pipeline`.
+
+    Attributes
+    ----------
+    index : int
+        Index of the frame in the source, starting at 0.
+    img : Mat
+        The decoded :obj:`Mat` like object.
+    assets : VSenseAssets
+        The detections and IDs of the frame.
+    output : any
+        What the render stage returned, :code:`None` without render stage.
+    """
+
+    __slots__ = ("index", "img", "assets", "output")
+
+    def __init__(self, index, img):
+        self.index = index
+        self.img = img
+        self.assets = VSenseAssets()
+        self.output = None
+
+
+class Pipeline(object):
+
+    """A pipeline running decode, detect, track and render of a video stream as separate
+    stages, each on its own worker thread and linked by bounded queues, so that the
+    detection of a frame overlaps the tracking and the rendering of the previous ones.
+
+    The frames come out in order by iterating over the pipeline:
+
+    .. code-block:: python
+
+        with Pipeline(VSense(), "video.mp4", trk_config_yaml="sort.yaml") as pipeline:
+            for frame in pipeline:
+                cv2.imshow("VSenseBox", frame.output)
+
+    When a stage is slower than the previous one, its input queue fills up and the
+    previous stage waits (back-pressure). The decode stage can instead drop frames
+    according to :attr:`drop_policy`, which suits live sources; frames are never dropped
+    between the other stages, so the tracker sees every frame which was detected.
+
+    Attributes
+    ----------
+    vsense : VSense
+        The :class:`VSense` object whose detector and tracker are used.
+    drop_policy : str
+        :code:`"block"`, :code:`"drop_oldest"` or :code:`"drop_newest"`.
+    dropped : int
+        Number of frames dropped by the decode stage so far.
+    error : Exception or None
+        The first exception raised by a stage, raised again by the iteration.
+    """
+
+    def __init__(self,
+                 vsense,
+                 source,
+                 det_config_yaml=None,
+                 trk_config_yaml=None,
+                 render=renderAssets,
+                 queue_size=4,
+                 drop_policy="block"):
+        """Construct a Pipeline; the worker threads start on the first iteration.
+
+        Parameters
+        ----------
+        vsense : VSense
+            The :class:`VSense` object whose detector and tracker are used; it must not
+            be used by another thread while the pipeline runs.
+        source : str or int or iterable
+            A video file, a stream URL or a camera index opened by :obj:`cv2.VideoCapture`,
+            or an iterable of images or :obj:`Mat` like objects.
+        det_config_yaml : str, default=None
+            Path of YAML config file of the detector.
+        trk_config_yaml : str, default=None
+            Path of YAML config file of the tracker, or :code:`False` to skip the track stage.
+        render : callable, default=renderAssets
+            The render stage :code:`render(img, assets) -> output`, or None to skip it.
+        queue_size : int, default=4
+            Maximum number of frames waiting between two stages.
+        drop_policy : str, default="block"
+            What the decode stage does when the detect stage is behind: :code:`"block"`
+            waits, :code:`"drop_oldest"` drops the oldest waiting frame and
+            :code:`"drop_newest"` drops the new frame.
+        """
+        if drop_policy not in DROP_POLICIES:
+            msg = ("Pipeline() -> The input 'drop_policy' must be one of " +
+                   str(DROP_POLICIES) + ", not " + str(drop_policy) + ".")
+            add_error_log(msg)
+            raise ValueError(msg)
+        self.vsense = vsense
+        self.source = source
+        self.det_config_yaml = det_config_yaml
+        self.trk_config_yaml = trk_config_yaml
+        self.render = render
+        self.queue_size = int(queue_size)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.error = None
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._output = None
+
+    def _put(self, q, item, policy="block"):
+        if item is _STOP: policy = "block"
+        self.dropped += putFrame(q, item, self._stop_event, policy)
+
+    def _get(self, q):
+        while not self._stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _fail(self, e):
+        if self.error is None:
+            self.error = e
+            add_error_log("Pipeline() -> " + type(e).__name__ + ": " + str(e))
+
+    def _decode(self, out_q):
+        try:
+            for index, img in iterFrames(self.source):
+                if self._stop_event.is_set(): break
+                self._put(out_q, PipelineFrame(index, img), self.drop_policy)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(out_q, _STOP)
+
+    def _runStage(self, work, in_q, out_q):
+        try:
+            while True:
+                frame = self._get(in_q)
+                if frame is _STOP: break
+                work(frame)
+                self._put(out_q, frame)
+        except Exception as e:
+            self._fail(e)
+            # The stages and the iteration see the stop event instead of _STOP
+            self._stop_event.set()
+        finally:
+            self._put(out_q, _STOP)
+
+    def _detect(self, frame):
+        self.vsense.detect(frame.img, config_yaml=self.det_config_yaml, img_is_mat=True,
+                           assets=frame.assets)
+
+    def _track(self, frame):
+        self.vsense.track(frame.img, config_yaml=self.trk_config_yaml, img_is_mat=True,
+                          assets=frame.assets)
+
+    def _render(self, frame):
+        frame.output = self.render(frame.img, frame.assets)
+
+    def start(self):
+        """Start the worker threads, which is done by the first iteration otherwise.
+        """
+        if self._threads: return
+        stages = [self._detect]
+        if self.trk_config_yaml is not False: stages.append(self._track)
+        if self.render is not None: stages.append(self._render)
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(stages) + 1)]
+        self._threads.append(threading.Thread(
+            target=self._decode, args=(queues[0],), name="vsensebox-decode", daemon=True))
+        for i, work in enumerate(stages):
+            self._threads.append(threading.Thread(
+                target=self._runStage, args=(work, queues[i], queues[i + 1]),
+                name="vsensebox" + work.__name__.replace("_", "-"), daemon=True))
+        self._output = queues[-1]
+        for t in self._threads: t.start()
+
+    def stop(self):
+        """Stop the worker threads and wait for them to finish.
+        """
+        self._stop_event.set()
+        for t in self._threads:
+            t.join()
+
+    def __iter__(self):
+        self.start()
+        try:
+            while True:
+                frame = self._get(self._output)
+                if frame is _STOP: break
+                yield frame
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
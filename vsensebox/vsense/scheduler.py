@@ -0,0 +1,313 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import json
+import queue
+import threading
+from time import monotonic
+from concurrent.futures import Future
+
+from vsensebox.config.confighelper import CFGWatcher
+from vsensebox.modules.detectors import checkDet
+from vsensebox.utils.commontools import getCVMat, getAbsPathFDS
+from vsensebox.utils.logtools import add_error_log
+from vsensebox.utils.profiletools import NULL_PROFILER
+from vsensebox.vsense.vsense import VSense, DEFAULT_DET_YAML, DET_YAML_TO_ROOT
+
+
+class SharedDetector(object):
+
+    """A detector of a :class:`DetectorPool`, shared by several :class:`VSense` objects
+    or threads; its calls are serialized by a lock, and it is reloaded when its YAML/JSON
+    configuration file is modified.
+
+    Attributes
+    ----------
+    config_yaml : str or dict
+        The configuration of the detector.
+    detector : detector object
+        The underlying detector; for example, :class:`YOLO_Ultralytics`.
+    """
+
+    def __init__(self, config_yaml, relative_to_vsensebox_root=False):
+        self.config_yaml = config_yaml
+        self.relative_to_vsensebox_root = relative_to_vsensebox_root
+        self.detector = None
+        self._lock = threading.Lock()
+        self._watcher = CFGWatcher()
+
+    def _check(self):
+        if self._watcher.isChanged(self.config_yaml) or self.detector is None:
+            self.detector = checkDet(detector=None, config_yaml=self.config_yaml,
+                                     relative_to_vsensebox_root=self.relative_to_vsensebox_root)
+
+    def detect(self, img, profiler=NULL_PROFILER):
+        """Same as the :meth:`detect` of the underlying detector, which records its stages 
+        in the :obj:`profiler` of the caller during the call.
+        """
+        with self._lock:
+            self._check()
+            self.detector.profiler = profiler
+            return self.detector.detect(img)
+
+    def detect_batch(self, imgs, profiler=NULL_PROFILER):
+        """Same as the :meth:`detect_batch` of the underlying detector, which records its 
+        stages in the :obj:`profiler` of the caller during the call.
+        """
+        with self._lock:
+            self._check()
+            self.detector.profiler = profiler
+            return self.detector.detect_batch(imgs)
+
+
+class DetectorPool(object):
+
+    """A pool of detectors shared by several :class:`VSense` objects, so that all the
+    streams using the same configuration use one copy of the model; pass it to
+    :class:`VSense` as :obj:`detector_pool`.
+    """
+
+    def __init__(self):
+        self._detectors = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._detectors)
+
+    def getDetector(self, config_yaml=None, relative_to_vsensebox_root=None):
+        """Get the shared detector of the given configuration, created on the first call.
+
+        Parameters
+        ----------
+        config_yaml : str or dict, default=None
+            A YAML/JSON file path, or a raw/ready dictionary; the default detector
+            if None.
+        relative_to_vsensebox_root : bool, default=None
+            Passed to :func:`checkDet`; True for the internal configuration files if None.
+
+        Returns
+        -------
+        SharedDetector
+            The shared detector.
+        """
+        if config_yaml is None:
+            config_yaml = DEFAULT_DET_YAML
+        if relative_to_vsensebox_root is None:
+            relative_to_vsensebox_root = DET_YAML_TO_ROOT if config_yaml == DEFAULT_DET_YAML else False
+        if isinstance(config_yaml, str):
+            key = (getAbsPathFDS(config_yaml), relative_to_vsensebox_root)
+        else:
+            # Equal dictionaries share a detector
+            key = (json.dumps(config_yaml, sort_keys=True, default=str), 
+                   relative_to_vsensebox_root)
+        with self._lock:
+            shared = self._detectors.get(key)
+            if shared is None:
+                shared = SharedDetector(config_yaml, relative_to_vsensebox_root)
+                self._detectors[key] = shared
+        return shared
+
+
+class _Request(object):
+
+    __slots__ = ("img", "future")
+
+    def __init__(self, img):
+        self.img = img
+        self.future = Future()
+
+
+class StreamHandle(object):
+
+    """A stream registered to a :class:`StreamScheduler`.
+
+    Attributes
+    ----------
+    vsense : VSense
+        The :class:`VSense` object of the stream, whose tracker and assets are its own.
+    """
+
+    def __init__(self, scheduler, vsense):
+        self.scheduler = scheduler
+        self.vsense = vsense
+
+    @property
+    def assets(self):
+        return self.vsense.assets
+
+    def detect(self, img, img_is_mat=False, assets=None):
+        """Detect objects in :obj:`img` within the next cross-stream batch, waiting for
+        the result, and store them like :meth:`VSense.detect`.
+
+        Parameters
+        ----------
+        img : str or Mat
+            Image file or a :obj:`Mat` like object.
+        img_is_mat : bool, default=False
+            Speed up the function by telling whether the :obj:`img` is :obj:`Mat` like object.
+        assets : VSenseAssets, default=None
+            The :class:`VSenseAssets` object to store the detections in, the assets of
+            :attr:`vsense` if None.
+        """
+        if not img_is_mat: img = getCVMat(img)
+        img, boxes_xywh, boxes_xyxy, keypoints, confs, cls = self.scheduler.submit(img).result()
+        if assets is None: assets = self.vsense.assets
+        assets.update(
+            boxes_xywh=boxes_xywh,
+            boxes_xyxy=boxes_xyxy,
+            keypoints=keypoints,
+            boxes_conf=confs,
+            boxes_cls=cls
+        )
+
+    def track(self, img=None, config_yaml=None, img_is_mat=False, assets=None):
+        """Same as :meth:`VSense.track` of :attr:`vsense`.
+        """
+        self.vsense.track(img=img, config_yaml=config_yaml, img_is_mat=img_is_mat, assets=assets)
+
+
+class StreamScheduler(object):
+
+    """A scheduler gathering the frames of several streams into cross-stream batches
+    for one shared detector; each stream keeps its own tracker.
+
+    A worker thread waits for a frame, then for at most :attr:`max_wait` seconds or
+    until :attr:`max_batch` frames are waiting, and runs :meth:`detect_batch` of the
+    shared detector once on them. Each stream, typically on its own thread, calls
+    :meth:`StreamHandle.detect` then :meth:`StreamHandle.track`:
+
+    .. code-block:: python
+
+        with StreamScheduler("yolo_ultralytics_v11n.yaml") as scheduler:
+            stream = scheduler.register()
+            stream.detect(frame, img_is_mat=True)
+            stream.track(frame, config_yaml="sort.yaml", img_is_mat=True)
+
+    Attributes
+    ----------
+    detector : SharedDetector
+        The shared detector of the streams.
+    max_batch : int
+        Maximum number of frames in a batch.
+    max_wait : float
+        Maximum number of seconds the first frame of a batch waits for others.
+    """
+
+    def __init__(self, config_yaml=None, pool=None, max_batch=8, max_wait=0.005):
+        """Construct a StreamScheduler and start its worker thread.
+
+        Parameters
+        ----------
+        config_yaml : str or dict, default=None
+            Configuration of the detector, the default detector if None.
+        pool : DetectorPool, default=None
+            The pool to take the detector from, a new one if None; the registered
+            :class:`VSense` objects use it too.
+        max_batch : int, default=8
+            Maximum number of frames in a batch.
+        max_wait : float, default=0.005
+            Maximum number of seconds the first frame of a batch waits for others.
+        """
+        self.pool = pool if pool is not None else DetectorPool()
+        self.detector = self.pool.getDetector(config_yaml)
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = float(max_wait)
+        self.streams = []
+        self._requests = queue.Queue()
+        self._stop_event = threading.Event()
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="vsensebox-scheduler", daemon=True)
+        self._worker.start()
+
+    def register(self, vsense=None):
+        """Register a stream.
+
+        Parameters
+        ----------
+        vsense : VSense, default=None
+            The :class:`VSense` object of the stream, a new one using :attr:`pool` if None.
+
+        Returns
+        -------
+        StreamHandle
+            The handle of the stream.
+        """
+        if vsense is None:
+            vsense = VSense(detector_pool=self.pool)
+        stream = StreamHandle(self, vsense)
+        self.streams.append(stream)
+        return stream
+
+    def submit(self, img):
+        """Submit a :obj:`Mat` like object to the next batch.
+
+        Parameters
+        ----------
+        img : Mat
+            A :obj:`Mat` like object.
+
+        Returns
+        -------
+        Future
+            A future of the tuple returned by the :meth:`detect` of the detector.
+        """
+        request = _Request(img)
+        # Under the lock, a frame is either queued before close() stops the worker, so 
+        # that it is detected or failed, or refused
+        with self._submit_lock:
+            if self._stop_event.is_set():
+                msg = "StreamScheduler() -> The scheduler is closed."
+                add_error_log(msg)
+                raise ValueError(msg)
+            self._requests.put(request)
+        return request.future
+
+    def _collect(self):
+        try:
+            batch = [self._requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - monotonic()
+            try:
+                batch.append(self._requests.get(timeout=remaining) if remaining > 0
+                             else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            if not batch: continue
+            try:
+                results = self.detector.detect_batch([r.img for r in batch])
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+            except Exception as e:
+                add_error_log("StreamScheduler() -> " + type(e).__name__ + ": " + str(e))
+                for request in batch:
+                    if not request.future.done(): request.future.set_exception(e)
+
+    def close(self):
+        """Stop the worker thread; the frames still waiting fail with :obj:`ValueError`.
+        """
+        with self._submit_lock:
+            self._stop_event.set()
+        self._worker.join()
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            request.future.set_exception(ValueError("StreamScheduler() -> The scheduler is closed."))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,173 @@
+# VSenseBox - Python toolbox for visual sensing
+# GNU General Public License v3 or later (GPLv3+)
+# Copyright (C) 2024 UMONS-Numediart
+
+
+import cv2
+import queue
+import threading
+
+from vsensebox.utils.commontools import getCVMat
+from vsensebox.utils.logtools import add_error_log
+
+_END = object()
+
+
+def iterFrames(source, stride=1):
+    """Iterate over the frames of :obj:`source`, keeping one frame out of :obj:`stride`.
+
+    The skipped frames of a :obj:`cv2.VideoCapture` are only grabbed, not decoded.
+
+    :meta private:
+    """
+    stride = max(1, int(stride))
+    if isinstance(source, (str, int)):
+        cap = cv2.VideoCapture(source)
+        try:
+            index = 0
+            while cap.isOpened():
+                if index % stride != 0:
+                    if not cap.grab(): break
+                else:
+                    has_frame, img = cap.read()
+                    if not has_frame: break
+                    yield index, img
+                index += 1
+        finally:
+            cap.release()
+    else:
+        for index, img in enumerate(source):
+            if index % stride == 0:
+                yield index, getCVMat(img)
+
+
+def putFrame(q, item, stop_event, policy="block"):
+    """Put :obj:`item` in the bounded queue :obj:`q`; when it is full, :code:`"block"` 
+    waits until :obj:`stop_event` is set, :code:`"drop_oldest"` drops the oldest waiting 
+    item and :code:`"drop_newest"` drops :obj:`item`. Return the number of dropped items.
+
+    :meta private:
+    """
+    if policy == "drop_newest":
+        try:
+            q.put_nowait(item)
+            return 0
+        except queue.Full:
+            return 1
+    if policy == "drop_oldest":
+        dropped = 0
+        while True:
+            try:
+                q.put_nowait(item)
+                return dropped
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    dropped += 1
+                except queue.Empty:
+                    pass
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return 0
+        except queue.Full:
+            continue
+    return 0
+
+
+class VideoSource(object):
+
+    """A video source decoding its frames on a background thread into a bounded queue,
+    so that decoding is not on the critical path of the detection.
+
+    Iterating over it gives :code:`(index, img)`, where :code:`index` is the index of
+    the frame in the source.
+
+    Attributes
+    ----------
+    source : str or int or iterable
+        A video file, a stream URL or a camera index opened by :obj:`cv2.VideoCapture`,
+        or an iterable of images or :obj:`Mat` like objects.
+    stride : int
+        Only one frame out of :attr:`stride` is decoded, for offline files.
+    latest_only : bool
+        Whether only the latest decoded frame is kept, for live streams; the frames
+        decoded while the consumer is busy are dropped.
+    dropped : int
+        Number of frames dropped in :attr:`latest_only` mode so far.
+    """
+
+    def __init__(self, source, stride=1, latest_only=False, queue_size=4):
+        """Construct a VideoSource; the decoding starts on the first iteration.
+
+        Parameters
+        ----------
+        source : str or int or iterable
+            A video file, a stream URL or a camera index opened by :obj:`cv2.VideoCapture`,
+            or an iterable of images or :obj:`Mat` like objects.
+        stride : int, default=1
+            Only one frame out of :obj:`stride` is decoded.
+        latest_only : bool, default=False
+            Whether only the latest decoded frame is kept.
+        queue_size : int, default=4
+            Maximum number of decoded frames waiting, 1 in :obj:`latest_only` mode.
+        """
+        self.source = source
+        self.stride = max(1, int(stride))
+        self.latest_only = latest_only
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=1 if latest_only else max(1, int(queue_size)))
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._error = None
+
+    def _put(self, item):
+        policy = "drop_oldest" if self.latest_only and item is not _END else "block"
+        self.dropped += putFrame(self._queue, item, self._stop_event, policy)
+
+    def _decode(self):
+        try:
+            for item in iterFrames(self.source, self.stride):
+                if self._stop_event.is_set(): break
+                self._put(item)
+        except Exception as e:
+            self._error = e
+            add_error_log("VideoSource() -> " + type(e).__name__ + ": " + str(e))
+        finally:
+            self._put(_END)
+
+    def start(self):
+        """Start the decoding thread, which is done by the first iteration otherwise.
+        """
+        if self._thread is not None: return
+        self._thread = threading.Thread(target=self._decode, name="vsensebox-videosource", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the decoding thread and wait for it to finish.
+        """
+        self._stop_event.set()
+        if self._thread is not None: self._thread.join()
+
+    def __iter__(self):
+        self.start()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop_event.is_set(): break
+                    continue
+                if item is _END: break
+                yield item
+        finally:
+            self.stop()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
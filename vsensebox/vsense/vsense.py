@@ -5,12 +5,17 @@
 
 # Configurations
 from vsensebox.config.configurator import DET_CONFIG_DIR, TRK_CONFIG_DIR, IN_ROOT_DIR
-from vsensebox.config.confighelper import getCFGDict
+from vsensebox.config.confighelper import getCFGDict, CFGWatcher
 
 # Utils & tools
+import numpy as np
 from vsensebox.modules.detectors import checkDet
 from vsensebox.modules.trackers import checkTrk
+from vsensebox.modules.trackers.processtracker import ProcessTracker
+from vsensebox.vsense.videosource import VideoSource
 from vsensebox.utils.commontools import getCVMat, joinFPathFull, getAncestorDir
+from vsensebox.utils.logtools import add_error_log
+from vsensebox.utils.profiletools import StageProfiler, NULL_PROFILER
 
 # Default detector
 DEFAULT_DET_CONFIG = getCFGDict(joinFPathFull(DET_CONFIG_DIR, 'default.yaml'))
@@ -31,18 +36,48 @@ class VSense(object):
     ----------
     assets : VSenseAssets
         A :class:`VSenseAssets` object used to store assets of VSense.
+    profiler : StageProfiler or NullProfiler
+        The profiler recording the latency of every stage of :meth:`detect` and 
+        :meth:`track`, shared with the detector and the tracker; use 
+        :code:`profiler.getStats()` or :code:`profiler.log()` to read it.
+    detector_pool : DetectorPool or None
+        The pool the detector is taken from, shared with other VSense objects.
+    tracker_process : bool
+        Whether the tracker runs in a worker process of its own.
     """
 
-    def __init__(self):
+    def __init__(self, profile=False, profile_capacity=1024, detector_pool=None, 
+                 tracker_process=False):
+        """Construct a VSense.
+
+        Parameters
+        ----------
+        profile : bool, default=False
+            Whether to record the latency of every stage in :attr:`profiler`.
+        profile_capacity : int, default=1024
+            Number of the most recent samples kept for every stage when profiling.
+        detector_pool : DetectorPool, default=None
+            A :class:`DetectorPool` shared with other VSense objects, so that the ones 
+            using the same detector configuration share one copy of the model, or None 
+            to load a detector of its own.
+        tracker_process : bool, default=False
+            Whether to run the tracker in a worker process of its own through a 
+            :class:`ProcessTracker`, so that the trackers of several VSense objects 
+            run in parallel instead of sharing the GIL.
+        """
         self.assets = VSenseAssets()
+        self.profiler = StageProfiler(profile_capacity) if profile else NULL_PROFILER
+        self.detector_pool = detector_pool
+        self.tracker_process = tracker_process
         self._detector = None
         self._tracker = None
-        self._yaml_det = None
-        self._yaml_trk = None
+        self._det_watcher = CFGWatcher()
+        self._trk_watcher = CFGWatcher()
         self._det_rel_to_root = False
         self._trk_rel_to_root = False
+        self._tracked = None
 
-    def detect(self, img, config_yaml=None, img_is_mat=False):
+    def detect(self, img, config_yaml=None, img_is_mat=False, assets=None):
         """Detect objects in the given image :obj:`img`.
 
         Parameters
@@ -53,18 +88,22 @@ class VSense(object):
             Path of YAML config file.
         img_is_mat : bool, default=False
             Speed up the function by telling whether the :obj:`img` is :obj:`Mat` like object.
+        assets : VSenseAssets, default=None
+            The :class:`VSenseAssets` object to store the detections in, :attr:`assets` if None; 
+            for example, to keep the assets of every frame of a :class:`Pipeline`.
         """
-        if not img_is_mat: img = getCVMat(img)
-        if config_yaml is None:
-            config_yaml = DEFAULT_DET_YAML
-            self._det_rel_to_root = DET_YAML_TO_ROOT
-        if self._yaml_det != config_yaml:
-            self._detector = checkDet(detector=self._detector, config_yaml=config_yaml, 
-                                      relative_to_vsensebox_root=self._det_rel_to_root)
-        else:
-            self._yaml_det = config_yaml
-        img, boxes_xywh, boxes_xyxy, keypoints, confs, cls = self._detector.detect(img)
-        self.assets.update(
+        if not img_is_mat: 
+            with self.profiler.stage("decode"):
+                img = getCVMat(img)
+        self._checkDetector(config_yaml)
+        with self.profiler.stage("detect"):
+            if self.detector_pool is not None:
+                img, boxes_xywh, boxes_xyxy, keypoints, confs, cls = self._detector.detect(
+                    img, profiler=self.profiler)
+            else:
+                img, boxes_xywh, boxes_xyxy, keypoints, confs, cls = self._detector.detect(img)
+        if assets is None: assets = self.assets
+        assets.update(
             boxes_xywh=boxes_xywh, 
             boxes_xyxy=boxes_xyxy, 
             keypoints=keypoints, 
@@ -72,7 +111,79 @@ class VSense(object):
             boxes_cls=cls
         )
 
-    def track(self, img=None, config_yaml=None, img_is_mat=False):
+    def detect_batch(self, imgs, config_yaml=None, imgs_are_mat=False):
+        """Detect objects in the given list of images :obj:`imgs` by sending all of 
+        them to the detector in a single forward pass. Unlike :meth:`detect`, the 
+        results are returned instead of being stored in :attr:`assets`.
+
+        Parameters
+        ----------
+        imgs : list[str or Mat, ...]
+            A list of image files or :obj:`Mat` like objects.
+        config_yaml : str, default=None
+            Path of YAML config file.
+        imgs_are_mat : bool, default=False
+            Speed up the function by telling whether all the :obj:`imgs` are :obj:`Mat` 
+            like objects.
+
+        Returns
+        -------
+        list[VSenseAssets, ...]
+            A list of :class:`VSenseAssets` objects corresponding to :obj:`imgs`.
+        """
+        if not imgs_are_mat: 
+            with self.profiler.stage("decode"):
+                imgs = [getCVMat(img) for img in imgs]
+        self._checkDetector(config_yaml)
+        with self.profiler.stage("detect"):
+            if self.detector_pool is not None:
+                results = self._detector.detect_batch(imgs, profiler=self.profiler)
+            else:
+                results = self._detector.detect_batch(imgs)
+        batch_assets = []
+        for img, boxes_xywh, boxes_xyxy, keypoints, confs, cls in results:
+            assets = VSenseAssets()
+            assets.update(
+                boxes_xywh=boxes_xywh, 
+                boxes_xyxy=boxes_xyxy, 
+                keypoints=keypoints, 
+                boxes_conf=confs,
+                boxes_cls=cls
+            )
+            batch_assets.append(assets)
+        return batch_assets
+
+    def _checkDetector(self, config_yaml):
+        if config_yaml is None:
+            config_yaml = DEFAULT_DET_YAML
+        if self._det_watcher.isChanged(config_yaml) or self._detector is None:
+            self._det_rel_to_root = DET_YAML_TO_ROOT if config_yaml == DEFAULT_DET_YAML else False
+            if self.detector_pool is not None:
+                # A shared detector reloads itself when its file is modified, and is 
+                # given the profiler of the caller on every call
+                self._detector = self.detector_pool.getDetector(
+                    config_yaml, relative_to_vsensebox_root=self._det_rel_to_root)
+            else:
+                self._detector = checkDet(detector=None, config_yaml=config_yaml, 
+                                          relative_to_vsensebox_root=self._det_rel_to_root)
+                self._detector.profiler = self.profiler
+
+    def _checkTracker(self, config_yaml):
+        if config_yaml is None:
+            config_yaml = DEFAULT_TRK_YAML
+        if self._trk_watcher.isChanged(config_yaml) or self._tracker is None:
+            self._trk_rel_to_root = TRK_YAML_TO_ROOT if config_yaml == DEFAULT_TRK_YAML else False
+            if isinstance(self._tracker, ProcessTracker):
+                self._tracker.close()
+            if self.tracker_process:
+                self._tracker = ProcessTracker(config_yaml, 
+                                               relative_to_vsensebox_root=self._trk_rel_to_root)
+            else:
+                self._tracker = checkTrk(tracker=None, config_yaml=config_yaml, 
+                                         relative_to_vsensebox_root=self._trk_rel_to_root)
+            self._tracker.profiler = self.profiler
+
+    def track(self, img=None, config_yaml=None, img_is_mat=False, assets=None):
         """Track the detected objects in the given image :obj:`img`.
 
         Parameters
@@ -83,97 +194,300 @@ class VSense(object):
             Path of YAML config file.
         img_is_mat : bool, default=False
             Speed up the function by telling whether the :obj:`img` is :obj:`Mat` like object.
+        assets : VSenseAssets, default=None
+            The :class:`VSenseAssets` object holding the detections to track and receiving 
+            the IDs, :attr:`assets` if None.
         """
-        if not img_is_mat: img = getCVMat(img)
-        if config_yaml is None:
-            config_yaml = DEFAULT_TRK_YAML
-            self._trk_rel_to_root = TRK_YAML_TO_ROOT
-        if self._yaml_trk != config_yaml:
-            self._tracker = checkTrk(tracker=self._tracker, config_yaml=config_yaml, 
-                                     relative_to_vsensebox_root=self._trk_rel_to_root)
-        else:
-            self._yaml_trk = config_yaml
-        boxes_xyxy, self.assets.ids = self._tracker.update(
-            self.assets.boxes_xyxy, 
-            self.assets.boxes_conf, 
-            boxes_cls=self.assets.boxes_cls, 
-            img=img
+        if not img_is_mat: 
+            with self.profiler.stage("decode"):
+                img = getCVMat(img)
+        self._checkTracker(config_yaml)
+        if assets is None: assets = self.assets
+        with self.profiler.stage("track"):
+            boxes_xyxy, assets.ids = self._tracker.update(
+                assets.boxes_xyxy, 
+                assets.boxes_conf, 
+                boxes_cls=assets.boxes_cls, 
+                img=img
+            )
+        # Confidences and classes of the tracked objects, for the predicted frames
+        self._tracked = (assets.ids, assets.boxes_conf, assets.boxes_cls)
+
+    def canPredict(self, config_yaml=None):
+        """Check whether the tracker can predict the objects in a frame without detections 
+        through :meth:`predict`, which :class:`SORT` and :class:`DeepSORT` can.
+
+        Parameters
+        ----------
+        config_yaml : str, default=None
+            Path of YAML config file.
+
+        Returns
+        -------
+        bool
+            Whether the tracker can predict.
+        """
+        self._checkTracker(config_yaml)
+        return hasattr(self._tracker, "predict")
+
+    def predict(self, config_yaml=None, assets=None):
+        """Predict the boxes and the IDs of the tracked objects in the next frame from the 
+        motion model of the tracker alone, instead of calling :meth:`detect` and :meth:`track`; 
+        for example, on the frames between two keyframes. Only the objects tracked in the 
+        last tracked frame are predicted, with the confidences and the classes they had.
+
+        Parameters
+        ----------
+        config_yaml : str, default=None
+            Path of YAML config file.
+        assets : VSenseAssets, default=None
+            The :class:`VSenseAssets` object to store the predicted boxes and IDs in, 
+            :attr:`assets` if None.
+        """
+        if not self.canPredict(config_yaml):
+            msg = ("VSense.predict() -> The tracker " + type(self._tracker).__name__ + 
+                   " cannot predict without detections.")
+            add_error_log(msg)
+            raise ValueError(msg)
+        with self.profiler.stage("track"):
+            boxes_xyxy, ids = self._tracker.predict()
+        boxes_conf, boxes_cls = None, None
+        if self._tracked is not None and len(self._tracked[0]) > 0 and len(ids) > 0:
+            tracked_ids, tracked_conf, tracked_cls = self._tracked
+            order = np.argsort(tracked_ids)
+            k = order[np.searchsorted(tracked_ids, ids, sorter=order).clip(max=len(order) - 1)]
+            if np.array_equal(tracked_ids[k], ids):
+                if len(tracked_conf) == len(tracked_ids): boxes_conf = tracked_conf[k]
+                if len(tracked_cls) == len(tracked_ids): boxes_cls = tracked_cls[k]
+        if assets is None: assets = self.assets
+        assets.update(
+            boxes_xyxy=boxes_xyxy, 
+            boxes_conf=boxes_conf, 
+            boxes_cls=boxes_cls, 
+            ids=ids
         )
 
+    def _isKeyframe(self, since_keyframe, keyframe_interval, max_uncertainty, trk_config_yaml):
+        if since_keyframe == 0 or since_keyframe >= keyframe_interval: return True
+        if trk_config_yaml is False or not self.canPredict(trk_config_yaml): return True
+        return max_uncertainty is not None and self._tracker.getUncertainty() > max_uncertainty
+
+    def run(self, 
+            source, 
+            det_config_yaml=None, 
+            trk_config_yaml=None, 
+            stride=1, 
+            latest_only=False, 
+            queue_size=4, 
+            keyframe_interval=1, 
+            max_uncertainty=None):
+        """Detect and track the objects in every frame of a video :obj:`source`, which is 
+        decoded on a background thread by a :class:`VideoSource`.
+
+        .. code-block:: python
+
+            for index, frame, assets in vsense.run("video.mp4", trk_config_yaml="sort.yaml"):
+                frame = draw_boxes(frame, ids=assets.ids, boxes_xyxy=assets.boxes_xyxy)
+
+        Parameters
+        ----------
+        source : str or int or iterable
+            A video file, a stream URL or a camera index opened by :obj:`cv2.VideoCapture`, 
+            or an iterable of images or :obj:`Mat` like objects.
+        det_config_yaml : str, default=None
+            Path of YAML config file of the detector.
+        trk_config_yaml : str, default=None
+            Path of YAML config file of the tracker, or :code:`False` to only detect.
+        stride : int, default=1
+            Only one frame out of :obj:`stride` is decoded and processed, for offline files.
+        latest_only : bool, default=False
+            Whether to always process the latest decoded frame and drop the ones decoded 
+            meanwhile, for live streams.
+        queue_size : int, default=4
+            Maximum number of decoded frames waiting, 1 in :obj:`latest_only` mode.
+        keyframe_interval : int, default=1
+            Run :meth:`detect` and :meth:`track` only on one frame out of 
+            :obj:`keyframe_interval`, the keyframes, and :meth:`predict` on the frames 
+            in between, if the tracker can predict (see :meth:`canPredict`); the 
+            :obj:`max_age` and :obj:`min_hits` of the tracker then count keyframes.
+        max_uncertainty : float, default=None
+            If given, a frame is also a keyframe when the uncertainty of the predicted 
+            position of a tracked object, relative to its size, exceeds it; for example, 
+            0.1. :obj:`keyframe_interval` is then the maximum interval between keyframes.
+
+        Yields
+        ------
+        int
+            Index of the frame in the source.
+        Mat
+            The frame, a :obj:`Mat` like object.
+        VSenseAssets
+            A new :class:`VSenseAssets` object of the frame, also set as :attr:`assets`.
+        """
+        keyframe_interval = max(1, int(keyframe_interval))
+        video = VideoSource(source, stride=stride, latest_only=latest_only, queue_size=queue_size)
+        since_keyframe = 0
+        for index, img in video:
+            assets = VSenseAssets()
+            if self._isKeyframe(since_keyframe, keyframe_interval, max_uncertainty, trk_config_yaml):
+                self.detect(img, config_yaml=det_config_yaml, img_is_mat=True, assets=assets)
+                if trk_config_yaml is not False:
+                    self.track(img, config_yaml=trk_config_yaml, img_is_mat=True, assets=assets)
+                since_keyframe = 1
+            else:
+                self.predict(config_yaml=trk_config_yaml, assets=assets)
+                since_keyframe += 1
+            self.assets = assets
+            yield index, img, assets
+
 
 class VSenseAssets(object):
     
     """
-    A class used to store assets of VSense.
+    A class used to store assets of VSense. 
+    
+    All the boxes are stored in one contiguous :code:`float32` array :attr:`boxes` of 
+    shape (N, 8), where every row is [X1, Y1, X2, Y2, X, Y, W, H]; :attr:`boxes_xyxy` 
+    and :attr:`boxes_xywh` are views of it, and :attr:`boxes_conf`, :attr:`boxes_cls` 
+    and :attr:`ids` are parallel arrays. Use :meth:`asList` to get the assets as lists.
 
     Attributes
     ----------
-    boxes_xyxy : list[[X1, Y1, X2, Y2], ...], optional
-        A list of bounding boxes; for example, [[X1, Y1, X2, Y2], [X1, Y1, X2, Y2], ...].
-    boxes_xywh : list[[X, Y, W, H], ...], optional
-        A list of bounding boxes; for example, [[X, Y, W, H], [X, Y, W, H], ...].
-    boxes_conf : list[float, ...], optional
-        A list of detection confidences corresponding to bounding boxes.
-    boxes_cls : list[int, ...], optional
-        A list of detection class corresponding to bounding boxes.
-    keypoints : list[], optional
-        A list of detected bodies' keypoints.
-    ids: list[int, ...], optional
-        A list of IDs corresponding to bounding boxes.
-    masks: list[], optional
+    boxes : ndarray[float32], shape (N, 8)
+        An array of bounding boxes; for example, [[X1, Y1, X2, Y2, X, Y, W, H], ...].
+    boxes_xyxy : ndarray[float32], shape (N, 4)
+        A view of bounding boxes; for example, [[X1, Y1, X2, Y2], [X1, Y1, X2, Y2], ...].
+    boxes_xywh : ndarray[float32], shape (N, 4)
+        A view of bounding boxes; for example, [[X, Y, W, H], [X, Y, W, H], ...].
+    boxes_conf : ndarray[float32], shape (N,)
+        An array of detection confidences corresponding to bounding boxes.
+    boxes_cls : ndarray[int32], shape (N,)
+        An array of detection class corresponding to bounding boxes.
+    keypoints : list[] or ndarray
+        Detected bodies' keypoints.
+    ids: ndarray[int64], shape (N,) or (0,)
+        An array of IDs corresponding to bounding boxes; empty until tracked.
+    masks: list[]
         A list of detected masks.
-    misc : list[], optional
+    misc : list[]
         A list of miscellaneous items.
     """
     
     def __init__(self):
         """Construct a VSenseAssets.
         """
-        self.boxes_xyxy = []
-        self.boxes_xywh = []
-        self.boxes_conf = []
-        self.boxes_cls = []
+        self.boxes = np.zeros((0, 8), dtype=np.float32)
+        self.boxes_conf = np.zeros(0, dtype=np.float32)
+        self.boxes_cls = np.zeros(0, dtype=np.int32)
         self.keypoints = []
-        self.ids = []
+        self._ids = np.zeros(0, dtype=np.int64)
         self.masks = []
         self.miscs = []
+
+    def __len__(self):
+        return len(self.boxes)
+
+    @property
+    def boxes_xyxy(self):
+        return self.boxes[:, :4]
+
+    @boxes_xyxy.setter
+    def boxes_xyxy(self, boxes_xyxy):
+        self.boxes = self._getBoxes(boxes_xyxy=boxes_xyxy)
+
+    @property
+    def boxes_xywh(self):
+        return self.boxes[:, 4:]
+
+    @boxes_xywh.setter
+    def boxes_xywh(self, boxes_xywh):
+        self.boxes = self._getBoxes(boxes_xywh=boxes_xywh)
+
+    @property
+    def ids(self):
+        return self._ids
+
+    @ids.setter
+    def ids(self, ids):
+        self._ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+
+    def _getBoxes(self, boxes_xyxy=None, boxes_xywh=None):
+        has_xyxy = boxes_xyxy is not None and len(boxes_xyxy) > 0
+        has_xywh = boxes_xywh is not None and len(boxes_xywh) > 0
+        if not has_xyxy and not has_xywh:
+            return np.zeros((0, 8), dtype=np.float32)
+        boxes = np.empty((len(boxes_xyxy) if has_xyxy else len(boxes_xywh), 8), dtype=np.float32)
+        if has_xyxy:
+            boxes[:, :4] = np.asarray(boxes_xyxy).reshape(-1, 4)
+        if has_xywh:
+            boxes[:, 4:] = np.asarray(boxes_xywh).reshape(-1, 4)
+        else:
+            boxes[:, 4:6] = boxes[:, 0:2]
+            np.subtract(boxes[:, 2:4], boxes[:, 0:2], out=boxes[:, 6:8])
+        if not has_xyxy:
+            boxes[:, 0:2] = boxes[:, 4:6]
+            np.add(boxes[:, 4:6], boxes[:, 6:8], out=boxes[:, 2:4])
+        return boxes
     
     def update(self, 
-               boxes_xyxy=[], 
-               boxes_xywh=[], 
-               boxes_conf=[], 
-               boxes_cls=[], 
-               keypoints=[], 
-               ids=[], 
-               masks=[], 
-               miscs=[]):
-        """Update a VSenseAssets.
+               boxes_xyxy=None, 
+               boxes_xywh=None, 
+               boxes_conf=None, 
+               boxes_cls=None, 
+               keypoints=None, 
+               ids=None, 
+               masks=None, 
+               miscs=None):
+        """Update a VSenseAssets. Lists and arrays are both accepted; if only one of 
+        :obj:`boxes_xyxy` and :obj:`boxes_xywh` is given, the other one is derived from it.
 
         Parameters
         ----------
-        boxes_xyxy : list[[X1, Y1, X2, Y2], ...], optional
+        boxes_xyxy : list[[X1, Y1, X2, Y2], ...] or ndarray, optional
             A list of bounding boxes; for example, [[X1, Y1, X2, Y2], [X1, Y1, X2, Y2], ...].
-        boxes_xywh : list[[X, Y, W, H], ...], optional
+        boxes_xywh : list[[X, Y, W, H], ...] or ndarray, optional
             A list of bounding boxes; for example, [[X, Y, W, H], [X, Y, W, H], ...].
-        boxes_conf : list[float, ...], optional
+        boxes_conf : list[float, ...] or ndarray, optional
             A list of detection confidences corresponding to bounding boxes.
-        boxes_cls : list[int, ...], optional
+        boxes_cls : list[int, ...] or ndarray, optional
             A list of detection class corresponding to bounding boxes.
-        keypoints : list[], optional
-            A list of detected bodies' keypoints.
-        ids: list[int, ...], optional
+        keypoints : list[] or ndarray, optional
+            Detected bodies' keypoints.
+        ids: list[int, ...] or ndarray, optional
             A list of IDs corresponding to bounding boxes.
         masks: list[], optional
             A list of detected masks.
         misc : list[], optional
             A list of miscellaneous items.
         """
-        self.boxes_xyxy = boxes_xyxy
-        self.boxes_xywh = boxes_xywh
-        self.boxes_conf = boxes_conf
-        self.boxes_cls = boxes_cls
-        self.keypoints = keypoints
-        self.ids = ids
-        self.masks = masks
-        self.miscs = miscs
+        self.boxes = self._getBoxes(boxes_xyxy=boxes_xyxy, boxes_xywh=boxes_xywh)
+        self.boxes_conf = np.asarray(boxes_conf if boxes_conf is not None else [], 
+                                     dtype=np.float32).reshape(-1)
+        self.boxes_cls = np.asarray(boxes_cls if boxes_cls is not None else [], 
+                                    dtype=np.int32).reshape(-1)
+        self.keypoints = keypoints if keypoints is not None else []
+        self.ids = ids if ids is not None else []
+        self.masks = masks if masks is not None else []
+        self.miscs = miscs if miscs is not None else []
+
+    def asList(self, name):
+        """Get an asset in the list format of the earlier versions of VSenseBox.
 
+        Parameters
+        ----------
+        name : str
+            Name of the asset; for example, :code:`"boxes_xyxy"` or :code:`"ids"`.
+
+        Returns
+        -------
+        list
+            A list of box arrays for :code:`"boxes_xyxy"` and :code:`"boxes_xywh"`, 
+            a list of Python numbers for :code:`"boxes_conf"`, :code:`"boxes_cls"` and 
+            :code:`"ids"`, or a list of the items of any other asset.
+        """
+        asset = getattr(self, name)
+        if name in ("boxes_xyxy", "boxes_xywh"):
+            return list(asset)
+        elif isinstance(asset, np.ndarray) and asset.ndim == 1:
+            return asset.tolist()
+        return list(asset)